@@ -0,0 +1,407 @@
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from bar_store import BarStore, BAR_STORE_DIR, make_rows
+from rules import RuleEngine
+
+_BAR_COLUMNS = ("open", "high", "low", "close", "volume")
+
+# Reasons match RuleEngine.should_sell / the trader's BUY log lines
+_ENTRY_REASONS = ("immediate", "reentry", "signal")
+_EXIT_REASONS = ("take_profit_abs", "take_profit", "stop_loss")
+
+TRADE_DTYPE = np.dtype([
+	("entry_idx", np.int64),
+	("exit_idx", np.int64),  # -1 while still open at the end of the data
+	("entry_price", np.float64),
+	("exit_price", np.float64),
+	("entry_reason", np.int8),
+	("exit_reason", np.int8),
+	("pnl", np.float64),
+])
+
+
+class Bars:
+	# Column arrays for one symbol; ts is epoch seconds (UTC)
+	def __init__(self, ts: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray, volume: np.ndarray) -> None:
+		order = np.argsort(ts, kind="stable")
+		self.ts = np.asarray(ts, dtype=np.int64)[order]
+		self.open = np.asarray(open_, dtype=np.float64)[order]
+		self.high = np.asarray(high, dtype=np.float64)[order]
+		self.low = np.asarray(low, dtype=np.float64)[order]
+		self.close = np.asarray(close, dtype=np.float64)[order]
+		self.volume = np.asarray(volume, dtype=np.float64)[order]
+
+	@classmethod
+	def from_columns(cls, cols: Dict[str, np.ndarray]) -> "Bars":
+		# Wrap already-sorted columns (e.g. BarStore memory maps) without copying
+		bars = cls.__new__(cls)
+		bars.ts = cols["ts"]
+		bars.open = cols["open"]
+		bars.high = cols["high"]
+		bars.low = cols["low"]
+		bars.close = cols["close"]
+		bars.volume = cols["volume"]
+		return bars
+
+	def __len__(self) -> int:
+		return len(self.ts)
+
+
+def _parse_timestamps(values: List[str], tz: str) -> np.ndarray:
+	# Epoch seconds pass through; ISO/Breeze "YYYY-MM-DD HH:MM:SS" strings are market-local time
+	try:
+		return np.asarray([float(v) for v in values], dtype=np.float64).astype(np.int64)
+	except ValueError:
+		pass
+	local = np.asarray([v.strip().replace("T", " ")[:19] for v in values], dtype="datetime64[s]")
+	ts = local.astype(np.int64)
+	if len(ts):
+		first = datetime.utcfromtimestamp(int(ts[0]))
+		offset = ZoneInfo(tz).utcoffset(first) or timedelta(0)
+		ts = ts - int(offset.total_seconds())
+	return ts
+
+
+def _bars_from_columns(columns: Dict[str, List[Any]], tz: str) -> Bars:
+	ts_key = next((k for k in ("timestamp", "datetime", "date", "time", "ts") if k in columns), None)
+	if ts_key is None:
+		raise ValueError("bars need a timestamp/datetime column")
+	n = len(columns[ts_key])
+	cols = {}
+	for c in _BAR_COLUMNS:
+		values = columns.get(c)
+		cols[c] = np.asarray([v if v not in ("", None) else "nan" for v in values], dtype=np.float64) if values is not None else np.zeros(n)
+	return Bars(_parse_timestamps([str(v) for v in columns[ts_key]], tz), cols["open"], cols["high"], cols["low"], cols["close"], cols["volume"])
+
+
+def load_csv(path: str, tz: str = "Asia/Kolkata") -> Bars:
+	with open(path, "r", newline="") as f:
+		reader = csv.reader(f)
+		header = [h.strip().lower() for h in next(reader)]
+		data = list(zip(*reader))
+	columns = {h: list(data[i]) if i < len(data) else [] for i, h in enumerate(header)}
+	return _bars_from_columns(columns, tz)
+
+
+def load_parquet(path: str, tz: str = "Asia/Kolkata") -> Bars:
+	import pandas as pd  # installed with yfinance; only needed for parquet input
+	df = pd.read_parquet(path)
+	df.columns = [str(c).lower() for c in df.columns]
+	if "timestamp" not in df.columns and "datetime" not in df.columns:
+		df = df.reset_index().rename(columns={"index": "datetime"})
+		df.columns = [str(c).lower() for c in df.columns]
+	columns = {c: df[c].astype(str).tolist() if c in ("timestamp", "datetime") else df[c].tolist() for c in df.columns}
+	return _bars_from_columns(columns, tz)
+
+
+def load_bars(path: str, tz: str = "Asia/Kolkata") -> Bars:
+	if path.lower().endswith((".parquet", ".pq")):
+		return load_parquet(path, tz)
+	return load_csv(path, tz)
+
+
+def load_store(store: BarStore, symbol: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None, timeframe: str = "1m") -> Bars:
+	return Bars.from_columns(store.read(symbol, start_ts, end_ts, timeframe))
+
+
+def _epoch(dt: datetime, tz: str) -> int:
+	return int(dt.replace(tzinfo=ZoneInfo(tz)).timestamp())
+
+
+def fetch_breeze_bars(client, stock_code: str, exchange_code: str, from_dt: datetime, to_dt: datetime, tz: str = "Asia/Kolkata", store: Optional[BarStore] = None) -> Bars:
+	# 1-minute bars from Breeze, kept in the bar store so each minute is downloaded only once
+	store = store or BarStore()
+	start, end = _epoch(from_dt, tz), _epoch(to_dt, tz)
+	have = store.read(stock_code, timeframe="1m")["ts"]
+	ranges = []
+	if len(have) == 0:
+		ranges.append((from_dt, to_dt))
+	else:
+		if start < int(have[0]):
+			ranges.append((from_dt, min(to_dt, datetime.fromtimestamp(int(have[0]), ZoneInfo(tz)).replace(tzinfo=None))))
+		if end > int(have[-1]) + 60:
+			ranges.append((max(from_dt, datetime.fromtimestamp(int(have[-1]) + 60, ZoneInfo(tz)).replace(tzinfo=None)), to_dt))
+	for lo, hi in ranges:
+		rows = client.get_historical_bars(stock_code, exchange_code, lo, hi)
+		if not rows:
+			continue
+		columns = {c: [r.get(c) for r in rows] for c in ("datetime",) + _BAR_COLUMNS}
+		bars = _bars_from_columns(columns, tz)
+		store.append_rows(stock_code, make_rows(bars.ts, bars.open, bars.high, bars.low, bars.close, bars.volume))
+	store.flush()
+	return load_store(store, stock_code, start, end)
+
+
+def params_from_rules(rules: RuleEngine, **overrides: Any) -> Dict[str, Any]:
+	params = {
+		"buy_mode": rules.buy_mode,
+		"buy_drop_pct": rules.buy_drop_pct,
+		"buy_drop_abs": rules.buy_drop_abs,
+		"take_profit_pct": rules.take_profit_pct,
+		"take_profit_abs": rules.take_profit_abs,
+		"stop_loss_pct": rules.stop_loss_pct,
+		"sma_window": rules.sma_window,
+		"sma_drop_pct": rules.sma_drop_pct,
+		"high_window": rules.high_window,
+		"min_warmup_samples": rules.min_warmup_samples,
+		"buy_immediate_on_start": rules.buy_immediate_on_start,
+		"quantity": rules.quantity,
+	}
+	params.update(overrides)
+	return params
+
+
+def market_mask(ts: np.ndarray, rules: RuleEngine) -> np.ndarray:
+	# Vectorized RuleEngine.is_market_open: ticks outside the session are skipped entirely
+	return rules.calendar.session_mask(ts)
+
+
+def rolling_max(x: np.ndarray, window: int) -> np.ndarray:
+	# van Herk/Gil-Werman: out[i] = max(x[i-window+1 .. i]) in O(n); leading partial windows use what exists
+	n = len(x)
+	if n == 0 or window <= 1:
+		return x.copy()
+	pad_front = window - 1
+	total = pad_front + n
+	blocks = -(-total // window)
+	buf = np.full(blocks * window, -np.inf)
+	buf[pad_front:pad_front + n] = x
+	grid = buf.reshape(blocks, window)
+	prefix = np.maximum.accumulate(grid, axis=1).ravel()
+	suffix = np.maximum.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+	idx = np.arange(n) + pad_front  # window end in buf
+	return np.maximum(suffix[idx - window + 1], prefix[idx])
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+	# out[i] = mean(x[i-window+1 .. i]); NaN until a full window exists
+	out = np.full(len(x), np.nan)
+	if len(x) >= window:
+		c = np.cumsum(np.concatenate(([0.0], x)))
+		out[window - 1:] = (c[window:] - c[:-window]) / float(window)
+	return out
+
+
+def _entry_signals(ext: np.ndarray, first: int, appended_before: int, p: Dict[str, Any]) -> np.ndarray:
+	# ext = window tail followed by new prices; evaluates should_buy for ext[first:], where the
+	# window after appending ext[first + k] holds appended_before + k + 1 prices
+	prices = ext[first:]
+	counts = appended_before + np.arange(1, len(prices) + 1)
+	immediate = bool(p["buy_immediate_on_start"])
+	ready = (counts >= int(p["min_warmup_samples"])) | immediate
+	if p["buy_mode"] == "below_sma":
+		window = int(p["sma_window"])
+		sma = rolling_mean(ext, window)[first:]
+		with np.errstate(invalid="ignore", divide="ignore"):
+			gap = np.where(sma > 0, (sma - prices) / sma, 0.0)
+		enough = counts >= max(window, int(p["min_warmup_samples"]))
+		return ready & enough & (gap >= float(p["sma_drop_pct"]))
+	high = rolling_max(ext, int(p["high_window"]))[first:]
+	drop_abs = high - prices
+	with np.errstate(invalid="ignore", divide="ignore"):
+		drop_pct = np.where(high > 0, drop_abs / high, 0.0)
+	hit = drop_pct >= float(p["buy_drop_pct"])
+	if float(p["buy_drop_abs"]) > 0:
+		hit |= drop_abs >= float(p["buy_drop_abs"])
+	return ready & (high > 0) & hit
+
+
+def _exit_reasons(prices: np.ndarray, avg: float, p: Dict[str, Any]) -> np.ndarray:
+	# RuleEngine.should_sell over an array: 0 = hold, else 1 + index into _EXIT_REASONS
+	pnl_abs = prices - avg
+	pnl_pct = pnl_abs / avg
+	reason = np.zeros(len(prices), dtype=np.int8)
+	reason[pnl_pct <= -float(p["stop_loss_pct"])] = 3
+	reason[pnl_pct >= float(p["take_profit_pct"])] = 2
+	if float(p["take_profit_abs"]) > 0:
+		reason[pnl_abs >= float(p["take_profit_abs"])] = 1
+	return reason
+
+
+def simulate(prices: np.ndarray, p: Dict[str, Any], chunk: int = 4096) -> np.ndarray:
+	# Replays trader.py semantics over in-session prices and returns TRADE_DTYPE records.
+	# Work per trade is vectorized over growing chunks, so the cost is O(len(prices)) overall.
+	prices = np.asarray(prices, dtype=np.float64)
+	n = len(prices)
+	qty = float(p["quantity"])
+	keep = max(int(p["high_window"]), int(p["sma_window"]), int(p["min_warmup_samples"]), 1)
+	tail = np.empty(0)
+	appended = 0
+	last_sell: Optional[float] = None
+	immediate_bought = False
+	trades: List[Tuple] = []
+	i = 0
+	while i < n:
+		# Flat: find the entry tick
+		entry = -1
+		entry_reason = 0
+		if last_sell is None and p["buy_immediate_on_start"] and not immediate_bought:
+			entry, entry_reason = i, 0
+		else:
+			step = min(chunk, 64)
+			while i < n:
+				seg = prices[i:i + step]
+				reentry = np.flatnonzero(seg < last_sell) if last_sell is not None else np.empty(0, dtype=np.int64)
+				r = int(reentry[0]) if len(reentry) else len(seg)
+				if r > 0:
+					ext = np.concatenate((tail, seg[:r]))
+					hits = np.flatnonzero(_entry_signals(ext, len(tail), appended, p))
+				else:
+					hits = np.empty(0, dtype=np.int64)
+				if len(hits):
+					s = int(hits[0])
+					tail = np.concatenate((tail, seg[:s + 1]))[-keep:]
+					appended += s + 1
+					entry, entry_reason = i + s, 2
+					break
+				if r > 0:
+					tail = np.concatenate((tail, seg[:r]))[-keep:]
+					appended += r
+				if r < len(seg):
+					entry, entry_reason = i + r, 1
+					break
+				i += len(seg)
+				step = min(step * 2, chunk)
+		if entry < 0:
+			break
+		if entry_reason in (0, 1):
+			immediate_bought = True
+		avg = float(prices[entry])
+		# Long: find the exit tick
+		exit_idx, exit_reason = -1, 0
+		j = entry + 1
+		step = 64
+		while j < n and avg > 0:
+			reasons = _exit_reasons(prices[j:j + step], avg, p)
+			hit = np.flatnonzero(reasons)
+			if len(hit):
+				exit_idx = j + int(hit[0])
+				exit_reason = int(reasons[hit[0]]) - 1
+				break
+			j += step
+			step = min(step * 2, chunk)
+		if exit_idx < 0:
+			trades.append((entry, -1, avg, np.nan, entry_reason, -1, 0.0))
+			break
+		sell = float(prices[exit_idx])
+		trades.append((entry, exit_idx, avg, sell, entry_reason, exit_reason, (sell - avg) * qty))
+		last_sell = sell
+		i = exit_idx + 1
+	return np.array(trades, dtype=TRADE_DTYPE)
+
+
+def summarize(trades: np.ndarray, last_price: Optional[float] = None, quantity: float = 1.0) -> Dict[str, float]:
+	closed = trades[trades["exit_idx"] >= 0]
+	pnl = closed["pnl"]
+	equity = np.cumsum(pnl)
+	drawdown = float(np.max(np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity)) if len(equity) else 0.0
+	open_trades = trades[trades["exit_idx"] < 0]
+	unrealized = 0.0
+	if len(open_trades) and last_price is not None:
+		unrealized = float((last_price - open_trades["entry_price"][0]) * quantity)
+	return {
+		"trades": float(len(closed)),
+		"total_pnl": float(pnl.sum()) if len(pnl) else 0.0,
+		"win_rate": float((pnl > 0).mean()) if len(pnl) else 0.0,
+		"avg_pnl": float(pnl.mean()) if len(pnl) else 0.0,
+		"max_drawdown": drawdown,
+		"unrealized": unrealized,
+	}
+
+
+def backtest(bars: Bars, rules: RuleEngine, **overrides: Any) -> Tuple[np.ndarray, Dict[str, float]]:
+	# Trades are returned with entry/exit indices into `bars`
+	params = params_from_rules(rules, **overrides)
+	mask = market_mask(bars.ts, rules)
+	session_idx = np.flatnonzero(mask)
+	prices = bars.close[session_idx]
+	trades = simulate(prices, params)
+	if len(trades):
+		trades["entry_idx"] = session_idx[trades["entry_idx"]]
+		closed = trades["exit_idx"] >= 0
+		trades["exit_idx"][closed] = session_idx[trades["exit_idx"][closed]]
+	last = float(prices[-1]) if len(prices) else None
+	return trades, summarize(trades, last, float(params["quantity"]))
+
+
+def _fmt_ts(ts: int, tz: str) -> str:
+	return datetime.fromtimestamp(int(ts), ZoneInfo(tz)).strftime("%Y-%m-%d %H:%M")
+
+
+def write_trades(path: str, results: Iterable[Tuple[str, Bars, np.ndarray]], tz: str) -> None:
+	with open(path, "w", newline="") as f:
+		w = csv.writer(f)
+		w.writerow(("symbol", "entry_time", "entry_reason", "entry_price", "exit_time", "exit_reason", "exit_price", "pnl"))
+		for symbol, bars, trades in results:
+			for t in trades:
+				closed = t["exit_idx"] >= 0
+				w.writerow((
+					symbol,
+					_fmt_ts(bars.ts[t["entry_idx"]], tz),
+					_ENTRY_REASONS[t["entry_reason"]],
+					f"{t['entry_price']:.2f}",
+					_fmt_ts(bars.ts[t["exit_idx"]], tz) if closed else "",
+					_EXIT_REASONS[t["exit_reason"]] if closed else "open",
+					f"{t['exit_price']:.2f}" if closed else "",
+					f"{t['pnl']:.2f}" if closed else "",
+				))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	ap = argparse.ArgumentParser(description="Replay 1-minute bars through the rules.config entry/exit logic.")
+	ap.add_argument("files", nargs="*", help="CSV/Parquet bar files, one per symbol (symbol = file name)")
+	ap.add_argument("--rules", default="rules.config")
+	ap.add_argument("--breeze", nargs="*", default=[], help="Breeze stock codes to fetch (kept in the bar store)")
+	ap.add_argument("--store", nargs="*", default=[], help="symbols to read from the local bar store")
+	ap.add_argument("--store-dir", default=BAR_STORE_DIR)
+	ap.add_argument("--timeframe", default="1m", help="bar store timeframe for --store (1m or tick)")
+	ap.add_argument("--from", dest="from_date", help="YYYY-MM-DD, with --breeze")
+	ap.add_argument("--to", dest="to_date", help="YYYY-MM-DD, with --breeze")
+	ap.add_argument("--trades", help="write every trade to this CSV")
+	args = ap.parse_args(argv)
+
+	rules = RuleEngine(args.rules)
+	if rules.custom is not None:
+		print("Note: strategy/buy_rule/sell_rules are not simulated here; results use buy_mode and take-profit/stop-loss only.", file=sys.stderr)
+	datasets: List[Tuple[str, Bars]] = []
+	for path in args.files:
+		datasets.append((os.path.splitext(os.path.basename(path))[0].upper(), load_bars(path, rules.market_tz)))
+	store = BarStore(args.store_dir)
+	for symbol in args.store:
+		datasets.append((symbol.upper(), load_store(store, symbol, timeframe=args.timeframe)))
+	if args.breeze:
+		from breeze_client import BreezeClient
+		if not args.from_date or not args.to_date:
+			ap.error("--breeze needs --from and --to")
+		client = BreezeClient()
+		client.connect()
+		from_dt = datetime.strptime(args.from_date, "%Y-%m-%d")
+		to_dt = datetime.strptime(args.to_date, "%Y-%m-%d") + timedelta(days=1)
+		for code in args.breeze:
+			datasets.append((code.upper(), fetch_breeze_bars(client, code, rules.exchange_code, from_dt, to_dt, rules.market_tz, store)))
+	if not datasets:
+		ap.error("give bar files, --store symbols and/or --breeze codes")
+
+	results = []
+	grand = 0.0
+	print(f"{'symbol':<12} {'bars':>9} {'trades':>7} {'pnl':>12} {'win%':>6} {'max_dd':>10} {'open_pnl':>10}")
+	for symbol, bars in datasets:
+		trades, stats = backtest(bars, rules)
+		results.append((symbol, bars, trades))
+		grand += stats["total_pnl"]
+		print(f"{symbol:<12} {len(bars):>9} {int(stats['trades']):>7} {stats['total_pnl']:>12.2f} {stats['win_rate'] * 100:>6.1f} {stats['max_drawdown']:>10.2f} {stats['unrealized']:>10.2f}")
+	print(f"{'TOTAL':<12} {'':>9} {'':>7} {grand:>12.2f}")
+	if args.trades:
+		write_trades(args.trades, results, rules.market_tz)
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
@@ -0,0 +1,278 @@
+import logging
+import os
+import threading
+import time
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+BAR_STORE_DIR = "bars"
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+	("ts", "<i8"),  # epoch seconds, UTC
+	("open", "<f8"),
+	("high", "<f8"),
+	("low", "<f8"),
+	("close", "<f8"),
+	("volume", "<f8"),
+)
+_ROW_DTYPE = np.dtype([(name, dt) for name, dt in COLUMNS])
+# Side segment for rows that arrive out of order: whole records, appended in arrival order
+PENDING_FILE = "pending.bin"
+
+log = logging.getLogger(__name__)
+
+
+class BarStore:
+	# Append-only columnar time series on disk: <root>/<SYMBOL>/<timeframe>/<column>.bin, one raw
+	# little-endian array per column. Rows are kept in timestamp order, so reads are a searchsorted
+	# over the memory-mapped ts column followed by zero-copy slices of the other columns.
+	# Timeframes are free-form; the trader appends live prices to "tick" and history uses "1m".
+	# Column files are never rewritten while this store may have handed out memory maps of them:
+	# backfilled rows go to a pending side segment that reads combine on the fly, and the segment
+	# is folded into the columns when a store is next opened.
+	def __init__(self, root: str = BAR_STORE_DIR) -> None:
+		self.root = root
+		self._lock = threading.RLock()
+		self._writers: Dict[Tuple[str, str], Dict[str, BinaryIO]] = {}
+		self._counts: Dict[Tuple[str, str], int] = {}
+		self._last_ts: Dict[Tuple[str, str], int] = {}
+		self._pending: Dict[Tuple[str, str], BinaryIO] = {}
+		# Series whose reads must combine a pending segment (backfilled here, or not yet compacted)
+		self._uncompacted: Set[Tuple[str, str]] = set()
+		self.compact()
+
+	def _dir(self, symbol: str, timeframe: str) -> str:
+		return os.path.join(self.root, symbol.upper(), timeframe)
+
+	def _path(self, symbol: str, timeframe: str, column: str) -> str:
+		return os.path.join(self._dir(symbol, timeframe), f"{column}.bin")
+
+	def _pending_path(self, symbol: str, timeframe: str) -> str:
+		return os.path.join(self._dir(symbol, timeframe), PENDING_FILE)
+
+	def symbols(self) -> List[str]:
+		if not os.path.isdir(self.root):
+			return []
+		return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+	def _open(self, symbol: str, timeframe: str) -> Dict[str, BinaryIO]:
+		key = (symbol.upper(), timeframe)
+		writers = self._writers.get(key)
+		if writers is not None:
+			return writers
+		os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+		# Columns can disagree after a crash mid-append; trim all of them to the shortest
+		rows = self._disk_rows(symbol, timeframe)
+		writers = {}
+		for name, dt in COLUMNS:
+			path = self._path(symbol, timeframe, name)
+			f = open(path, "ab")
+			f.truncate(rows * np.dtype(dt).itemsize)
+			f.seek(0, os.SEEK_END)
+			writers[name] = f
+		self._writers[key] = writers
+		self._counts[key] = rows
+		self._last_ts[key] = self._read_last_ts(symbol, timeframe, rows)
+		return writers
+
+	def _disk_rows(self, symbol: str, timeframe: str) -> int:
+		rows = None
+		for name, dt in COLUMNS:
+			path = self._path(symbol, timeframe, name)
+			size = os.path.getsize(path) if os.path.exists(path) else 0
+			n = size // np.dtype(dt).itemsize
+			rows = n if rows is None else min(rows, n)
+		return rows or 0
+
+	def _read_last_ts(self, symbol: str, timeframe: str, rows: int) -> int:
+		if rows == 0:
+			return -(2 ** 63)
+		with open(self._path(symbol, timeframe, "ts"), "rb") as f:
+			f.seek((rows - 1) * 8)
+			return int(np.frombuffer(f.read(8), dtype="<i8")[0])
+
+	def append_rows(self, symbol: str, rows: np.ndarray, timeframe: str = "1m") -> int:
+		# rows: structured array with COLUMNS fields, sorted by ts. Rows at or before the last
+		# stored timestamp go through merge() instead so the ts column stays ordered.
+		if len(rows) == 0:
+			return 0
+		with self._lock:
+			writers = self._open(symbol, timeframe)
+			key = (symbol.upper(), timeframe)
+			if int(rows["ts"][0]) < self._last_ts[key] or self._has_pending(symbol, timeframe):
+				return self.merge(symbol, rows, timeframe)
+			for name, dt in COLUMNS:
+				writers[name].write(np.ascontiguousarray(rows[name], dtype=dt).tobytes())
+			self._counts[key] += len(rows)
+			self._last_ts[key] = int(rows["ts"][-1])
+			return len(rows)
+
+	def append(self, symbol: str, ts: int, open_: float, high: float, low: float, close: float, volume: float = 0.0, timeframe: str = "1m") -> None:
+		row = np.array([(int(ts), open_, high, low, close, volume)], dtype=_ROW_DTYPE)
+		self.append_rows(symbol, row, timeframe)
+
+	def append_tick(self, symbol: str, ltp: float, ts: Optional[float] = None, volume: float = 0.0) -> None:
+		t = int(time.time() if ts is None else ts)
+		self.append(symbol, t, ltp, ltp, ltp, ltp, volume, timeframe="tick")
+
+	def merge(self, symbol: str, rows: np.ndarray, timeframe: str = "1m") -> int:
+		# Backfill/overlap path: the rows go to the pending segment, and reads combine it with the
+		# columns (duplicate timestamps: the newest write wins). Returns rows added.
+		with self._lock:
+			before = self.count(symbol, timeframe)
+			key = (symbol.upper(), timeframe)
+			f = self._pending.get(key)
+			if f is None:
+				os.makedirs(self._dir(symbol, timeframe), exist_ok=True)
+				f = self._pending[key] = open(self._pending_path(symbol, timeframe), "ab")
+			f.write(np.ascontiguousarray(rows, dtype=_ROW_DTYPE).tobytes())
+			f.flush()
+			self._uncompacted.add(key)
+			return self.count(symbol, timeframe) - before
+
+	def _has_pending(self, symbol: str, timeframe: str) -> bool:
+		return (symbol.upper(), timeframe) in self._uncompacted
+
+	def _combined(self, base: Dict[str, np.ndarray], symbol: str, timeframe: str) -> Dict[str, np.ndarray]:
+		# Columns plus the pending segment, sorted by ts with one row per timestamp. The segment
+		# is newest last and beats the columns, so it is reversed and put first for unique().
+		path = self._pending_path(symbol, timeframe)
+		pending = np.fromfile(path, dtype=_ROW_DTYPE, count=os.path.getsize(path) // _ROW_DTYPE.itemsize)
+		rows = np.empty(len(base["ts"]), dtype=_ROW_DTYPE)
+		for name, _ in COLUMNS:
+			rows[name] = base[name]
+		combined = np.concatenate((pending[::-1], rows))
+		_, first = np.unique(combined["ts"], return_index=True)
+		merged = combined[first]
+		return {name: np.ascontiguousarray(merged[name]) for name, _ in COLUMNS}
+
+	def compact(self) -> None:
+		# Fold every pending segment into its columns (temp file + rename). Runs when a store is
+		# opened, before it has mapped anything; if another process still holds the old files
+		# (PermissionError on Windows) the segment is kept and reads keep combining it.
+		with self._lock:
+			for symbol in self.symbols():
+				sym_dir = os.path.join(self.root, symbol)
+				for timeframe in sorted(os.listdir(sym_dir)):
+					if not os.path.isfile(self._pending_path(symbol, timeframe)):
+						continue
+					try:
+						self._compact(symbol, timeframe)
+					except OSError as e:
+						log.warning("Could not compact %s %s bars yet: %s", symbol, timeframe, e)
+						self._uncompacted.add((symbol, timeframe))
+
+	def _compact(self, symbol: str, timeframe: str) -> None:
+		rows = self._disk_rows(symbol, timeframe)
+		base = {name: np.fromfile(self._path(symbol, timeframe, name), dtype=dt, count=rows) if rows else np.empty(0, dtype=dt) for name, dt in COLUMNS}
+		merged = self._combined(base, symbol, timeframe)
+		for name, dt in COLUMNS:
+			path = self._path(symbol, timeframe, name)
+			with open(path + ".tmp", "wb") as f:
+				f.write(np.ascontiguousarray(merged[name], dtype=dt).tobytes())
+				f.flush()
+				os.fsync(f.fileno())
+			os.replace(path + ".tmp", path)
+		os.remove(self._pending_path(symbol, timeframe))
+
+	def flush(self) -> None:
+		with self._lock:
+			for writers in self._writers.values():
+				for f in writers.values():
+					f.flush()
+
+	def _close_writers(self, symbol: str, timeframe: str) -> None:
+		key = (symbol.upper(), timeframe)
+		writers = self._writers.pop(key, None)
+		if writers:
+			for f in writers.values():
+				f.close()
+		self._counts.pop(key, None)
+		self._last_ts.pop(key, None)
+		pending = self._pending.pop(key, None)
+		if pending:
+			pending.close()
+
+	def close(self) -> None:
+		with self._lock:
+			for symbol, timeframe in set(self._writers) | set(self._pending):
+				self._close_writers(symbol, timeframe)
+
+	def count(self, symbol: str, timeframe: str = "1m") -> int:
+		with self._lock:
+			key = (symbol.upper(), timeframe)
+			if self._has_pending(symbol, timeframe):
+				return len(self.columns(symbol, timeframe)["ts"])
+			if key in self._counts:
+				return self._counts[key]
+			return self._disk_rows(symbol, timeframe)
+
+	def columns(self, symbol: str, timeframe: str = "1m") -> Dict[str, np.ndarray]:
+		# Read-only memory maps of every column (pending appends are flushed first). While a
+		# backfill is waiting in the pending segment the result is an in-memory merged copy.
+		with self._lock:
+			key = (symbol.upper(), timeframe)
+			writers = self._writers.get(key)
+			if writers:
+				for f in writers.values():
+					f.flush()
+			rows = self._counts.get(key, self._disk_rows(symbol, timeframe))
+			pending = self._has_pending(symbol, timeframe)
+		out: Dict[str, np.ndarray] = {}
+		for name, dt in COLUMNS:
+			if rows == 0:
+				out[name] = np.empty(0, dtype=dt)
+			else:
+				out[name] = np.memmap(self._path(symbol, timeframe, name), dtype=dt, mode="r", shape=(rows,))
+		if pending:
+			return self._combined(out, symbol, timeframe)
+		return out
+
+	def read(self, symbol: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None, timeframe: str = "1m") -> Dict[str, np.ndarray]:
+		# Zero-copy column slices for start_ts <= ts < end_ts
+		cols = self.columns(symbol, timeframe)
+		ts = cols["ts"]
+		lo = 0 if start_ts is None else int(np.searchsorted(ts, start_ts, side="left"))
+		hi = len(ts) if end_ts is None else int(np.searchsorted(ts, end_ts, side="left"))
+		return {name: arr[lo:hi] for name, arr in cols.items()}
+
+	def tail(self, symbol: str, n: int, timeframe: str = "1m") -> Dict[str, np.ndarray]:
+		cols = self.columns(symbol, timeframe)
+		return {name: arr[max(0, len(arr) - n):] for name, arr in cols.items()}
+
+	def read_rows(self, symbol: str, start_ts: Optional[int] = None, end_ts: Optional[int] = None, timeframe: str = "1m") -> np.ndarray:
+		cols = self.read(symbol, start_ts, end_ts, timeframe)
+		rows = np.empty(len(cols["ts"]), dtype=_ROW_DTYPE)
+		for name, _ in COLUMNS:
+			rows[name] = cols[name]
+		return rows
+
+
+def make_rows(ts, open_, high, low, close, volume) -> np.ndarray:
+	rows = np.empty(len(ts), dtype=_ROW_DTYPE)
+	rows["ts"] = ts
+	rows["open"] = open_
+	rows["high"] = high
+	rows["low"] = low
+	rows["close"] = close
+	rows["volume"] = volume
+	return rows
+
+
+if __name__ == "__main__":
+	# python bar_store.py                      -> list stored symbols and row counts
+	# python bar_store.py import FILE [SYMBOL] -> load a CSV/Parquet of 1-minute bars into the store
+	import sys
+	store = BarStore()
+	if len(sys.argv) >= 3 and sys.argv[1] == "import":
+		from backtest import load_bars
+		path = sys.argv[2]
+		symbol = sys.argv[3] if len(sys.argv) > 3 else os.path.splitext(os.path.basename(path))[0]
+		bars = load_bars(path)
+		added = store.append_rows(symbol, make_rows(bars.ts, bars.open, bars.high, bars.low, bars.close, bars.volume))
+		store.close()
+		print(f"{symbol.upper()}: {added} row(s) added, {store.count(symbol)} stored.")
+	else:
+		for symbol in store.symbols():
+			for timeframe in sorted(os.listdir(os.path.join(store.root, symbol))):
+				print(f"{symbol:<12} {timeframe:<6} {store.count(symbol, timeframe):>10}")
@@ -0,0 +1,220 @@
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+import metrics
+from engine import MultiTrader
+from journal import Journal
+from state import StateStore
+
+# Offline benchmark of the trading loop: synthetic prices, a fake broker with injected latency and
+# failures, and the real MultiTrader/RuleEngine/StateStore/journal/bar store underneath.
+# Each symbol count runs in a fresh process so memory numbers do not leak between runs.
+
+
+class PriceSim:
+	# Geometric random walk per symbol, advanced once per round
+	def __init__(self, symbols: List[str], seed: int = 0, start: float = 100.0, vol: float = 0.002) -> None:
+		self.rng = np.random.default_rng(seed)
+		self.index = {s: i for i, s in enumerate(symbols)}
+		self.prices = start * np.exp(self.rng.normal(0.0, 0.1, len(symbols)))
+		self.vol = vol
+
+	def step(self) -> None:
+		self.prices *= np.exp(self.rng.normal(0.0, self.vol, len(self.prices)))
+
+	def price(self, symbol: str) -> float:
+		return float(self.prices[self.index[symbol]])
+
+
+class FakeBreeze:
+	# Stands in for BreezeClient: get_ltp/place_market_order/get_order_status with lognormal latency
+	# (median latency_ms) and a failure rate split between exceptions and empty quotes
+	def __init__(self, sim: PriceSim, latency_ms: float = 20.0, fail_rate: float = 0.0, seed: int = 0) -> None:
+		self.sim = sim
+		self.latency_sec = latency_ms / 1000.0
+		self.fail_rate = fail_rate
+		self._rng = random.Random(seed)
+		self._orders: Dict[str, float] = {}
+		self.calls = 0
+		self.failures = 0
+
+	def _delay(self) -> None:
+		if self.latency_sec > 0:
+			time.sleep(self.latency_sec * self._rng.lognormvariate(0.0, 0.5))
+
+	def get_ltp(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		self.calls += 1
+		self._delay()
+		if self._rng.random() < self.fail_rate:
+			self.failures += 1
+			if self._rng.random() < 0.5:
+				raise RuntimeError("injected quote failure")
+			return None
+		return self.sim.price(stock_code)
+
+	def place_market_order(self, stock_code: str, exchange_code: str, action: str, quantity: int, **kwargs: Any) -> Dict[str, Any]:
+		self._delay()
+		order_id = str(len(self._orders) + 1)
+		self._orders[order_id] = self.sim.price(stock_code)
+		return {"Success": {"order_id": order_id, "message": "ok"}, "Status": 200, "Error": None}
+
+	def get_order_status(self, order_id: str, exchange_code: str = "NSE") -> Dict[str, Any]:
+		self._delay()
+		return {"Success": [{"order_id": order_id, "status": "Executed", "average_price": self._orders[order_id], "quantity": "1", "pending_quantity": "0"}]}
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+	if not values:
+		return {"p50": 0.0, "p90": 0.0, "p99": 0.0, "max": 0.0}
+	arr = np.asarray(values)
+	return {
+		"p50": float(np.percentile(arr, 50)),
+		"p90": float(np.percentile(arr, 90)),
+		"p99": float(np.percentile(arr, 99)),
+		"max": float(arr.max()),
+	}
+
+
+def run_case(n_symbols: int, rounds: int, latency_ms: float, fail_rate: float, seed: int, rules_path: str,
+			 async_orders: bool, trace_memory: bool) -> Dict[str, Any]:
+	workdir = tempfile.mkdtemp(prefix="bench-")
+	logging.getLogger().addHandler(logging.NullHandler())  # trader log lines are not part of the benchmark
+	try:
+		with open(rules_path, "r") as f:
+			cfg = json.load(f)
+		cfg.update({
+			"quote_source": "breeze",
+			"debug": False,
+			"warm_start": False,
+			"metrics_port": 0,
+			"metrics_log_sec": 0,
+			"order_async": async_orders,
+			"quote_cache_size": 0,  # every round must reach the (fake) broker
+			"state_flush_sec": 1,
+			"bar_store_dir": os.path.join(workdir, "bars"),
+		})
+		bench_rules = os.path.join(workdir, "rules.config")
+		with open(bench_rules, "w") as f:
+			json.dump(cfg, f)
+
+		symbols = [f"SYM{i:04d}" for i in range(n_symbols)]
+		sim = PriceSim(symbols, seed)
+		client = FakeBreeze(sim, latency_ms, fail_rate, seed)
+		store = StateStore(
+			path=os.path.join(workdir, "state.json"),
+			lock_path=os.path.join(workdir, "state.json.lock"),
+			journal=Journal(os.path.join(workdir, "journal")),
+		)
+		if trace_memory:
+			tracemalloc.start()
+		trader = MultiTrader(client, [(s, s) for s in symbols], rules_path=bench_rules, store=store)
+		for t in trader.traders:
+			t.rules.is_market_open = lambda: True  # benchmark runs at any hour
+		metrics.REGISTRY.reset()
+
+		round_sec: List[float] = []
+		with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+			started = time.perf_counter()
+			for _ in range(rounds):
+				sim.step()
+				t0 = time.perf_counter()
+				trader.run_once()
+				round_sec.append(time.perf_counter() - t0)
+			elapsed = time.perf_counter() - started
+			if trader.orders is not None:
+				trader.orders.close()
+			store.close()
+			if trader.bars is not None:
+				trader.bars.close()
+
+		snap = metrics.REGISTRY.snapshot()
+		decision = snap["histograms"].get("decision_seconds", {}).get((), {})
+		snapshot_state = store.snapshot()
+		result = {
+			"symbols": n_symbols,
+			"rounds": rounds,
+			"ticks": n_symbols * rounds,
+			"elapsed_sec": elapsed,
+			"ticks_per_sec": n_symbols * rounds / elapsed if elapsed > 0 else 0.0,
+			"round_ms": {k: v * 1000 for k, v in _percentiles(round_sec).items()},
+			"decision_us": {f"p{int(q * 100)}": v * 1e6 for q, v in decision.get("quantiles", {}).items()},
+			# Order placement, timed apart from the decision; inline orders wait for the broker here
+			"execute_ms": {
+				dict(key).get("action", ""): {f"p{int(q * 100)}": v * 1000 for q, v in s["quantiles"].items()}
+				for key, s in snap["histograms"].get("execute_seconds", {}).items()
+			},
+			"quote_calls": client.calls,
+			"quote_failures": client.failures,
+			"orders": len(client._orders),
+			"open_positions": sum(1 for slot in snapshot_state.get("symbols", {}).values() if slot.get("position")),
+			"max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+		}
+		if trace_memory:
+			_, peak = tracemalloc.get_traced_memory()
+			tracemalloc.stop()
+			result["traced_peak_mb"] = peak / (1024.0 * 1024.0)
+		return result
+	finally:
+		shutil.rmtree(workdir, ignore_errors=True)
+
+
+_HEADER = f"{'symbols':>8} {'ticks':>8} {'ticks/s':>10} {'round p50':>10} {'round p99':>10} {'dec p50':>9} {'dec p99':>9} {'exec p99':>9} {'orders':>7} {'rss MB':>8}"
+
+
+def _format_row(r: Dict[str, Any]) -> str:
+	line = (
+		f"{r['symbols']:>8} {r['ticks']:>8} {r['ticks_per_sec']:>10.0f} "
+		f"{r['round_ms']['p50']:>8.1f}ms {r['round_ms']['p99']:>8.1f}ms "
+		f"{r['decision_us'].get('p50', 0):>7.0f}us {r['decision_us'].get('p99', 0):>7.0f}us "
+		f"{max([q.get('p99', 0.0) for q in r['execute_ms'].values()] or [0.0]):>7.1f}ms "
+		f"{r['orders']:>7} {r['max_rss_mb']:>8.1f}"
+	)
+	if "traced_peak_mb" in r:
+		line += f"  traced peak {r['traced_peak_mb']:.1f} MB"
+	return line
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	ap = argparse.ArgumentParser(description="Benchmark the trading loop against a simulated market and broker.")
+	ap.add_argument("--symbols", default="1,50,500", help="comma-separated symbol counts")
+	ap.add_argument("--rounds", type=int, default=50, help="polling rounds per symbol count")
+	ap.add_argument("--latency-ms", type=float, default=20.0, help="median injected quote/order latency")
+	ap.add_argument("--fail-rate", type=float, default=0.02, help="fraction of quote calls that fail")
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--rules", default="rules.config")
+	ap.add_argument("--async-orders", action="store_true", help="use the background order manager")
+	ap.add_argument("--tracemalloc", action="store_true", help="also report Python heap peak (slower)")
+	ap.add_argument("--json", help="write results to this file for later comparison")
+	args = ap.parse_args(argv)
+
+	results = []
+	print(_HEADER)
+	for n in [int(x) for x in args.symbols.split(",") if x.strip()]:
+		# Fresh interpreter per case: clean RSS, metrics and quote-health state
+		with ProcessPoolExecutor(max_workers=1) as pool:
+			results.append(pool.submit(
+				run_case, n, args.rounds, args.latency_ms, args.fail_rate, args.seed, args.rules,
+				args.async_orders, args.tracemalloc,
+			).result())
+		print(_format_row(results[-1]))
+	if args.json:
+		with open(args.json, "w") as f:
+			json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
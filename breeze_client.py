@@ -1,15 +1,53 @@
 import json
+import logging
 import time
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from breeze_connect import BreezeConnect
 
+import metrics
+from rate_limit import RateLimited, RequestScheduler
+from source_health import SourceHealth, SourceSkipped
+
+log = logging.getLogger(__name__)
+
+_THROTTLE_MARKERS = ("limit exceed", "rate limit", "too many requests", "429")
+
+
+def _is_throttled(message: str) -> bool:
+	message = message.lower()
+	return any(marker in message for marker in _THROTTLE_MARKERS)
+
+
+def _ltp_from_rows(resp: Dict[str, Any], keys: Tuple[str, ...], first: bool) -> Optional[float]:
+	# Breeze reports errors as {"Success": None, "Status": 500, "Error": ...}; treat as no data
+	data = resp.get("Success") or resp.get("data") or []
+	if not data:
+		return None
+	row = data[0] if first else data[-1]
+	for key in keys:
+		if key in row and row[key] is not None:
+			return float(row[key])
+	return None
+
 
 class BreezeClient:
-	def __init__(self, creds_path: str = "creds.config") -> None:
+	def __init__(self,
+				 creds_path: str = "creds.config",
+				 rate_per_min: float = 100.0,
+				 burst: int = 5,
+				 order_reserve: int = 1,
+				 quote_wait_sec: float = 2.0,
+				 throttle_pause_sec: float = 10.0) -> None:
 		self.creds_path = creds_path
 		self._breeze: Optional[BreezeConnect] = None
+		self.health = SourceHealth()
+		# Every REST call below goes through one scheduler: orders first, then quotes, then history
+		self.scheduler = RequestScheduler(rate_per_min, burst, order_reserve)
+		self.quote_wait_sec = quote_wait_sec
+		self.throttle_pause_sec = throttle_pause_sec
+		metrics.REGISTRY.add_collector("breeze_rate", self._publish_rate_metrics)
 
 	def connect(self) -> None:
 		with open(self.creds_path, "r") as f:
@@ -29,65 +67,134 @@ class BreezeClient:
 			raise RuntimeError("BreezeClient not connected. Call connect().")
 		return self._breeze
 
-	def get_ltp(self, stock_code: str, exchange_code: str) -> Optional[float]:
+	def _call(self, lane: str, method: str, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+		# Waits for a slot in `lane` (RateLimited on backpressure), then calls breeze.<method>
 		breeze = self._ensure()
-		# 1) Try real-time quotes (cash)
-		try:
-			resp: Dict[str, Any] = breeze.get_quotes(
-				stock_code=stock_code,
-				exchange_code=exchange_code,
-				product_type="cash",
-			)
-			data = resp.get("Success") or resp.get("data") or []
-			if data:
-				row = data[0]
-				for key in ("ltp", "LTP", "last_traded_price"):
-					if key in row and row[key] is not None:
-						return float(row[key])
-			else:
-				print("Breeze get_quotes returned empty for cash product.")
-		except Exception as e:
-			print(f"Breeze get_quotes error (cash): {e}")
-		# 1b) Try quotes without product_type
 		try:
-			resp2: Dict[str, Any] = breeze.get_quotes(
-				stock_code=stock_code,
-				exchange_code=exchange_code,
-			)
-			data2 = resp2.get("Success") or resp2.get("data") or []
-			if data2:
-				row = data2[0]
-				for key in ("ltp", "LTP", "last_traded_price"):
-					if key in row and row[key] is not None:
-						return float(row[key])
-			else:
-				print("Breeze get_quotes returned empty (no product_type).")
-		except Exception as e:
-			print(f"Breeze get_quotes error: {e}")
-		# 2) Fall back to short historical window (last 10–15 minutes)
+			waited = self.scheduler.acquire(lane, timeout)
+		except RateLimited:
+			metrics.inc("breeze_rate_limited_total", lane=lane)
+			raise
+		metrics.observe("breeze_rate_wait_seconds", waited, lane=lane)
 		try:
-			to_dt = datetime.now(timezone.utc)
-			from_dt = to_dt - timedelta(minutes=15)
-			resp3: Dict[str, Any] = breeze.get_historical_data(
-				interval="1minute",
-				from_date=from_dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-				to_date=to_dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
-				stock_code=stock_code,
-				exchange_code=exchange_code,
-				product_type="cash",
-			)
-			data3 = resp3.get("Success") or resp3.get("data") or []
-			if data3:
-				row = data3[-1]
-				for key in ("close", "Close", "ltp", "LTP"):
-					if key in row and row[key] is not None:
-						return float(row[key])
-			else:
-				print("Breeze historical returned empty.")
+			with metrics.span("breeze_call_seconds", method=method):
+				resp = getattr(breeze, method)(**kwargs)
 		except Exception as e:
-			print(f"Breeze historical error: {e}")
+			if _is_throttled(str(e)):
+				metrics.inc("breeze_throttled_total", method=method)
+				self.scheduler.penalize(self.throttle_pause_sec)
+			raise
+		if isinstance(resp, dict) and (resp.get("Status") == 429 or _is_throttled(str(resp.get("Error") or ""))):
+			log.warning("Breeze throttled %s; pausing requests for %.0fs", method, self.throttle_pause_sec)
+			metrics.inc("breeze_throttled_total", method=method)
+			self.scheduler.penalize(self.throttle_pause_sec)
+		return resp
+
+	def _publish_rate_metrics(self) -> None:
+		# Scheduler levels as gauges; grants, rejections and throttles are counted as they happen
+		m = self.scheduler.metrics()
+		metrics.set_gauge("breeze_rate_tokens", m["tokens"])
+		metrics.set_gauge("breeze_rate_paused_seconds", m["paused_sec"])
+		for lane, s in m["lanes"].items():
+			metrics.set_gauge("breeze_rate_waiting", s["waiting"], lane=lane)
+			metrics.set_gauge("breeze_rate_wait_max_seconds", s["wait_max_sec"], lane=lane)
+
+	def _ltp_quotes_cash(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		# 1) Real-time quotes (cash)
+		resp: Dict[str, Any] = self._call(
+			"quote",
+			"get_quotes",
+			timeout=self.quote_wait_sec,
+			stock_code=stock_code,
+			exchange_code=exchange_code,
+			product_type="cash",
+		)
+		return _ltp_from_rows(resp, ("ltp", "LTP", "last_traded_price"), first=True)
+
+	def _ltp_quotes(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		# 1b) Quotes without product_type
+		resp: Dict[str, Any] = self._call(
+			"quote",
+			"get_quotes",
+			timeout=self.quote_wait_sec,
+			stock_code=stock_code,
+			exchange_code=exchange_code,
+		)
+		return _ltp_from_rows(resp, ("ltp", "LTP", "last_traded_price"), first=True)
+
+	def _ltp_historical(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		# 2) Short historical window (last 10–15 minutes); used as a quote, so it queues as one
+		to_dt = datetime.now(timezone.utc)
+		from_dt = to_dt - timedelta(minutes=15)
+		resp: Dict[str, Any] = self._call(
+			"quote",
+			"get_historical_data",
+			timeout=self.quote_wait_sec,
+			interval="1minute",
+			from_date=from_dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+			to_date=to_dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+			stock_code=stock_code,
+			exchange_code=exchange_code,
+			product_type="cash",
+		)
+		return _ltp_from_rows(resp, ("close", "Close", "ltp", "LTP"), first=False)
+
+	def get_ltp(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		self._ensure()
+		methods = {
+			"quotes_cash": self._ltp_quotes_cash,
+			"quotes": self._ltp_quotes,
+			"historical": self._ltp_historical,
+		}
+		# Last working method first; methods in backoff (e.g. "Check stock code" 500s) are skipped.
+		# RateLimited (our own backpressure) propagates as SourceSkipped: nothing was asked.
+		names = self.health.order(stock_code, "breeze", list(methods))
+		if not names:
+			raise SourceSkipped(f"all Breeze quote methods backing off for {stock_code}")
+		for name in names:
+			try:
+				ltp = methods[name](stock_code, exchange_code)
+			except RateLimited:
+				raise
+			except Exception as e:
+				self.health.record_failure(stock_code, "breeze", name, str(e))
+				continue
+			if ltp is not None:
+				self.health.record_success(stock_code, "breeze", name)
+				return ltp
+			self.health.record_failure(stock_code, "breeze", name, "empty response")
 		return None
 
+	def get_historical_bars(self,
+							stock_code: str,
+							exchange_code: str,
+							from_dt: datetime,
+							to_dt: datetime,
+							interval: str = "1minute",
+							chunk: timedelta = timedelta(days=2)) -> List[Dict[str, Any]]:
+		# Breeze caps rows per call, so long ranges are fetched in chunks and concatenated
+		self._ensure()
+		rows: List[Dict[str, Any]] = []
+		cur = from_dt
+		while cur < to_dt:
+			nxt = min(cur + chunk, to_dt)
+			try:
+				resp: Dict[str, Any] = self._call(
+					"history",
+					"get_historical_data",
+					interval=interval,
+					from_date=cur.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+					to_date=nxt.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+					stock_code=stock_code,
+					exchange_code=exchange_code,
+					product_type="cash",
+				)
+				rows.extend(resp.get("Success") or resp.get("data") or [])
+			except Exception as e:
+				log.warning("Breeze historical error (%s): %s", f"{cur:%Y-%m-%d}", e)
+			cur = nxt
+		return rows
+
 	def place_market_order(self,
 						 stock_code: str,
 						 exchange_code: str,
@@ -95,7 +202,7 @@ class BreezeClient:
 						 quantity: int,
 						 product: str = "cash",
 						 validity: str = "DAY") -> Dict[str, Any]:
-		breeze = self._ensure()
+		self._ensure()
 		if action not in ("BUY", "SELL"):
 			raise ValueError("action must be BUY or SELL")
 		payload = {
@@ -107,9 +214,48 @@ class BreezeClient:
 			"quantity": int(quantity),
 			"validity": validity,
 		}
-		resp: Dict[str, Any] = breeze.place_order(**payload)
+		resp: Dict[str, Any] = self._call("order", "place_order", **payload)
 		return resp
 
-	def get_order_status(self, order_id: str) -> Dict[str, Any]:
+	def start_stream(self,
+					 stock_codes: List[str],
+					 exchange_code: str,
+					 on_ticks: Callable[[Dict[str, Any]], None]) -> Dict[str, str]:
+		# Subscribe to Breeze's websocket exchange-quote feed; returns feed token -> stock_code
+		breeze = self._ensure()
+		breeze.ws_connect()
+		breeze.on_ticks = on_ticks
+		tokens: Dict[str, str] = {}
+		for code in stock_codes:
+			try:
+				names = breeze.get_names(exchange_code=exchange_code, stock_code=code) or {}
+				token = names.get("isec_token_level1")
+				if token:
+					tokens[str(token)] = code
+			except Exception as e:
+				log.warning("Breeze get_names error for %s: %s", code, e)
+			# One symbol that cannot be subscribed must not stop the feed for the others
+			try:
+				breeze.subscribe_feeds(
+					exchange_code=exchange_code,
+					stock_code=code,
+					product_type="cash",
+					get_exchange_quotes=True,
+					get_market_depth=False,
+				)
+			except Exception as e:
+				log.warning("Breeze subscribe_feeds error for %s: %s", code, e)
+				self.health.record_failure(code, "breeze", "subscribe_feeds", str(e))
+			else:
+				self.health.record_success(code, "breeze", "subscribe_feeds")
+		return tokens
+
+	def stop_stream(self) -> None:
 		breeze = self._ensure()
-		return breeze.get_order_detail(exchange_code="NSE", order_id=order_id)
+		try:
+			breeze.ws_disconnect()
+		except Exception as e:
+			log.warning("Breeze ws_disconnect error: %s", e)
+
+	def get_order_status(self, order_id: str, exchange_code: str = "NSE") -> Dict[str, Any]:
+		return self._call("order", "get_order_detail", exchange_code=exchange_code, order_id=order_id)
@@ -0,0 +1,43 @@
+import time
+
+# Time source for the trading loop. Live trading uses the system clock; replays swap in a
+# VirtualClock so market-hours checks and the sleeps between polls follow simulated time.
+
+
+class SystemClock:
+	def time(self) -> float:
+		return time.time()
+
+	def monotonic(self) -> float:
+		return time.monotonic()
+
+	def sleep(self, seconds: float) -> None:
+		time.sleep(seconds)
+
+
+class VirtualClock(SystemClock):
+	# Starts at start_ts (epoch seconds) and only moves through sleep()/advance_to(). speed=100
+	# also waits 1/100 of each sleep in real time; speed=0 runs as fast as possible.
+	def __init__(self, start_ts: float, speed: float = 0.0) -> None:
+		self._now = float(start_ts)
+		self.speed = max(0.0, float(speed))
+
+	def time(self) -> float:
+		return self._now
+
+	def monotonic(self) -> float:
+		return self._now
+
+	def sleep(self, seconds: float) -> None:
+		if seconds <= 0:
+			return
+		if self.speed > 0:
+			time.sleep(seconds / self.speed)
+		self._now += seconds
+
+	def advance_to(self, ts: float) -> None:
+		if ts > self._now:
+			self.sleep(ts - self._now)
+
+
+SYSTEM = SystemClock()
@@ -0,0 +1,455 @@
+import asyncio
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from clock import SYSTEM, SystemClock
+from rules import RuleEngine
+from bar_store import BarStore
+from journal import Journal
+from orders import OrderManager
+from risk import PortfolioRisk
+from state import StateStore, STATE_FILE, LOCK_FILE
+from prices import configure_http, warm_connections
+from quote_router import configure_cache, get_ltp, get_ltp_async, get_ltps_batch, size_executor, DEFAULT_SOURCES
+from stream import TickTable, BreezeStream, FakeFeedClient
+from event_core import EventCore, OrderIntent
+from warmup import warm_start
+from log_setup import event
+
+log = logging.getLogger(__name__)
+
+_IDLE_CHECK_SEC = 900.0  # a closed-market sleep wakes this often to re-check the calendar
+
+
+def fill_price_from_response(resp: Any, fallback: float) -> float:
+	avg_price = fallback
+	try:
+		odata = resp.get("Success") or resp.get("data") or {}
+		avg_price = float(odata.get("average_price") or odata.get("avg_price") or avg_price)
+	except Exception:
+		pass
+	return avg_price
+
+
+# Buy/sell/re-entry state machine for one symbol (the per-tick body of the trader loop)
+class SymbolTrader:
+	def __init__(self,
+				 display_symbol: str,
+				 breeze_code: str,
+				 rules: RuleEngine,
+				 client,
+				 store: StateStore,
+				 orders: Optional[OrderManager] = None,
+				 risk: Optional[PortfolioRisk] = None) -> None:
+		self.display_symbol = display_symbol
+		self.breeze_code = breeze_code
+		self.rules = rules
+		self.client = client
+		self.store = store
+		self.orders = orders
+		self.risk = risk
+		self.immediate_bought = False
+		self.inflight = False  # an order intent has been emitted and not yet executed
+
+	def _log(self, msg: str, *args: Any, level: int = logging.INFO) -> None:
+		# Lazy %-style args: nothing is formatted unless the level is enabled
+		if args:
+			log.log(level, "[%s] " + msg, self.display_symbol, *args)
+		else:
+			log.log(level, "[%s] %s", self.display_symbol, msg)
+
+	def fetch_ltp(self) -> Optional[float]:
+		if self.rules.quote_source == "breeze":
+			return get_ltp(self.breeze_code, self.rules.exchange_code, self.client, sources=("breeze",))
+		return get_ltp(self.display_symbol, self.rules.exchange_code, self.client)
+
+	async def fetch_ltp_async(self) -> Optional[float]:
+		if self.rules.quote_source == "breeze":
+			symbol, sources = self.breeze_code, ("breeze",)
+		else:
+			symbol, sources = self.display_symbol, DEFAULT_SOURCES
+		try:
+			return await get_ltp_async(
+				symbol,
+				self.rules.exchange_code,
+				self.client,
+				budget_sec=self.rules.quote_budget_sec,
+				hedge_sec=self.rules.quote_hedge_sec,
+				sources=sources,
+			)
+		except Exception as e:
+			self._log("LTP fetch error: %s", e, level=logging.WARNING)
+			return None
+
+	def _buy(self, ltp: float) -> None:
+		if self.orders is not None:
+			# Fill price and position are recorded by the order manager once the broker confirms
+			self.orders.submit(self.display_symbol, self.breeze_code, self.rules.exchange_code, "BUY", self.rules.quantity, ltp)
+			return
+		resp = self.client.place_market_order(
+			stock_code=self.breeze_code,
+			exchange_code=self.rules.exchange_code,
+			action="BUY",
+			quantity=self.rules.quantity,
+		)
+		avg_price = fill_price_from_response(resp, ltp)
+		self.store.set_position(self.display_symbol, self.rules.quantity, avg_price, per_symbol=True)
+		self._log("Bought qty=%s avg_price=%s", self.rules.quantity, avg_price)
+		event("fill", symbol=self.display_symbol, action="BUY", qty=self.rules.quantity, price=avg_price, expected_price=ltp)
+
+	def _sell(self, ltp: float, pos: Dict[str, Any], reason: str) -> None:
+		# Sell what is held, which is less than the configured quantity after a partial fill
+		qty = int(pos.get("qty", 0) or 0) or self.rules.quantity
+		if self.orders is not None:
+			self.orders.submit(self.display_symbol, self.breeze_code, self.rules.exchange_code, "SELL", qty, ltp, reason)
+			return
+		avg_buy = float(pos.get("avg_price", 0))
+		self.client.place_market_order(
+			stock_code=self.breeze_code,
+			exchange_code=self.rules.exchange_code,
+			action="SELL",
+			quantity=qty,
+		)
+		# Realized PnL
+		pnl = (ltp - avg_buy) * float(pos.get("qty", 0) or 0)
+		total = self.store.record_sell(self.display_symbol, pnl, ltp)
+		self._log("Sold due to %s at approx %s; trade PnL=%.2f; total PnL=%.2f", reason, ltp, pnl, total)
+		event("fill", symbol=self.display_symbol, action="SELL", qty=qty, price=ltp, expected_price=ltp, reason=reason, pnl=pnl)
+
+	def decide(self, ltp: Optional[float], volume: Optional[float] = None) -> Optional[OrderIntent]:
+		# Pure decision step: updates the price window and returns what to trade, if anything.
+		# The intent is marked in flight so later ticks wait until execution reports back.
+		# volume (quantity traded since the previous tick) only comes from the stream.
+		self._log("LTP=%s", ltp, level=logging.DEBUG)
+		if ltp is None:
+			self._log("No LTP yet...")
+			return None
+
+		if not self.rules.is_market_open():
+			self._log("Market closed; no new orders.", level=logging.DEBUG)
+			return None
+
+		if self.inflight or (self.orders is not None and self.orders.pending(self.display_symbol) is not None):
+			self._log("order in flight; waiting for fill.", level=logging.DEBUG)
+			return None
+
+		intent: Optional[OrderIntent] = None
+		pos = self.store.get_position(self.display_symbol)
+		if pos is None:
+			# Optional re-entry: if we sold higher and price is now lower, allow immediate buy
+			last_sell = self.store.get_last_sell_price(self.display_symbol)
+			if last_sell is not None and ltp < last_sell:
+				self._log("BUY (price below last sell %s) at %s", last_sell, ltp)
+				intent = OrderIntent(self.display_symbol, "BUY", self.rules.quantity, ltp, "reentry")
+				# do not clear last_sell; it is for reference only
+			elif self.rules.buy_immediate_on_start and not self.immediate_bought:
+				# One-time immediate buy on start, if enabled
+				self._log("BUY (immediate on start) at %s", ltp)
+				intent = OrderIntent(self.display_symbol, "BUY", self.rules.quantity, ltp, "immediate")
+			else:
+				# No position: update window and check for entry
+				self.rules.update_price(ltp, volume)
+				if not self.rules.ready() and not self.rules.buy_immediate_on_start:
+					self._log("warming up price window...", level=logging.DEBUG)
+				elif self.rules.should_buy(ltp):
+					self._log("BUY signal at %s", ltp)
+					intent = OrderIntent(self.display_symbol, "BUY", self.rules.quantity, ltp, "signal")
+				else:
+					self._log("no buy trigger yet.", level=logging.DEBUG)
+		else:
+			# Have a position: check for exit
+			avg_buy = float(pos.get("avg_price", 0))
+			self.rules.track_price(ltp, volume)
+			should_exit, reason = self.rules.should_sell(ltp, avg_buy)
+			if should_exit:
+				self._log("SELL signal (%s) at %s", reason, ltp)
+				intent = OrderIntent(self.display_symbol, "SELL", self.rules.quantity, ltp, reason)
+			else:
+				self._log("holding; no exit trigger.", level=logging.DEBUG)
+		if intent is not None:
+			event("signal", symbol=self.display_symbol, action=intent.action, reason=intent.reason, price=ltp)
+			self.inflight = True
+		return intent
+
+	def execute(self, intent: OrderIntent) -> None:
+		# Blocking broker call when there is no order manager; otherwise just hands the order over
+		if intent.action == "BUY":
+			if self.risk is not None:
+				blocked = self.risk.check(self.display_symbol, "BUY", intent.qty, intent.price)
+				if blocked is not None:
+					self._log("BUY blocked by %s limit.", blocked, level=logging.WARNING)
+					event("risk_reject", symbol=self.display_symbol, action="BUY", qty=intent.qty, price=intent.price, limit=blocked)
+					return
+				if self.orders is None:
+					try:
+						self._buy(intent.price)
+					finally:
+						self.risk.release(self.display_symbol)
+					self._bought(intent)
+					return
+			self._buy(intent.price)
+			self._bought(intent)
+			return
+		pos = self.store.get_position(self.display_symbol)
+		if pos is None:
+			self._log("SELL skipped; no open position.", level=logging.WARNING)
+			return
+		self._sell(intent.price, pos, intent.reason)
+
+	def _bought(self, intent: OrderIntent) -> None:
+		# The one-time immediate buy is used up only once a buy has really gone out; one blocked by
+		# a risk limit is tried again on a later tick
+		if intent.reason in ("immediate", "reentry"):
+			self.immediate_bought = True
+
+	def on_price(self, ltp: Optional[float], volume: Optional[float] = None) -> None:
+		# Synchronous decide + execute, used by the polling/streaming loops and benchmarks
+		intent = self.decide(ltp, volume)
+		if intent is None:
+			return
+		try:
+			self.execute(intent)
+		finally:
+			self.inflight = False
+
+
+# Drives one SymbolTrader per configured symbol from a single scheduler over a shared client
+class MultiTrader:
+	def __init__(self,
+				 client,
+				 entries: List[Tuple[str, str]],
+				 rules_path: str = "rules.config",
+				 store: Optional[StateStore] = None,
+				 clock: Optional[SystemClock] = None) -> None:
+		if not entries:
+			raise ValueError("No symbols configured")
+		self.client = client
+		self.clock = clock or SYSTEM
+		rules = [RuleEngine(rules_path) for _ in entries]
+		for r in rules:
+			r.clock = self.clock.time
+		# A cached price must never answer the same symbol's next poll, so TTLs stay under half the interval
+		ttl_cap = float(rules[0].poll_interval_sec) / 2.0
+		ttl = {source: min(sec, ttl_cap) for source, sec in rules[0].quote_cache_ttl.items()}
+		configure_cache(rules[0].quote_cache_size, ttl, rules[0].quote_cache_address, rules[0].quote_budget_sec)
+		size_executor(len(entries))
+		configure_http(rules[0].http_pool_size, rules[0].nse_cookie_refresh_sec, rules[0].http2)
+		if store is None:
+			# Paper trading keeps its positions and journal apart from the live ones
+			base = rules[0].paper_dir if rules[0].paper_trading else ""
+			if base:
+				os.makedirs(base, exist_ok=True)
+			journal_dir = os.path.join(base, rules[0].journal_dir) if rules[0].journal_dir else ""
+			journal = Journal(journal_dir) if journal_dir else None
+			store = StateStore(
+				path=os.path.join(base, STATE_FILE),
+				lock_path=os.path.join(base, LOCK_FILE),
+				flush_interval_sec=rules[0].state_flush_sec,
+				journal=journal,
+				compact_every=rules[0].journal_compact_every,
+				keep_journal_history=rules[0].journal_keep_history,
+			)
+		self.store = store
+		# A simulated broker fills against the prices the trader sees
+		self._price_sink = getattr(client, "update_price", None)
+		# Every live price is appended to the local tick store for warmup, backtests and charts
+		self.bars: Optional[BarStore] = BarStore(rules[0].bar_store_dir) if rules[0].bar_store_dir else None
+		self.orders: Optional[OrderManager] = None
+		if rules[0].order_async:
+			# Orders run off the quote loop; the fill price comes from get_order_status
+			self.orders = OrderManager(client, self.store, rules[0].order_poll_sec, rules[0].order_fill_timeout_sec)
+			self.orders.resume(rules[0].exchange_code, {display.upper(): code for display, code in entries})
+		self.risk: Optional[PortfolioRisk] = None
+		r0 = rules[0]
+		if r0.max_gross_exposure > 0 or r0.max_daily_loss > 0 or r0.max_symbol_exposure > 0 or r0.symbol_exposure_limits:
+			# Portfolio limits checked before every buy; positions follow the state store
+			self.risk = PortfolioRisk(
+				[display for display, _ in entries],
+				r0.max_gross_exposure,
+				r0.max_daily_loss,
+				r0.max_symbol_exposure,
+				r0.symbol_exposure_limits,
+				r0.market_tz,
+				self.clock.time,
+			)
+			self.risk.load(self.store.snapshot())
+			self.risk.load_realized(self.store.recent_sells())
+			self.store.add_listener(self.risk.on_record)
+			if self.orders is not None:
+				risk = self.risk
+				self.orders.add_listener(lambda order: risk.release(order.symbol))
+		self.traders: List[SymbolTrader] = [
+			SymbolTrader(display, breeze_code, rule_engine, client, self.store, self.orders, self.risk)
+			for (display, breeze_code), rule_engine in zip(entries, rules)
+		]
+		self.poll_interval_sec: float = float(self.traders[0].rules.poll_interval_sec)
+		self._stop = threading.Event()
+		self._core: Optional[EventCore] = None
+
+	def stop(self) -> None:
+		# Ends run_events/run_streaming/run_polling after the current round; safe from any thread
+		self._stop.set()
+		core = self._core
+		if core is not None:
+			core.stop()
+
+	async def _fetch_all(self) -> List[Optional[float]]:
+		return await asyncio.gather(*[t.fetch_ltp_async() for t in self.traders])
+
+	def _fetch_round(self) -> List[Optional[float]]:
+		rules = self.traders[0].rules
+		if rules.quote_source == "breeze":
+			# Breeze quotes are per symbol: fetch them concurrently within quote_budget_sec
+			return asyncio.run(self._fetch_all())
+		return self._fetch_batch()
+
+	def _fetch_batch(self) -> List[Optional[float]]:
+		# yfinance/NSE answer the whole watchlist in one request per source (blocking)
+		rules = self.traders[0].rules
+		got = get_ltps_batch([t.display_symbol for t in self.traders], rules.exchange_code, self.client, rules.quote_budget_sec)
+		return [got.get(t.display_symbol) for t in self.traders]
+
+	def _record_tick(self, trader: SymbolTrader, ltp: Optional[float], volume: Optional[float] = None) -> None:
+		if self._price_sink is not None and ltp is not None:
+			self._price_sink(trader.breeze_code, ltp, trader.rules.exchange_code)
+		if self.bars is not None and ltp is not None:
+			try:
+				self.bars.append_tick(trader.display_symbol, ltp, volume=volume or 0.0)
+			except Exception as e:
+				trader._log("Bar store error: %s", e, level=logging.WARNING)
+
+	def _dispatch(self, trader: SymbolTrader, ltp: Optional[float], volume: Optional[float] = None) -> None:
+		# Same steps as SymbolTrader.on_price, timed apart: decision_seconds is the strategy alone
+		# (as in the event core), execute_seconds includes any broker round trip made inline
+		self._record_tick(trader, ltp, volume)
+		try:
+			with metrics.span("decision_seconds"):
+				intent = trader.decide(ltp, volume)
+			if intent is None:
+				return
+			try:
+				with metrics.span("execute_seconds", action=intent.action):
+					trader.execute(intent)
+			finally:
+				trader.inflight = False
+		except Exception as e:
+			# One symbol's broker/state error must not stop the others
+			trader._log("Error: %s", e, level=logging.ERROR)
+			event("error", symbol=trader.display_symbol, error=str(e))
+
+	def run_once(self) -> None:
+		# Quotes for every symbol are fetched in one round before any symbol decides
+		with metrics.span("tick_seconds"):
+			with metrics.span("quote_round_seconds"):
+				ltps = self._fetch_round()
+			if self.risk is not None:
+				self.risk.mark(ltps)
+			for trader, ltp in zip(self.traders, ltps):
+				self._dispatch(trader, ltp)
+			if self.bars is not None:
+				self.bars.flush()
+
+	def _new_table(self) -> TickTable:
+		return TickTable()
+
+	def _make_feed(self, table: TickTable):
+		if self.traders[0].rules.stream_fake_feed:
+			return FakeFeedClient(self.traders[0].rules.stream_fake_feed, table)
+		return BreezeStream(self.client, table)
+
+	def run_events(self, table: Optional[TickTable] = None, feed=None, duration_sec: Optional[float] = None) -> None:
+		# Event-driven mode: every quote or stream tick is decided on as soon as it arrives
+		core = self._core = EventCore(self, table, feed)
+		if self._stop.is_set():
+			core.stop()
+		try:
+			asyncio.run(core.run(duration_sec))
+		finally:
+			self._core = None
+
+	def run_streaming(self, table: Optional[TickTable] = None, feed=None) -> None:
+		# React to each tick as it lands in the last-tick table instead of sleeping between polls.
+		# Bursts for one symbol collapse to its latest price and the volume traded across them.
+		rules = self.traders[0].rules
+		table = table or self._new_table()
+		feed = feed or self._make_feed(table)
+		by_code = {t.breeze_code: t for t in self.traders}
+		feed.start(list(by_code), rules.exchange_code)
+		seq = 0
+		try:
+			while not self._stop.is_set():
+				if not table.wait_for_update(seq, timeout=self.poll_interval_sec):
+					continue
+				changed, seq = table.changed_since(seq)
+				if self.risk is not None:
+					self.risk.mark([changed.get(t.breeze_code) for t in self.traders])
+				for code, ltp in changed.items():
+					trader = by_code.get(code)
+					if trader is not None:
+						self._dispatch(trader, ltp, table.take_volume(code))
+				if self.bars is not None:
+					self.bars.flush()
+		finally:
+			feed.stop()
+
+	def seconds_until_open(self) -> float:
+		# 0 while a session is open; otherwise how long until the next one starts
+		now = self.clock.time()
+		next_open = self.traders[0].rules.calendar.next_open(now)
+		return 0.0 if next_open is None else max(0.0, next_open - now)
+
+	def _log_idle(self, idle_sec: float) -> None:
+		resume = datetime.fromtimestamp(self.clock.time() + idle_sec, self.traders[0].rules.calendar.tz)
+		log.info("Market closed; no quotes until %s.", resume.strftime("%Y-%m-%d %H:%M"))
+
+	def run_polling(self, until: Optional[float] = None) -> None:
+		# Fetch, decide, sleep; `until` is an epoch time on self.clock (None = forever).
+		# Closed hours (nights, weekends, holidays) are slept through instead of polled.
+		idle_logged = False
+		while not self._stop.is_set() and (until is None or self.clock.time() < until):
+			idle = self.seconds_until_open()
+			if idle > 0:
+				if not idle_logged:
+					self._log_idle(idle)
+					idle_logged = True
+				if until is not None:
+					idle = min(idle, until - self.clock.time())
+				self.clock.sleep(min(idle, _IDLE_CHECK_SEC))
+				continue
+			idle_logged = False
+			started = self.clock.monotonic()
+			self.run_once()
+			# Keep a fixed cadence regardless of how many symbols were polled
+			elapsed = self.clock.monotonic() - started
+			self.clock.sleep(max(0.0, self.poll_interval_sec - elapsed))
+
+	def run_forever(self) -> None:
+		names = ", ".join(t.display_symbol for t in self.traders)
+		rules = self.traders[0].rules
+		log.info("Trader started for %d symbol(s): %s (source=%s).", len(self.traders), names, rules.quote_source)
+		if rules.metrics_port:
+			metrics.serve(rules.metrics_port)
+		if rules.metrics_log_sec > 0:
+			metrics.start_summary_log(rules.metrics_log_sec)
+		if rules.quote_source not in ("breeze", "stream"):
+			warm_connections(DEFAULT_SOURCES)
+		try:
+			if rules.warm_start:
+				warm_start(self.traders, self.bars, self.client)
+			if rules.event_core:
+				self.run_events()
+				return
+			if rules.quote_source == "stream":
+				self.run_streaming()
+				return
+			self.run_polling()
+		finally:
+			if self.orders is not None:
+				self.orders.close()
+			self.store.close()
+			if self.bars is not None:
+				self.bars.close()
@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, DefaultDict, Dict, List, Optional, Set
+
+import metrics
+from log_setup import event
+
+log = logging.getLogger(__name__)
+
+# Event-driven core for the live trader. Quotes and stream ticks become TickEvents the moment they
+# arrive, each symbol's decision runs on its own tick and emits an OrderIntent, and execution
+# happens off the event loop (order manager or a small thread pool) and reports back as an
+# OrderEvent. Timers replace the old fetch/decide/sleep loop: a "poll" timer starts one batch
+# quote round for the whole watchlist off the loop (yfinance/NSE take one request per source) and
+# each price becomes its own TickEvent. Breeze, which only quotes per symbol, gets one hedged
+# fetch per symbol instead, so a slow quote for one symbol never delays another's decision.
+
+_FLUSH_SEC = 1.0
+_IDLE_CHECK_SEC = 900.0  # a closed-market wait wakes this often to re-check the calendar
+
+
+class TickEvent:
+	def __init__(self, symbol: str, ltp: Optional[float], received: Optional[float] = None, volume: Optional[float] = None) -> None:
+		self.symbol = symbol
+		self.ltp = ltp
+		self.volume = volume  # traded since the symbol's previous tick; stream ticks only
+		self.received = time.perf_counter() if received is None else received
+
+
+class OrderIntent:
+	# What a strategy wants done; the executor turns it into a broker order
+	def __init__(self, symbol: str, action: str, qty: int, price: float, reason: str = "") -> None:
+		self.symbol = symbol
+		self.action = action
+		self.qty = int(qty)
+		self.price = float(price)
+		self.reason = reason
+		self.created = time.perf_counter()
+
+
+class OrderEvent:
+	# Execution finished for an intent: status is "filled", "failed" or "done" (sync path, no status)
+	def __init__(self, symbol: str, action: str, status: str, price: Optional[float] = None, qty: int = 0, order_id: Optional[str] = None) -> None:
+		self.symbol = symbol
+		self.action = action
+		self.status = status
+		self.price = price
+		self.qty = qty
+		self.order_id = order_id
+
+
+class TimerEvent:
+	def __init__(self, name: str) -> None:
+		self.name = name
+		self.ts = time.time()
+
+
+class EventBus:
+	# Single-consumer queue with handlers per event class. Handlers run on the event loop and must
+	# not block; publish_threadsafe is for feed and order threads.
+	def __init__(self) -> None:
+		self._handlers: DefaultDict[type, List[Callable[[Any], None]]] = defaultdict(list)
+		self._queue: Optional["asyncio.Queue[Any]"] = None
+		self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+	def subscribe(self, kind: type, handler: Callable[[Any], None]) -> None:
+		self._handlers[kind].append(handler)
+
+	def bind(self, loop: asyncio.AbstractEventLoop) -> None:
+		self._loop = loop
+		self._queue = asyncio.Queue()
+
+	def publish(self, ev: Any) -> None:
+		assert self._queue is not None, "bus is not running"
+		self._queue.put_nowait(ev)
+
+	def publish_threadsafe(self, ev: Any) -> None:
+		if self._loop is not None and not self._loop.is_closed():
+			self._loop.call_soon_threadsafe(self.publish, ev)
+
+	async def run(self) -> None:
+		assert self._queue is not None, "bus is not bound to a loop"
+		while True:
+			ev = await self._queue.get()
+			for handler in self._handlers.get(type(ev), ()):
+				try:
+					handler(ev)
+				except Exception as e:
+					log.error("Event handler error on %s: %s", type(ev).__name__, e)
+
+
+class EventCore:
+	# Drives a MultiTrader's SymbolTraders from events instead of a sleep loop
+	def __init__(self, multi: Any, table: Any = None, feed: Any = None) -> None:
+		self.multi = multi
+		self.rules = multi.traders[0].rules
+		self.table = table
+		self.feed = feed
+		self.bus = EventBus()
+		self.by_symbol: Dict[str, Any] = {t.display_symbol: t for t in multi.traders}
+		self._by_code: Dict[str, Any] = {t.breeze_code: t for t in multi.traders}
+		self._fetching: Set[str] = set()
+		self._batch_running = False
+		self._tasks: Set["asyncio.Task[Any]"] = set()
+		self._seq = 0
+		self._drain_scheduled = False
+		self._stopped: Optional[asyncio.Event] = None
+		self._stop_requested = False
+		self._executor: Optional[ThreadPoolExecutor] = None
+		self.bus.subscribe(TickEvent, self.on_tick)
+		self.bus.subscribe(OrderIntent, self.on_intent)
+		self.bus.subscribe(OrderEvent, self.on_order)
+		self.bus.subscribe(TimerEvent, self.on_timer)
+
+	def _spawn(self, coro: Any) -> None:
+		task = asyncio.ensure_future(coro)
+		self._tasks.add(task)
+		task.add_done_callback(self._tasks.discard)
+
+	def on_tick(self, tick: TickEvent) -> None:
+		trader = self.by_symbol.get(tick.symbol)
+		if trader is None:
+			return
+		metrics.observe("tick_queue_seconds", time.perf_counter() - tick.received)
+		self.multi._record_tick(trader, tick.ltp, tick.volume)
+		if self.multi.risk is not None:
+			self.multi.risk.mark_one(trader.display_symbol, tick.ltp)
+		try:
+			with metrics.span("decision_seconds"):
+				intent = trader.decide(tick.ltp, tick.volume)
+		except Exception as e:
+			trader._log("Error: %s", e, level=logging.ERROR)
+			event("error", symbol=trader.display_symbol, error=str(e))
+			return
+		if intent is not None:
+			metrics.observe("tick_to_intent_seconds", intent.created - tick.received)
+			self.bus.publish(intent)
+
+	def on_intent(self, intent: OrderIntent) -> None:
+		trader = self.by_symbol[intent.symbol]
+		if self.multi.orders is not None:
+			# submit() only queues the order; the order manager's pending flag now gates decisions
+			try:
+				trader.execute(intent)
+			except Exception as e:
+				trader._log("Error: %s", e, level=logging.ERROR)
+				event("error", symbol=trader.display_symbol, error=str(e))
+			finally:
+				trader.inflight = False
+			return
+		assert self._executor is not None
+		future = asyncio.get_running_loop().run_in_executor(self._executor, trader.execute, intent)
+		future.add_done_callback(lambda f: self._executed(intent, f))
+
+	def _executed(self, intent: OrderIntent, future: "asyncio.Future[Any]") -> None:
+		trader = self.by_symbol[intent.symbol]
+		status = "done"
+		if future.cancelled():
+			status = "failed"
+		elif future.exception() is not None:
+			status = "failed"
+			trader._log("Error: %s", future.exception(), level=logging.ERROR)
+			event("error", symbol=trader.display_symbol, error=str(future.exception()))
+		metrics.observe("intent_to_execution_seconds", time.perf_counter() - intent.created, action=intent.action)
+		self.bus.publish(OrderEvent(intent.symbol, intent.action, status, intent.price, intent.qty))
+
+	def _order_done(self, order: Any) -> None:
+		# OrderManager listener, called on an order thread
+		self.bus.publish_threadsafe(OrderEvent(order.symbol, order.action, order.status, order.fill_price, order.filled_qty, order.order_id))
+
+	def on_order(self, ev: OrderEvent) -> None:
+		trader = self.by_symbol.get(ev.symbol) or self.by_symbol.get(ev.symbol.upper())
+		if trader is not None:
+			trader.inflight = False
+
+	def on_timer(self, ev: TimerEvent) -> None:
+		if ev.name == "poll":
+			if self.rules.quote_source != "breeze":
+				# The previous round is still out: skip this one rather than pile up requests
+				if not self._batch_running:
+					self._batch_running = True
+					self._spawn(self._fetch_batch())
+				return
+			for trader in self.multi.traders:
+				# A symbol whose previous quote is still outstanding is skipped this round
+				if trader.display_symbol not in self._fetching:
+					self._fetching.add(trader.display_symbol)
+					self._spawn(self._fetch(trader))
+		elif ev.name == "flush" and self.multi.bars is not None:
+			self.multi.bars.flush()
+
+	async def _fetch_batch(self) -> None:
+		try:
+			ltps = await asyncio.to_thread(self.multi._fetch_batch)
+		except Exception as e:
+			log.warning("Quote round error: %s", e)
+			ltps = [None] * len(self.multi.traders)
+		finally:
+			self._batch_running = False
+		received = time.perf_counter()
+		for trader, ltp in zip(self.multi.traders, ltps):
+			self.bus.publish(TickEvent(trader.display_symbol, ltp, received))
+
+	async def _fetch(self, trader: Any) -> None:
+		ltp: Optional[float] = None
+		try:
+			ltp = await trader.fetch_ltp_async()
+		except Exception as e:
+			trader._log("Quote error: %s", e, level=logging.WARNING)
+		finally:
+			self._fetching.discard(trader.display_symbol)
+		self.bus.publish(TickEvent(trader.display_symbol, ltp))
+
+	async def _timer(self, name: str, interval_sec: float, immediate: bool = False, market_hours: bool = False) -> None:
+		loop = asyncio.get_running_loop()
+		next_at = loop.time() if immediate else loop.time() + interval_sec
+		idle_logged = False
+		while True:
+			await asyncio.sleep(max(0.0, next_at - loop.time()))
+			idle = self.multi.seconds_until_open() if market_hours else 0.0
+			if idle > 0:
+				# Closed market: no ticks until the next session opens
+				if not idle_logged:
+					self.multi._log_idle(idle)
+					idle_logged = True
+				next_at = loop.time() + min(idle, _IDLE_CHECK_SEC)
+				continue
+			idle_logged = False
+			self.bus.publish(TimerEvent(name))
+			# Fixed cadence: a late wakeup does not push every later tick back
+			next_at = max(next_at + interval_sec, loop.time())
+
+	def _on_table_update(self) -> None:
+		# Feed thread: coalesce a burst of updates into one drain on the loop
+		if not self._drain_scheduled:
+			self._drain_scheduled = True
+			loop = self.bus._loop
+			if loop is not None and not loop.is_closed():
+				loop.call_soon_threadsafe(self._drain)
+
+	def _drain(self) -> None:
+		self._drain_scheduled = False
+		received = time.perf_counter()
+		changed, self._seq = self.table.changed_since(self._seq)
+		for code, ltp in changed.items():
+			trader = self._by_code.get(code)
+			if trader is not None:
+				self.bus.publish(TickEvent(trader.display_symbol, ltp, received, self.table.take_volume(code)))
+
+	def stop(self) -> None:
+		# Ends run(); safe to call from any thread, also before run() has started
+		self._stop_requested = True
+		loop = self.bus._loop
+		if self._stopped is not None and loop is not None and not loop.is_closed():
+			loop.call_soon_threadsafe(self._stopped.set)
+
+	async def run(self, duration_sec: Optional[float] = None) -> None:
+		loop = asyncio.get_running_loop()
+		self.bus.bind(loop)
+		self._stopped = asyncio.Event()
+		if self._stop_requested:
+			self._stopped.set()
+		if self.multi.orders is not None:
+			self.multi.orders.add_listener(self._order_done)
+		else:
+			self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="execute")
+		self._spawn(self.bus.run())
+		streaming = self.rules.quote_source == "stream"
+		if streaming:
+			self.table = self.table if self.table is not None else self.multi._new_table()
+			self.feed = self.feed if self.feed is not None else self.multi._make_feed(self.table)
+			self.table.add_listener(self._on_table_update)
+			self.feed.start(list(self._by_code), self.rules.exchange_code)
+		else:
+			self._spawn(self._timer("poll", self.multi.poll_interval_sec, immediate=True, market_hours=True))
+		if self.multi.bars is not None:
+			self._spawn(self._timer("flush", _FLUSH_SEC))
+		try:
+			if duration_sec is None:
+				await self._stopped.wait()
+			else:
+				try:
+					await asyncio.wait_for(self._stopped.wait(), duration_sec)
+				except asyncio.TimeoutError:
+					pass
+		finally:
+			if streaming and self.feed is not None:
+				self.feed.stop()
+			for task in list(self._tasks):
+				task.cancel()
+			await asyncio.gather(*self._tasks, return_exceptions=True)
+			if self._executor is not None:
+				self._executor.shutdown(wait=True)
+			if self.multi.bars is not None:
+				self.multi.bars.flush()
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Long-lived HTTP clients for the public price sources. Each source keeps one shared client
+# (requests.Session or httpx.Client) whose per-host connection pool is sized for concurrent quote
+# fetches, so warm keep-alive connections are reused instead of opening a new TLS connection per
+# request. A client is rebuilt in the background once it is older than refresh_sec (e.g. before
+# NSE's cookies expire), and rebuilt at once when a caller finds its cookies rejected or after
+# max_failures failed requests in a row. Replaced clients are closed after a grace period so
+# requests still running on them can finish.
+
+_RETIRE_GRACE_SEC = 60.0
+
+
+class ManagedSession:
+	def __init__(self, name: str, build: Callable[[], Any], refresh_sec: float = 0.0, max_failures: int = 5) -> None:
+		self.name = name
+		self.build = build
+		self.refresh_sec = float(refresh_sec)
+		self.max_failures = max(1, int(max_failures))
+		self._lock = threading.Lock()
+		self._client: Any = None
+		self._born = 0.0
+		self._failures = 0
+		self._refreshing = False
+		self._retired: List[Tuple[float, Any]] = []
+
+	def get(self) -> Any:
+		client = self._client
+		if client is None:
+			return self.renew()
+		if self.refresh_sec > 0 and time.monotonic() - self._born > self.refresh_sec:
+			self._refresh_in_background()
+		return client
+
+	def renew(self, stale: Any = None) -> Any:
+		# Blocking rebuild. Callers that saw the same stale client wait for one rebuild and share it.
+		with self._lock:
+			if self._client is not None and self._client is not stale:
+				return self._client
+			self._swap(self._build("renew" if stale is not None else "start"))
+			return self._client
+
+	def report(self, ok: bool) -> None:
+		# Passive health check: a run of failed requests usually means dead connections or cookies
+		if ok:
+			self._failures = 0
+			return
+		self._failures += 1
+		if self._failures >= self.max_failures:
+			self._failures = 0
+			log.warning("%s connections failing; reconnecting.", self.name)
+			self._refresh_in_background()
+
+	def warm(self) -> None:
+		# Build (and prime) the client off the quote path, e.g. while the trader starts up
+		if self._client is None:
+			self._refresh_in_background()
+
+	def close(self) -> None:
+		with self._lock:
+			clients = [c for _, c in self._retired] + ([self._client] if self._client is not None else [])
+			self._client = None
+			self._retired = []
+		for client in clients:
+			_close(client)
+
+	def _build(self, why: str) -> Any:
+		started = time.perf_counter()
+		client = self.build()
+		metrics.observe("http_session_build_seconds", time.perf_counter() - started, source=self.name, why=why)
+		return client
+
+	def _swap(self, client: Any) -> None:
+		# Caller holds self._lock
+		now = time.monotonic()
+		expired = [c for t, c in self._retired if now - t > _RETIRE_GRACE_SEC]
+		self._retired = [(t, c) for t, c in self._retired if now - t <= _RETIRE_GRACE_SEC]
+		if self._client is not None:
+			self._retired.append((now, self._client))
+		self._client = client
+		self._born = now
+		self._failures = 0
+		for old in expired:
+			_close(old)
+
+	def _refresh_in_background(self) -> None:
+		with self._lock:
+			if self._refreshing:
+				return
+			self._refreshing = True
+		threading.Thread(target=self._refresh, name=f"http-{self.name}", daemon=True).start()
+
+	def _refresh(self) -> None:
+		try:
+			client = self._build("refresh")
+		except Exception as e:
+			log.warning("%s session refresh failed: %s", self.name, e)
+			client = None
+		with self._lock:
+			if client is not None:
+				self._swap(client)
+			elif self._client is not None:
+				# Keep the old client, try again after another full interval
+				self._born = time.monotonic()
+			self._refreshing = False
+
+
+def _close(client: Optional[Any]) -> None:
+	try:
+		if client is not None:
+			client.close()
+	except Exception:
+		pass
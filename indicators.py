@@ -0,0 +1,208 @@
+import math
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+# Incremental indicators: each update is O(1) (amortized for the monotonic deques), so rule
+# evaluation cost does not grow with window length. Running sums are re-derived from the
+# window once per `window` updates to stop floating-point drift on long sessions.
+
+
+class RollingMax:
+	def __init__(self, window: int) -> None:
+		self.window = max(1, int(window))
+		self._count = 0
+		self._q: Deque[Tuple[int, float]] = deque()  # (index, value), values strictly decreasing
+
+	def update(self, x: float) -> None:
+		i = self._count
+		self._count += 1
+		while self._q and self._q[-1][1] <= x:
+			self._q.pop()
+		self._q.append((i, x))
+		if self._q[0][0] <= i - self.window:
+			self._q.popleft()
+
+	@property
+	def full(self) -> bool:
+		return self._count >= self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		return self._q[0][1] if self._q else None
+
+
+class RollingMin:
+	def __init__(self, window: int) -> None:
+		self._max = RollingMax(window)
+		self.window = self._max.window
+
+	def update(self, x: float) -> None:
+		self._max.update(-x)
+
+	@property
+	def full(self) -> bool:
+		return self._max.full
+
+	@property
+	def value(self) -> Optional[float]:
+		v = self._max.value
+		return None if v is None else -v
+
+
+class SMA:
+	def __init__(self, window: int) -> None:
+		self.window = max(1, int(window))
+		self._buf: Deque[float] = deque(maxlen=self.window)
+		self._sum = 0.0
+		self._since_resync = 0
+
+	def update(self, x: float) -> None:
+		if len(self._buf) == self.window:
+			self._sum -= self._buf[0]
+		self._buf.append(x)
+		self._sum += x
+		self._since_resync += 1
+		if self._since_resync >= self.window:
+			self._sum = math.fsum(self._buf)
+			self._since_resync = 0
+
+	@property
+	def full(self) -> bool:
+		return len(self._buf) == self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		return self._sum / len(self._buf) if self._buf else None
+
+
+class EMA:
+	def __init__(self, window: int) -> None:
+		self.window = max(1, int(window))
+		self.alpha = 2.0 / (self.window + 1)
+		self._value: Optional[float] = None
+		self._count = 0
+
+	def update(self, x: float) -> None:
+		self._count += 1
+		if self._value is None:
+			self._value = x
+		else:
+			self._value += self.alpha * (x - self._value)
+
+	@property
+	def full(self) -> bool:
+		return self._count >= self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		return self._value
+
+
+class RollingStd:
+	# Sample standard deviation over the last `window` values
+	def __init__(self, window: int) -> None:
+		self.window = max(2, int(window))
+		self._buf: Deque[float] = deque(maxlen=self.window)
+		self._sum = 0.0
+		self._sumsq = 0.0
+		self._since_resync = 0
+
+	def update(self, x: float) -> None:
+		if len(self._buf) == self.window:
+			old = self._buf[0]
+			self._sum -= old
+			self._sumsq -= old * old
+		self._buf.append(x)
+		self._sum += x
+		self._sumsq += x * x
+		self._since_resync += 1
+		if self._since_resync >= self.window:
+			self._sum = math.fsum(self._buf)
+			self._sumsq = math.fsum(v * v for v in self._buf)
+			self._since_resync = 0
+
+	@property
+	def full(self) -> bool:
+		return len(self._buf) == self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		n = len(self._buf)
+		if n < 2:
+			return None
+		var = (self._sumsq - self._sum * self._sum / n) / (n - 1)
+		return math.sqrt(var) if var > 0 else 0.0
+
+
+class RSI:
+	# Wilder's relative strength index: simple average of the first `window` changes, then
+	# exponential smoothing with alpha 1/window. Needs window + 1 prices.
+	def __init__(self, window: int) -> None:
+		self.window = max(1, int(window))
+		self._prev: Optional[float] = None
+		self._gain = 0.0
+		self._loss = 0.0
+		self._count = 0
+
+	def update(self, x: float) -> None:
+		if self._prev is None:
+			self._prev = x
+			return
+		change = x - self._prev
+		self._prev = x
+		gain = change if change > 0 else 0.0
+		loss = -change if change < 0 else 0.0
+		self._count += 1
+		if self._count <= self.window:
+			self._gain += gain
+			self._loss += loss
+			if self._count == self.window:
+				self._gain /= self.window
+				self._loss /= self.window
+		else:
+			self._gain += (gain - self._gain) / self.window
+			self._loss += (loss - self._loss) / self.window
+
+	@property
+	def full(self) -> bool:
+		return self._count >= self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		if not self.full:
+			return None
+		if self._loss == 0:
+			return 100.0 if self._gain > 0 else 50.0
+		return 100.0 - 100.0 / (1.0 + self._gain / self._loss)
+
+
+class VWAP:
+	# Rolling volume-weighted average price over the last `window` (price, volume) samples
+	def __init__(self, window: int) -> None:
+		self.window = max(1, int(window))
+		self._buf: Deque[Tuple[float, float]] = deque(maxlen=self.window)
+		self._pv = 0.0
+		self._vol = 0.0
+		self._since_resync = 0
+
+	def update(self, price: float, volume: float) -> None:
+		if len(self._buf) == self.window:
+			old_p, old_v = self._buf[0]
+			self._pv -= old_p * old_v
+			self._vol -= old_v
+		self._buf.append((price, volume))
+		self._pv += price * volume
+		self._vol += volume
+		self._since_resync += 1
+		if self._since_resync >= self.window:
+			self._pv = math.fsum(p * v for p, v in self._buf)
+			self._vol = math.fsum(v for _, v in self._buf)
+			self._since_resync = 0
+
+	@property
+	def full(self) -> bool:
+		return len(self._buf) == self.window
+
+	@property
+	def value(self) -> Optional[float]:
+		return self._pv / self._vol if self._vol > 0 else None
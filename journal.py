@@ -0,0 +1,166 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from metrics import timed
+
+JOURNAL_DIR = "journal"
+_SEGMENT_SUFFIX = ".jsonl"
+
+
+class Journal:
+	# Append-only JSONL log of fills and position changes, one fsynced line per record.
+	# Records live in segments named after their first seq. Compaction starts a new segment once a
+	# snapshot covers the current one and deletes the segments the snapshot holds (or keeps them as
+	# the trade history when asked to); a segment is never rewritten.
+	def __init__(self, directory: str = JOURNAL_DIR, fsync: bool = True) -> None:
+		self.directory = directory
+		self.fsync = fsync
+		self._lock = threading.Lock()
+		os.makedirs(self.directory, exist_ok=True)
+		segments = self._segments()
+		self._seq = self._last_seq(segments)
+		self._segment_records = 0
+		self._file = None
+		if segments:
+			self._segment_path = segments[-1][1]
+			self._repair_tail(self._segment_path)
+			self._segment_records = sum(1 for _ in self._read_segment(self._segment_path))
+		else:
+			self._segment_path = self._path_for(self._seq + 1)
+		self._segment_first = self._seq_of(self._segment_path)
+
+	@staticmethod
+	def _seq_of(path: str) -> int:
+		return int(os.path.basename(path)[:-len(_SEGMENT_SUFFIX)])
+
+	def _path_for(self, first_seq: int) -> str:
+		return os.path.join(self.directory, f"{first_seq:012d}{_SEGMENT_SUFFIX}")
+
+	def _segments(self) -> List[Tuple[int, str]]:
+		out: List[Tuple[int, str]] = []
+		for name in os.listdir(self.directory):
+			if not name.endswith(_SEGMENT_SUFFIX):
+				continue
+			try:
+				out.append((int(name[:-len(_SEGMENT_SUFFIX)]), os.path.join(self.directory, name)))
+			except ValueError:
+				continue
+		return sorted(out)
+
+	@staticmethod
+	def _repair_tail(path: str) -> None:
+		# Drop a torn final line so the next append starts on a clean line
+		with open(path, "rb+") as f:
+			data = f.read()
+			if data and not data.endswith(b"\n"):
+				f.truncate(data.rfind(b"\n") + 1)
+
+	@staticmethod
+	def _read_segment(path: str) -> Iterator[Dict[str, Any]]:
+		with open(path, "r") as f:
+			for line in f:
+				try:
+					rec = json.loads(line)
+				except ValueError:
+					# A torn final line from a crash mid-append; everything before it is intact
+					continue
+				if isinstance(rec, dict) and "seq" in rec:
+					yield rec
+
+	def _last_seq(self, segments: List[Tuple[int, str]]) -> int:
+		for first_seq, path in reversed(segments):
+			last = first_seq - 1
+			for rec in self._read_segment(path):
+				last = max(last, int(rec["seq"]))
+			if last >= first_seq:
+				return last
+		return segments[-1][0] - 1 if segments else 0
+
+	@property
+	def seq(self) -> int:
+		with self._lock:
+			return self._seq
+
+	@property
+	def segment_records(self) -> int:
+		with self._lock:
+			return self._segment_records
+
+	@timed("journal_append_seconds")
+	def append(self, record: Dict[str, Any]) -> int:
+		with self._lock:
+			self._seq += 1
+			rec = dict(record)
+			rec["seq"] = self._seq
+			rec.setdefault("ts", time.time())
+			if self._file is None:
+				self._file = open(self._segment_path, "a")
+			self._file.write(json.dumps(rec, separators=(",", ":")) + "\n")
+			self._file.flush()
+			if self.fsync:
+				os.fsync(self._file.fileno())
+			self._segment_records += 1
+			return self._seq
+
+	def rotate(self) -> None:
+		# Start a fresh segment; called after a snapshot has captured everything up to seq. The new
+		# file is created right away so the seq survives a restart even once older ones are deleted.
+		with self._lock:
+			if self._segment_records == 0:
+				return
+			if self._file is not None:
+				self._file.close()
+			self._segment_path = self._path_for(self._seq + 1)
+			self._segment_first = self._seq + 1
+			self._file = open(self._segment_path, "a")
+			self._segment_records = 0
+
+	def drop_covered(self, covered_seq: int) -> int:
+		# Delete the segments whose records all have seq <= covered_seq (held by a snapshot); the
+		# segment being written is always kept. Returns how many were deleted.
+		with self._lock:
+			segments = [seg for seg in self._segments() if seg[1] != self._segment_path]
+			ends = [first_seq - 1 for first_seq, _ in segments[1:]] + [self._segment_first - 1]
+			dropped = 0
+			for (_, path), last_seq in zip(segments, ends):
+				if last_seq > covered_seq:
+					break
+				os.remove(path)
+				dropped += 1
+			return dropped
+
+	def replay(self, after_seq: int = 0) -> Iterator[Dict[str, Any]]:
+		# Records with seq > after_seq; segments wholly covered by the snapshot are not opened
+		segments = self._segments()
+		start = 0
+		for i, (first_seq, _) in enumerate(segments):
+			if first_seq <= after_seq + 1:
+				start = i
+		for _, path in segments[start:]:
+			for rec in self._read_segment(path):
+				if int(rec["seq"]) > after_seq:
+					yield rec
+
+	def history(self, symbol: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+		for rec in self.replay(0):
+			if symbol is None or str(rec.get("symbol", "")).upper() == symbol.upper():
+				yield rec
+
+	def close(self) -> None:
+		with self._lock:
+			if self._file is not None:
+				self._file.close()
+				self._file = None
+
+
+if __name__ == "__main__":
+	# Trade history: python journal.py [SYMBOL]
+	journal = Journal()
+	for rec in journal.history(sys.argv[1] if len(sys.argv) > 1 else None):
+		stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(rec.get("ts", 0)))
+		details = " ".join(f"{k}={v}" for k, v in rec.items() if k not in ("seq", "ts", "op", "symbol"))
+		print(f"{rec['seq']:>8} {stamp} {rec.get('op', ''):<6} {rec.get('symbol') or '-':<12} {details}")
@@ -0,0 +1,180 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Process-wide logging for the trader. Callers only build a LogRecord and put it on a queue
+# (message formatting is deferred to the writer thread), a QueueListener thread does the console
+# and file I/O, files rotate by size or at midnight, and bursts of identical warnings/errors
+# collapse into one line plus a "repeated N times" note. Trade events go to a separate JSON-lines
+# file. Breeze's own apiLogs/websocketLogs files are replaced by the same pipeline.
+
+EVENT_LOGGER = "events"
+_BREEZE_LOGGERS = ("APILogger", "WebsocketLogger")
+# Chatty libraries stay at WARNING even when the trader runs at DEBUG
+_QUIET_LOGGERS = ("urllib3", "yfinance", "peewee", "asyncio", "filelock", "socketio", "engineio", "websocket")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_events = logging.getLogger(EVENT_LOGGER)
+_events.propagate = False
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+	# The stock QueueHandler formats in the caller's thread; keep the record as-is so
+	# %-formatting happens on the writer thread (records never leave the process)
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		if record.exc_info and not record.exc_text:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		return record
+
+
+class DedupFilter(logging.Filter):
+	# Drops a WARNING+ message identical to one logged less than window_sec ago; the next time it
+	# gets through it carries a count of what was dropped in between
+	def __init__(self, window_sec: float = 60.0, min_level: int = logging.WARNING) -> None:
+		super().__init__()
+		self.window_sec = window_sec
+		self.min_level = min_level
+		self._lock = threading.Lock()
+		self._seen: Dict[Tuple[str, int, str], List[float]] = {}  # key -> [last emitted, suppressed]
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		if record.levelno < self.min_level or self.window_sec <= 0:
+			return True
+		key = (record.name, record.levelno, record.getMessage())
+		now = record.created
+		with self._lock:
+			entry = self._seen.get(key)
+			if entry is not None and now - entry[0] < self.window_sec:
+				entry[1] += 1
+				return False
+			suppressed = int(entry[1]) if entry is not None else 0
+			self._seen[key] = [now, 0]
+			if len(self._seen) > 4096:
+				cutoff = now - self.window_sec
+				self._seen = {k: v for k, v in self._seen.items() if v[0] >= cutoff}
+		if suppressed:
+			record.msg = f"{record.getMessage()} (repeated {suppressed} more time(s) in the last {self.window_sec:.0f}s)"
+			record.args = None
+		return True
+
+
+class _DedupQueueListener(logging.handlers.QueueListener):
+	# Runs one DedupFilter on the writer thread before a record fans out to the handlers, so the
+	# console and the file drop the same repeats and both print the same "repeated" note
+	def __init__(self, q: Any, *handlers: logging.Handler, dedup: Optional[DedupFilter] = None, respect_handler_level: bool = False) -> None:
+		super().__init__(q, *handlers, respect_handler_level=respect_handler_level)
+		self.dedup = dedup
+
+	def handle(self, record: logging.LogRecord) -> None:
+		if self.dedup is not None and not self.dedup.filter(record):
+			return
+		super().handle(record)
+
+
+class JsonEventFormatter(logging.Formatter):
+	def format(self, record: logging.LogRecord) -> str:
+		event = {"ts": round(record.created, 3), "event": record.getMessage()}
+		event.update(getattr(record, "fields", {}) or {})
+		return json.dumps(event, separators=(",", ":"), default=str)
+
+
+class _NotEvents(logging.Filter):
+	def filter(self, record: logging.LogRecord) -> bool:
+		return record.name != EVENT_LOGGER
+
+
+def _file_handler(path: str, rotate: str, max_bytes: int, backups: int) -> logging.Handler:
+	if rotate == "midnight":
+		return logging.handlers.TimedRotatingFileHandler(path, when="midnight", backupCount=backups, encoding="utf-8", delay=True)
+	return logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+
+
+def setup_logging(level: str = "INFO",
+				  log_dir: str = "logs",
+				  log_file: str = "trader.log",
+				  event_file: str = "events.jsonl",
+				  rotate: str = "size",
+				  max_bytes: int = 5 * 1024 * 1024,
+				  backups: int = 5,
+				  dedup_sec: float = 60.0,
+				  console: bool = True,
+				  breeze_level: str = "WARNING") -> None:
+	global _listener
+	stop_logging()
+	os.makedirs(log_dir, exist_ok=True)
+	handlers: List[logging.Handler] = []
+	if console:
+		stream = logging.StreamHandler(sys.stdout)
+		stream.setFormatter(logging.Formatter("%(message)s"))
+		handlers.append(stream)
+	if log_file:
+		file_handler = _file_handler(os.path.join(log_dir, log_file), rotate, max_bytes, backups)
+		file_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+		handlers.append(file_handler)
+	# Events are routed by logger name to their own handler on the same writer thread
+	event_handler: Optional[logging.Handler] = None
+	if event_file:
+		event_handler = _file_handler(os.path.join(log_dir, event_file), rotate, max_bytes, backups)
+		event_handler.setFormatter(JsonEventFormatter())
+		event_handler.addFilter(logging.Filter(EVENT_LOGGER))
+	for h in handlers:
+		h.addFilter(_NotEvents())
+
+	q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+	_listener = _DedupQueueListener(q, *(handlers + ([event_handler] if event_handler else [])), dedup=DedupFilter(dedup_sec), respect_handler_level=True)
+	_listener.start()
+
+	root = logging.getLogger()
+	root.handlers = [h for h in root.handlers if not isinstance(h, _DeferredQueueHandler)]
+	root.addHandler(_DeferredQueueHandler(q))
+	root.setLevel(getattr(logging, level.upper(), logging.INFO))
+	for name in _QUIET_LOGGERS:
+		logging.getLogger(name).setLevel(logging.WARNING)
+	_events.handlers = [_DeferredQueueHandler(q)] if event_handler else [logging.NullHandler()]
+	_events.setLevel(logging.INFO)
+
+	# Breeze opens unbounded apiLogs/websocketLogs files at import; send those loggers through
+	# the rotating, de-duplicated pipeline instead and keep only what is at breeze_level or above
+	for name in _BREEZE_LOGGERS:
+		lg = logging.getLogger(name)
+		for h in list(lg.handlers):
+			lg.removeHandler(h)
+			h.close()
+		lg.setLevel(getattr(logging, breeze_level.upper(), logging.WARNING))
+		lg.propagate = True
+
+
+def setup_from_rules(rules: Any, console: bool = True) -> None:
+	setup_logging(
+		level="DEBUG" if rules.debug else rules.log_level,
+		log_dir=rules.log_dir,
+		event_file=rules.event_log,
+		rotate=rules.log_rotate,
+		max_bytes=rules.log_max_bytes,
+		backups=rules.log_backups,
+		dedup_sec=rules.log_dedup_sec,
+		console=console,
+		breeze_level=rules.breeze_log_level,
+	)
+
+
+def event(kind: str, **fields: Any) -> None:
+	# One JSON line in the event log, e.g. event("fill", symbol="TCS", price=...)
+	if _events.isEnabledFor(logging.INFO):
+		_events.info(kind, extra={"fields": fields})
+
+
+def stop_logging() -> None:
+	# Drains the queue; called at exit so the last lines reach disk
+	global _listener
+	if _listener is not None:
+		_listener.stop()
+		for h in _listener.handlers:
+			h.close()
+		_listener = None
@@ -0,0 +1,105 @@
+from datetime import date, datetime, time as dtime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+# Trading sessions in the market's time zone: regular hours on weekdays, nothing on weekends and
+# listed holidays, and replacement hours for special days (half days, muhurat trading, a Saturday
+# session). The current day's sessions are kept as epoch bounds, so is_open is a couple of float
+# comparisons until the date rolls over. Each session ends market_buffer_min before its close,
+# the last moment new orders are placed.
+
+_LOOKAHEAD_DAYS = 30  # next_open gives up after this many days without a session
+
+
+def _hhmm(value: str) -> dtime:
+	hour, minute = [int(x) for x in str(value).split(":")]
+	return dtime(hour=hour, minute=minute)
+
+
+class MarketCalendar:
+	def __init__(self,
+				 tz: str = "Asia/Kolkata",
+				 open_time: str = "09:15",
+				 close_time: str = "15:30",
+				 close_buffer_min: int = 0,
+				 holidays: Iterable[str] = (),
+				 sessions: Optional[Dict[str, Sequence[Sequence[str]]]] = None) -> None:
+		self.tz = ZoneInfo(tz)
+		self.regular: List[Tuple[dtime, dtime]] = [(_hhmm(open_time), _hhmm(close_time))]
+		self.close_buffer_sec = max(0, int(close_buffer_min)) * 60
+		self.holidays = {date.fromisoformat(str(d)) for d in holidays}
+		self.special: Dict[date, List[Tuple[dtime, dtime]]] = {
+			date.fromisoformat(str(d)): sorted((_hhmm(start), _hhmm(end)) for start, end in windows)
+			for d, windows in (sessions or {}).items()
+		}
+		# (day start, next day start, that day's sessions, date); replaced whole so readers on other
+		# threads never see a half-updated day
+		self._day: Tuple[float, float, List[Tuple[float, float]], date] = (0.0, 0.0, [], date.min)
+
+	def _epoch(self, day: date, at: dtime) -> float:
+		return datetime.combine(day, at, self.tz).timestamp()
+
+	def sessions_on(self, day: date) -> List[Tuple[float, float]]:
+		# (open, last tradable) epoch seconds for each session on a local date
+		if day in self.special:
+			windows = self.special[day]
+		elif day in self.holidays or day.weekday() >= 5:
+			windows = []
+		else:
+			windows = self.regular
+		out: List[Tuple[float, float]] = []
+		for start, end in windows:
+			opens = self._epoch(day, start)
+			last = self._epoch(day, end) - self.close_buffer_sec
+			if last >= opens:
+				out.append((opens, last))
+		return out
+
+	def _today(self, now: float) -> Tuple[float, float, List[Tuple[float, float]], date]:
+		cached = self._day
+		if cached[0] <= now < cached[1]:
+			return cached
+		day = datetime.fromtimestamp(now, self.tz).date()
+		cached = (self._epoch(day, dtime(0)), self._epoch(day + timedelta(days=1), dtime(0)), self.sessions_on(day), day)
+		self._day = cached
+		return cached
+
+	def is_open(self, now: float) -> bool:
+		for opens, last in self._today(now)[2]:
+			if opens <= now <= last:
+				return True
+		return False
+
+	def next_open(self, now: float) -> Optional[float]:
+		# `now` while a session is open, else the start of the next one (None if none is coming)
+		_, _, sessions, day = self._today(now)
+		for opens, last in sessions:
+			if now <= last:
+				return max(now, opens)
+		for _ in range(_LOOKAHEAD_DAYS):
+			day += timedelta(days=1)
+			sessions = self.sessions_on(day)
+			if sessions:
+				return sessions[0][0]
+		return None
+
+	def session_mask(self, ts: np.ndarray) -> np.ndarray:
+		# Vectorized is_open over epoch-second timestamps (sorted or not)
+		ts = np.asarray(ts, dtype=np.float64)
+		if len(ts) == 0:
+			return np.zeros(0, dtype=bool)
+		first = datetime.fromtimestamp(float(ts.min()), self.tz).date()
+		last = datetime.fromtimestamp(float(ts.max()), self.tz).date()
+		bounds: List[Tuple[float, float]] = []
+		day = first
+		while day <= last:
+			bounds.extend(self.sessions_on(day))
+			day += timedelta(days=1)
+		if not bounds:
+			return np.zeros(len(ts), dtype=bool)
+		opens = np.array([b[0] for b in bounds])
+		closes = np.array([b[1] for b in bounds])
+		i = np.searchsorted(opens, ts, side="right") - 1
+		return (i >= 0) & (ts <= closes[np.maximum(i, 0)])
@@ -0,0 +1,288 @@
+import functools
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple
+
+# In-process latency histograms and counters for the trading hot path. Spans cost two
+# perf_counter() calls and one locked append. Quantiles come from a bounded window of recent
+# samples per series, so p50/p99 track current behaviour rather than the whole session. Gauges
+# (levels such as free rate-limit tokens) are filled in by collectors just before each read.
+# Exposed as Prometheus text on a local HTTP endpoint and as an optional periodic log line.
+
+log = logging.getLogger(__name__)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+_WINDOW = 2048
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class _Series:
+	def __init__(self) -> None:
+		self.count = 0
+		self.total = 0.0
+		self.recent: Deque[float] = deque(maxlen=_WINDOW)
+
+	def observe(self, value: float) -> None:
+		self.count += 1
+		self.total += value
+		self.recent.append(value)
+
+	def quantiles(self) -> Dict[float, float]:
+		if not self.recent:
+			return {q: 0.0 for q in QUANTILES}
+		ordered = sorted(self.recent)
+		last = len(ordered) - 1
+		return {q: ordered[min(last, int(round(q * last)))] for q in QUANTILES}
+
+
+class Registry:
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self._histograms: Dict[str, Dict[LabelKey, _Series]] = {}
+		self._counters: Dict[str, Dict[LabelKey, float]] = {}
+		self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+		self._collectors: Dict[str, Callable[[], None]] = {}
+		self._help: Dict[str, str] = {}
+
+	@staticmethod
+	def _key(labels: Dict[str, Any]) -> LabelKey:
+		return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+	def describe(self, name: str, text: str) -> None:
+		self._help[name] = text
+
+	def observe(self, name: str, seconds: float, **labels: Any) -> None:
+		self.observe_key(name, self._key(labels), seconds)
+
+	def observe_key(self, name: str, key: LabelKey, seconds: float) -> None:
+		# observe() with the label key already built, for callers that time the same series often
+		with self._lock:
+			series = self._histograms.setdefault(name, {}).get(key)
+			if series is None:
+				series = self._histograms[name][key] = _Series()
+			series.observe(seconds)
+
+	def inc(self, name: str, amount: float = 1.0, **labels: Any) -> None:
+		key = self._key(labels)
+		with self._lock:
+			counters = self._counters.setdefault(name, {})
+			counters[key] = counters.get(key, 0.0) + amount
+
+	def set_gauge(self, name: str, value: float, **labels: Any) -> None:
+		key = self._key(labels)
+		with self._lock:
+			self._gauges.setdefault(name, {})[key] = float(value)
+
+	def add_collector(self, name: str, fn: Callable[[], None]) -> None:
+		# fn() runs before every snapshot/render and sets gauges; a later one with the same name
+		# replaces it (e.g. a reconnected client)
+		with self._lock:
+			self._collectors[name] = fn
+
+	def _collect(self) -> None:
+		with self._lock:
+			collectors = list(self._collectors.items())
+		for name, fn in collectors:
+			try:
+				fn()
+			except Exception as e:
+				log.warning("Metrics collector %s failed: %s", name, e)
+
+	@contextmanager
+	def span(self, name: str, **labels: Any) -> Iterator[None]:
+		# Times the block; an exception is also counted, e.g. breeze_call_seconds -> breeze_call_errors_total
+		start = time.perf_counter()
+		try:
+			yield
+		except BaseException:
+			base = name[:-len("_seconds")] if name.endswith("_seconds") else name
+			self.inc(f"{base}_errors_total", **labels)
+			raise
+		finally:
+			self.observe(name, time.perf_counter() - start, **labels)
+
+	def reset(self) -> None:
+		with self._lock:
+			self._histograms.clear()
+			self._counters.clear()
+			self._gauges.clear()
+
+	def snapshot(self) -> Dict[str, Any]:
+		self._collect()
+		with self._lock:
+			hist = {
+				name: {key: (s.count, s.total, list(s.recent)) for key, s in series.items()}
+				for name, series in self._histograms.items()
+			}
+			counters = {name: dict(values) for name, values in self._counters.items()}
+			gauges = {name: dict(values) for name, values in self._gauges.items()}
+		out: Dict[str, Any] = {"histograms": {}, "counters": counters, "gauges": gauges}
+		for name, series in hist.items():
+			out["histograms"][name] = {}
+			for key, (count, total, recent) in series.items():
+				s = _Series()
+				s.recent.extend(recent)
+				out["histograms"][name][key] = {"count": count, "sum": total, "quantiles": s.quantiles()}
+		return out
+
+	def render(self) -> str:
+		# Prometheus text exposition: histograms as summaries with quantiles, counters and gauges as such
+		snap = self.snapshot()
+		lines: List[str] = []
+		for name in sorted(snap["histograms"]):
+			if name in self._help:
+				lines.append(f"# HELP {name} {self._help[name]}")
+			lines.append(f"# TYPE {name} summary")
+			for key, s in sorted(snap["histograms"][name].items()):
+				for q, v in s["quantiles"].items():
+					lines.append(f"{name}{_labels(key + (('quantile', str(q)),))} {v:.6f}")
+				lines.append(f"{name}_sum{_labels(key)} {s['sum']:.6f}")
+				lines.append(f"{name}_count{_labels(key)} {s['count']}")
+		for name in sorted(snap["counters"]):
+			if name in self._help:
+				lines.append(f"# HELP {name} {self._help[name]}")
+			lines.append(f"# TYPE {name} counter")
+			for key, v in sorted(snap["counters"][name].items()):
+				lines.append(f"{name}{_labels(key)} {v:g}")
+		for name in sorted(snap["gauges"]):
+			if name in self._help:
+				lines.append(f"# HELP {name} {self._help[name]}")
+			lines.append(f"# TYPE {name} gauge")
+			for key, v in sorted(snap["gauges"][name].items()):
+				lines.append(f"{name}{_labels(key)} {v:g}")
+		return "\n".join(lines) + "\n"
+
+	def summary_line(self) -> str:
+		# One compact line: p50/p99 in milliseconds per stage, plus non-zero counters
+		snap = self.snapshot()
+		parts = []
+		for name in sorted(snap["histograms"]):
+			for key, s in sorted(snap["histograms"][name].items()):
+				label = ",".join(v for _, v in key)
+				q = s["quantiles"]
+				parts.append(f"{name}{'[' + label + ']' if label else ''} n={s['count']} p50={q[0.5] * 1000:.1f}ms p99={q[0.99] * 1000:.1f}ms")
+		for name in sorted(snap["counters"]):
+			for key, v in sorted(snap["counters"][name].items()):
+				label = ",".join(v2 for _, v2 in key)
+				parts.append(f"{name}{'[' + label + ']' if label else ''}={v:g}")
+		return "; ".join(parts)
+
+
+def _labels(key: LabelKey) -> str:
+	if not key:
+		return ""
+	body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in key)
+	return "{" + body + "}"
+
+
+# HELP text for the series the trader exports
+_HELP = {
+	"tick_seconds": "Whole polling round: quotes, decisions and execution",
+	"quote_round_seconds": "Fetching quotes for every symbol in one polling round",
+	"quote_source_seconds": "One call to a price source",
+	"quote_source_errors_total": "Price source calls that failed, were skipped or came back empty",
+	"quote_fallbacks_total": "Quotes that went to a backup or hedged source",
+	"quote_budget_exceeded_total": "Quote rounds that ran out of quote_budget_sec",
+	"quote_cache_hits_total": "Quotes served from the quote cache",
+	"quote_cache_misses_total": "Quotes the cache had to fetch",
+	"quote_cache_coalesced_total": "Quote requests that joined a fetch already in flight",
+	"quote_cache_evictions_total": "Entries dropped from the full quote cache",
+	"quote_cache_remote_errors_total": "Failed calls to the shared quote cache process",
+	"http_session_build_seconds": "Building an HTTP session for a price source",
+	"breeze_call_seconds": "One Breeze API call",
+	"breeze_rate_wait_seconds": "Wait for a free Breeze request slot",
+	"breeze_rate_limited_total": "Breeze calls refused by the request limiter",
+	"breeze_throttled_total": "Throttling replies from Breeze",
+	"breeze_rate_tokens": "Breeze requests that can be sent right now",
+	"breeze_rate_paused_seconds": "Time left on the pause after a throttling reply",
+	"breeze_rate_waiting": "Breeze calls queued for a request slot",
+	"breeze_rate_wait_max_seconds": "Longest wait for a Breeze request slot",
+	"rule_eval_seconds": "Checking the buy or sell rules for one price",
+	"decision_seconds": "Strategy decision for one price",
+	"execute_seconds": "Executing a decision, including any inline broker call",
+	"tick_queue_seconds": "Time a price waits on the event loop before it is decided on",
+	"tick_to_intent_seconds": "From a price arriving to the buy/sell decision",
+	"intent_to_execution_seconds": "From a buy/sell decision until its execution has finished",
+	"risk_rejections_total": "Buys blocked by a portfolio limit",
+	"order_place_seconds": "Placing an order with the broker",
+	"order_fill_seconds": "From placing an order to its fill",
+	"orders_filled_total": "Orders filled",
+	"orders_failed_total": "Orders rejected, cancelled or expired",
+	"paper_orders_total": "Orders taken by the paper broker",
+	"paper_fills_total": "Paper fills, full or partial",
+	"state_op_seconds": "State store read or update",
+	"state_flush_seconds": "Writing the state.json snapshot",
+	"journal_append_seconds": "Appending and syncing one journal record",
+}
+
+REGISTRY = Registry()
+for _name, _text in _HELP.items():
+	REGISTRY.describe(_name, _text)
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+set_gauge = REGISTRY.set_gauge
+span = REGISTRY.span
+
+
+def timed(name: str, **labels: Any) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+	# Decorator form of span() for whole functions/methods. These sit on the per-tick path, so the
+	# label key is built once and the timing is inlined rather than going through a generator.
+	key = Registry._key(labels)
+	base = name[:-len("_seconds")] if name.endswith("_seconds") else name
+
+	def wrap(fn: Callable[..., Any]) -> Callable[..., Any]:
+		@functools.wraps(fn)
+		def inner(*args: Any, **kwargs: Any) -> Any:
+			start = time.perf_counter()
+			try:
+				return fn(*args, **kwargs)
+			except BaseException:
+				REGISTRY.inc(f"{base}_errors_total", **labels)
+				raise
+			finally:
+				REGISTRY.observe_key(name, key, time.perf_counter() - start)
+		return inner
+	return wrap
+
+
+class _Handler(BaseHTTPRequestHandler):
+	def do_GET(self) -> None:
+		if self.path.split("?")[0] not in ("/metrics", "/"):
+			self.send_error(404)
+			return
+		body = REGISTRY.render().encode("utf-8")
+		self.send_response(200)
+		self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, format: str, *args: Any) -> None:
+		pass
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+	# GET http://127.0.0.1:<port>/metrics from a daemon thread
+	server = ThreadingHTTPServer((host, port), _Handler)
+	server.daemon_threads = True
+	threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+	log.info("Metrics at http://%s:%d/metrics", host, server.server_address[1])
+	return server
+
+
+def start_summary_log(interval_sec: float) -> threading.Event:
+	# Prints REGISTRY.summary_line() every interval_sec; set the returned event to stop
+	stop = threading.Event()
+
+	def _loop() -> None:
+		while not stop.wait(interval_sec):
+			line = REGISTRY.summary_line()
+			if line:
+				log.info("[metrics] %s", line)
+
+	threading.Thread(target=_loop, name="metrics-log", daemon=True).start()
+	return stop
@@ -0,0 +1,263 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from log_setup import event
+from state import StateStore
+
+log = logging.getLogger(__name__)
+
+_FILLED = ("executed", "complete", "completed", "filled", "traded")
+_FAILED = ("rejected", "cancelled", "canceled", "expired", "failed")
+
+
+def _first_row(resp: Any) -> Dict[str, Any]:
+	if not isinstance(resp, dict):
+		return {}
+	data = resp.get("Success") or resp.get("data") or {}
+	if isinstance(data, list):
+		return data[0] if data and isinstance(data[0], dict) else {}
+	return data if isinstance(data, dict) else {}
+
+
+def order_id_from_response(resp: Any) -> Optional[str]:
+	order_id = _first_row(resp).get("order_id")
+	return str(order_id) if order_id else None
+
+
+def parse_order_status(resp: Any, qty: int) -> Tuple[str, Optional[float], int]:
+	# Breeze get_order_detail -> ("filled" | "failed" | "open", average fill price, filled quantity)
+	row = _first_row(resp)
+	status = str(row.get("status") or row.get("order_status") or "").strip().lower()
+	avg_price = None
+	for key in ("average_price", "avg_price", "price"):
+		try:
+			val = float(row.get(key) or 0)
+		except (TypeError, ValueError):
+			continue
+		if val > 0:
+			avg_price = val
+			break
+	filled: Optional[int] = None
+	try:
+		if row.get("pending_quantity") not in (None, ""):
+			filled = int(float(row.get("quantity") or qty)) - int(float(row["pending_quantity"]))
+		elif row.get("filled_quantity") not in (None, ""):
+			filled = int(float(row["filled_quantity"]))
+	except (TypeError, ValueError):
+		pass
+	if status in _FILLED:
+		return "filled", avg_price, qty if filled is None else filled
+	if status in _FAILED:
+		# Cancelled/expired after a partial fill still leaves the filled part as a position
+		return "failed", avg_price, filled or 0
+	return "open", avg_price, filled or 0
+
+
+class Order:
+	def __init__(self, symbol: str, breeze_code: str, exchange_code: str, action: str, qty: int, expected_price: float, reason: str = "") -> None:
+		self.symbol = symbol
+		self.breeze_code = breeze_code
+		self.exchange_code = exchange_code
+		self.action = action
+		self.qty = int(qty)
+		self.expected_price = float(expected_price)
+		self.reason = reason
+		self.order_id: Optional[str] = None
+		self.status = "new"
+		self.fill_price: Optional[float] = None
+		self.filled_qty = 0
+		self.submitted_at = time.time()
+		self.filled_at: Optional[float] = None
+
+	@property
+	def slippage(self) -> Optional[float]:
+		# Per-share cost versus the price the decision was made at; positive means a worse fill
+		if self.fill_price is None:
+			return None
+		if self.action == "BUY":
+			return self.fill_price - self.expected_price
+		return self.expected_price - self.fill_price
+
+
+class OrderManager:
+	# Places orders off the quote loop and tracks them to a confirmed fill via get_order_status.
+	# A symbol has at most one order in flight; the trader skips decisions for it until the fill is
+	# applied to the StateStore. Submitted orders are journalled, so a restart resumes tracking.
+	# Works with any client exposing place_market_order/get_order_status (BreezeClient or a mock).
+	def __init__(self,
+				 client,
+				 store: StateStore,
+				 poll_interval_sec: float = 1.0,
+				 fill_timeout_sec: float = 30.0,
+				 max_workers: int = 4) -> None:
+		self.client = client
+		self.store = store
+		self.poll_interval_sec = max(0.05, float(poll_interval_sec))
+		self.fill_timeout_sec = float(fill_timeout_sec)
+		self._lock = threading.Lock()
+		self._pending: Dict[str, Order] = {}
+		self._stop = threading.Event()
+		self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="orders")
+		# Per-symbol fill count and total slippage cost, for slippage_summary()
+		self._slippage: Dict[str, Dict[str, float]] = {}
+		self._listeners: List[Callable[[Order], None]] = []
+
+	def add_listener(self, fn: Callable[[Order], None]) -> None:
+		# fn(order) runs on the order thread once the order is filled, failed or given up on
+		self._listeners.append(fn)
+
+	def _log(self, order: Order, msg: str, *args: Any, level: int = logging.INFO) -> None:
+		log.log(level, "[%s] " + msg, order.symbol, *args)
+
+	def pending(self, symbol: str) -> Optional[Order]:
+		with self._lock:
+			return self._pending.get(symbol.upper())
+
+	def submit(self, symbol: str, breeze_code: str, exchange_code: str, action: str, qty: int, expected_price: float, reason: str = "") -> Order:
+		if action not in ("BUY", "SELL"):
+			raise ValueError("action must be BUY or SELL")
+		with self._lock:
+			existing = self._pending.get(symbol.upper())
+			if existing is not None:
+				return existing
+			order = Order(symbol, breeze_code, exchange_code, action, qty, expected_price, reason)
+			self._pending[symbol.upper()] = order
+		self._pool.submit(self._run, order)
+		return order
+
+	def resume(self, exchange_code: str, codes: Optional[Dict[str, str]] = None) -> None:
+		# Pick up orders that were submitted before a restart but never confirmed
+		for symbol, rec in self.store.pending_orders().items():
+			order = Order(symbol, (codes or {}).get(symbol, symbol), exchange_code, rec["action"], rec["qty"], rec["expected_price"], "resumed")
+			order.order_id = rec["order_id"]
+			order.status = "open"
+			with self._lock:
+				if symbol in self._pending:
+					continue
+				self._pending[symbol] = order
+			self._log(order, "Resuming %s order %s", order.action, order.order_id)
+			self._pool.submit(self._track_and_release, order)
+
+	def _run(self, order: Order) -> None:
+		try:
+			with metrics.span("order_place_seconds", action=order.action):
+				resp = self.client.place_market_order(
+					stock_code=order.breeze_code,
+					exchange_code=order.exchange_code,
+					action=order.action,
+					quantity=order.qty,
+				)
+			order.order_id = order_id_from_response(resp)
+			if order.order_id is None:
+				if isinstance(resp, dict) and resp.get("Error") and not resp.get("Success"):
+					order.status = "failed"
+					self._log(order, "%s order rejected: %s", order.action, resp.get("Error"), level=logging.WARNING)
+					event("order_failed", symbol=order.symbol, action=order.action, error=resp.get("Error"))
+					return
+				# No id to poll: take the price from the response (or the decision price)
+				_, avg_price, _ = parse_order_status(resp, order.qty)
+				self._apply_fill(order, avg_price or order.expected_price, order.qty)
+				return
+			order.status = "open"
+			self.store.record_order(order.symbol, order.order_id, order.action, order.qty, order.expected_price)
+			self._log(order, "%s order %s placed; waiting for fill", order.action, order.order_id)
+			event("order", symbol=order.symbol, action=order.action, qty=order.qty, order_id=order.order_id, expected_price=order.expected_price)
+			self._track(order)
+		except Exception as e:
+			order.status = "failed"
+			self._log(order, "%s order error: %s", order.action, e, level=logging.ERROR)
+			event("order_failed", symbol=order.symbol, action=order.action, error=str(e))
+		finally:
+			self._release(order)
+
+	def _track_and_release(self, order: Order) -> None:
+		try:
+			self._track(order)
+		except Exception as e:
+			self._log(order, "Order tracking error: %s", e, level=logging.ERROR)
+		finally:
+			self._release(order)
+
+	def _release(self, order: Order) -> None:
+		with self._lock:
+			if self._pending.get(order.symbol.upper()) is order:
+				del self._pending[order.symbol.upper()]
+		for fn in self._listeners:
+			try:
+				fn(order)
+			except Exception as e:
+				self._log(order, "Order listener error: %s", e, level=logging.WARNING)
+
+	def _track(self, order: Order) -> None:
+		warned = False
+		interval = self.poll_interval_sec
+		while not self._stop.is_set():
+			try:
+				resp = self.client.get_order_status(order.order_id, order.exchange_code)
+				status, avg_price, filled = parse_order_status(resp, order.qty)
+			except Exception as e:
+				self._log(order, "Order status error: %s", e, level=logging.WARNING)
+				status, avg_price, filled = "open", None, 0
+			if status == "filled" or (status == "failed" and filled > 0):
+				self._apply_fill(order, avg_price or order.expected_price, filled or order.qty)
+				return
+			if status == "failed":
+				order.status = "failed"
+				metrics.inc("orders_failed_total", action=order.action)
+				self.store.finish_order(order.symbol, order.order_id, "failed")
+				self._log(order, "%s order %s did not fill", order.action, order.order_id, level=logging.WARNING)
+				event("order_failed", symbol=order.symbol, action=order.action, order_id=order.order_id)
+				return
+			if not warned and time.time() - order.submitted_at > self.fill_timeout_sec:
+				# Still open: keep tracking, but at a slower pace
+				warned = True
+				interval = self.poll_interval_sec * 5
+				self._log(order, "%s order %s not filled after %.0fs; still tracking", order.action, order.order_id, self.fill_timeout_sec, level=logging.WARNING)
+			self._stop.wait(interval)
+
+	def _apply_fill(self, order: Order, price: float, qty: int) -> None:
+		order.fill_price = float(price)
+		order.filled_qty = int(qty)
+		order.filled_at = time.time()
+		order.status = "filled"
+		metrics.observe("order_fill_seconds", order.filled_at - order.submitted_at, action=order.action)
+		metrics.inc("orders_filled_total", action=order.action)
+		details = {"order_id": order.order_id, "expected_price": order.expected_price, "slippage": order.slippage}
+		if order.action == "BUY":
+			self.store.set_position(order.symbol, qty, price, per_symbol=True, **details)
+			self._log(order, "Bought qty=%s avg_price=%s (slippage %+.4f/share)", qty, price, order.slippage)
+			event("fill", symbol=order.symbol, action="BUY", qty=qty, price=price, **details)
+		else:
+			# PnL only for the shares that sold; a partial fill keeps the rest of the position open
+			pos = self.store.get_position(order.symbol) or {}
+			avg_buy = float(pos.get("avg_price", 0) or 0)
+			remaining = max(0, int(pos.get("qty", 0) or 0) - qty)
+			pnl = (price - avg_buy) * qty if avg_buy > 0 else 0.0
+			total = self.store.record_sell(order.symbol, pnl, price, remaining_qty=remaining, **details)
+			self._log(order, "Sold qty=%s due to %s at %s; trade PnL=%.2f; total PnL=%.2f (slippage %+.4f/share)", qty, order.reason or "exit", price, pnl, total, order.slippage)
+			if remaining:
+				self._log(order, "Sell only partly filled; %s share(s) still held", remaining, level=logging.WARNING)
+			event("fill", symbol=order.symbol, action="SELL", qty=qty, price=price, reason=order.reason, pnl=pnl, remaining_qty=remaining, **details)
+		with self._lock:
+			s = self._slippage.setdefault(order.symbol, {"fills": 0.0, "total_slippage": 0.0})
+			s["fills"] += 1
+			s["total_slippage"] += (order.slippage or 0.0) * order.filled_qty
+
+	def slippage_summary(self) -> Dict[str, Dict[str, float]]:
+		with self._lock:
+			return {sym: dict(s) for sym, s in self._slippage.items()}
+
+	def close(self, timeout: float = 10.0) -> None:
+		# Give in-flight orders a moment to confirm; anything still open resumes on the next start
+		deadline = time.monotonic() + timeout
+		while time.monotonic() < deadline:
+			with self._lock:
+				if not self._pending:
+					break
+			time.sleep(0.05)
+		self._stop.set()
+		self._pool.shutdown(wait=True)
@@ -0,0 +1,196 @@
+import itertools
+import logging
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from source_health import SourceSkipped
+from stream import parse_tick
+
+log = logging.getLogger(__name__)
+
+# Simulated broker with BreezeClient's interface (get_ltp, place_market_order, get_order_status,
+# plus history/stream passthrough), for dry runs and load tests. Market data comes from an
+# optional real client (the "feed") or from prices pushed in with update_price(); only orders are
+# simulated. A MARKET order is acknowledged at once and fills after a random latency at the first
+# price seen from then on, moved against the trader by the slippage model. Optionally only part of
+# the quantity fills at a time. Nothing ever reaches the exchange.
+
+
+class PaperOrder:
+	def __init__(self, order_id: str, stock_code: str, exchange_code: str, action: str, qty: int, placed_at: float, due_at: float) -> None:
+		self.order_id = order_id
+		self.stock_code = stock_code
+		self.exchange_code = exchange_code
+		self.action = action
+		self.qty = qty
+		self.placed_at = placed_at
+		self.due_at = due_at
+		self.filled = 0
+		self.notional = 0.0
+		self.status = "Ordered"
+
+	@property
+	def average_price(self) -> float:
+		return self.notional / self.filled if self.filled else 0.0
+
+	def row(self) -> Dict[str, Any]:
+		# Shaped like a Breeze get_order_detail row
+		return {
+			"order_id": self.order_id,
+			"stock_code": self.stock_code,
+			"exchange_code": self.exchange_code,
+			"action": self.action,
+			"order_type": "Market",
+			"status": self.status,
+			"quantity": str(self.qty),
+			"pending_quantity": str(self.qty - self.filled),
+			"average_price": f"{self.average_price:.4f}" if self.filled else "0",
+			"order_datetime": datetime.fromtimestamp(self.placed_at).strftime("%d-%b-%Y %H:%M:%S"),
+		}
+
+
+class PaperBroker:
+	def __init__(self,
+				 feed=None,
+				 latency_ms: float = 50.0,
+				 slippage_bps: float = 2.0,
+				 slippage_jitter_bps: float = 1.0,
+				 partial_fill_pct: float = 0.0,
+				 seed: Optional[int] = None,
+				 clock: Callable[[], float] = time.time) -> None:
+		self.feed = feed
+		self.latency_sec = max(0.0, latency_ms) / 1000.0
+		self.slippage_bps = slippage_bps
+		self.slippage_jitter_bps = slippage_jitter_bps
+		self.partial_fill_pct = partial_fill_pct
+		self.clock = clock
+		self._rng = random.Random(seed)
+		self._lock = threading.Lock()
+		self._ids = itertools.count(1)
+		self._orders: Dict[str, PaperOrder] = {}
+		self._open: List[PaperOrder] = []
+		self._last: Dict[Tuple[str, str], float] = {}
+
+	def connect(self) -> None:
+		if self.feed is not None:
+			self.feed.connect()
+
+	# Market data
+
+	def update_price(self, stock_code: str, ltp: float, exchange_code: str = "NSE") -> None:
+		# Price from a stream/replay; also settles orders that are due at this tick
+		with self._lock:
+			self._last[(stock_code.upper(), exchange_code.upper())] = float(ltp)
+			due = [o for o in self._open if o.stock_code.upper() == stock_code.upper() and o.due_at <= self.clock()]
+			for order in due:
+				self._fill(order, float(ltp))
+
+	def get_ltp(self, stock_code: str, exchange_code: str) -> Optional[float]:
+		ltp = self.feed.get_ltp(stock_code, exchange_code) if self.feed is not None else None
+		if ltp is not None:
+			self.update_price(stock_code, ltp, exchange_code)
+			return ltp
+		with self._lock:
+			return self._last.get((stock_code.upper(), exchange_code.upper()))
+
+	def get_historical_bars(self, *args: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+		return self.feed.get_historical_bars(*args, **kwargs) if self.feed is not None else []
+
+	def start_stream(self, stock_codes: List[str], exchange_code: str, on_ticks: Callable[[Dict[str, Any]], None]) -> Dict[str, str]:
+		if self.feed is None:
+			raise RuntimeError("Paper trading in stream mode needs a market data feed")
+		tokens: Dict[str, str] = {}
+
+		def _on_ticks(tick: Dict[str, Any]) -> None:
+			parsed = parse_tick(tick, tokens)
+			if parsed is not None:
+				self.update_price(parsed[0], parsed[1], exchange_code)
+			on_ticks(tick)
+
+		tokens.update(self.feed.start_stream(stock_codes, exchange_code, _on_ticks))
+		return tokens
+
+	def stop_stream(self) -> None:
+		if self.feed is not None:
+			self.feed.stop_stream()
+
+	# Orders
+
+	def _latency(self) -> float:
+		if self.latency_sec <= 0:
+			return 0.0
+		return self.latency_sec * self._rng.lognormvariate(0.0, 0.5)
+
+	def _slipped(self, action: str, price: float) -> float:
+		bps = self.slippage_bps + abs(self._rng.gauss(0.0, self.slippage_jitter_bps)) if self.slippage_jitter_bps > 0 else self.slippage_bps
+		move = price * bps / 10000.0
+		return price + move if action == "BUY" else price - move
+
+	def _fill(self, order: PaperOrder, price: float) -> None:
+		# Caller holds the lock
+		remaining = order.qty - order.filled
+		qty = remaining
+		if remaining > 1 and self._rng.random() < self.partial_fill_pct:
+			qty = self._rng.randint(1, remaining - 1)
+		order.filled += qty
+		order.notional += qty * self._slipped(order.action, price)
+		metrics.inc("paper_fills_total", action=order.action, kind="full" if order.filled == order.qty and qty == order.qty else "partial")
+		if order.filled >= order.qty:
+			order.status = "Executed"
+			self._open.remove(order)
+		else:
+			# The rest fills after another round of latency
+			order.due_at = self.clock() + self._latency()
+
+	def place_market_order(self,
+						   stock_code: str,
+						   exchange_code: str,
+						   action: str,
+						   quantity: int,
+						   product: str = "cash",
+						   validity: str = "DAY") -> Dict[str, Any]:
+		if action not in ("BUY", "SELL"):
+			raise ValueError("action must be BUY or SELL")
+		if int(quantity) <= 0:
+			return {"Success": None, "Status": 500, "Error": "Quantity must be positive"}
+		now = self.clock()
+		order = PaperOrder(f"PAPER{next(self._ids):08d}", stock_code, exchange_code, action, int(quantity), now, now + self._latency())
+		with self._lock:
+			self._orders[order.order_id] = order
+			self._open.append(order)
+		metrics.inc("paper_orders_total", action=action)
+		log.debug("Paper %s %s x%d accepted as %s", action, stock_code, order.qty, order.order_id)
+		success: Dict[str, Any] = {"order_id": order.order_id, "message": "Paper order placed"}
+		if order.due_at <= now:
+			# No latency configured: fill right away and report the price like an executed order
+			row = self.get_order_status(order.order_id, exchange_code)["Success"][0]
+			if order.status == "Executed":
+				success["average_price"] = row["average_price"]
+		return {"Success": success, "Status": 200, "Error": None}
+
+	def get_order_status(self, order_id: str, exchange_code: str = "NSE") -> Dict[str, Any]:
+		with self._lock:
+			order = self._orders.get(order_id)
+		if order is None:
+			return {"Success": None, "Status": 500, "Error": f"Unknown order {order_id}"}
+		if order.status != "Executed" and order.due_at <= self.clock():
+			if self.feed is not None:
+				# A fresh quote settles due orders through update_price
+				try:
+					self.get_ltp(order.stock_code, order.exchange_code)
+				except SourceSkipped:
+					pass
+			with self._lock:
+				price = self._last.get((order.stock_code.upper(), order.exchange_code.upper()))
+				if order.status != "Executed" and order.due_at <= self.clock() and price is not None:
+					self._fill(order, price)
+		with self._lock:
+			return {"Success": [order.row()], "Status": 200, "Error": None}
+
+	def orders(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			return [o.row() for o in self._orders.values()]
@@ -1,19 +1,35 @@
-from typing import Optional, List
+import logging
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
 
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import yfinance as yf
 
+from http_pool import ManagedSession
 
-_session: Optional[requests.Session] = None
-_nse_session: Optional[requests.Session] = None
+log = logging.getLogger(__name__)
 
+# Below this many symbols a full index snapshot costs more than per-symbol quote-equity calls
+_NSE_INDEX_MIN_SYMBOLS = 3
+_NSE_DEFAULT_INDEX = "NIFTY 500"
+_NSE_HOME = "https://www.nseindia.com/"
+_NSE_HEADERS = {
+	"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+	"Accept": "*/*",
+	"Accept-Language": "en-US,en;q=0.9",
+	"Connection": "keep-alive",
+	"Referer": _NSE_HOME,
+}
 
-def _get_retry_session() -> requests.Session:
-	global _session
-	if _session is not None:
-		return _session
+# Connections per host; matches the quote router's worker pool so concurrent fetches never queue
+# for, or discard, a pooled connection
+_pool_size = 32
+_http2 = False
+
+
+def _new_yf_session() -> requests.Session:
 	s = requests.Session()
 	retry = Retry(
 		total=3,
@@ -23,31 +39,75 @@ def _get_retry_session() -> requests.Session:
 		status_forcelist=(429, 500, 502, 503, 504),
 		allowed_methods=("GET", "POST"),
 	)
-	adapter = HTTPAdapter(max_retries=retry)
+	adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_pool_size, max_retries=retry)
 	s.mount("http://", adapter)
 	s.mount("https://", adapter)
-	_session = s
 	return s
 
 
-def _get_nse_session() -> requests.Session:
-	global _nse_session
-	if _nse_session is not None:
-		return _nse_session
-	s = requests.Session()
-	s.headers.update({
-		"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
-		"Accept": "*/*",
-		"Accept-Language": "en-US,en;q=0.9",
-		"Connection": "keep-alive",
-		"Referer": "https://www.nseindia.com/",
-	})
+def _new_nse_session():
+	s = None
+	if _http2:
+		try:
+			import httpx
+			limits = httpx.Limits(max_connections=_pool_size, max_keepalive_connections=_pool_size)
+			# Connection headers are not allowed on HTTP/2
+			headers = {k: v for k, v in _NSE_HEADERS.items() if k != "Connection"}
+			s = httpx.Client(http2=True, headers=headers, limits=limits, timeout=10, follow_redirects=True)
+		except ImportError:
+			log.warning("HTTP/2 needs `pip install httpx[http2]`; using HTTP/1.1 for NSE.")
+	if s is None:
+		s = requests.Session()
+		s.headers.update(_NSE_HEADERS)
+		s.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=_pool_size))
 	# Prime cookies by visiting homepage
-	s.get("https://www.nseindia.com/", timeout=10)
-	_nse_session = s
+	s.get(_NSE_HOME, timeout=10)
 	return s
 
 
+_yf = ManagedSession("yf", _new_yf_session)
+# NSE's cookies expire after a few minutes; a fresh session is primed before that happens
+_nse = ManagedSession("nse", _new_nse_session, refresh_sec=240.0)
+
+
+def configure_http(pool_size: int = 32, nse_refresh_sec: float = 240.0, http2: bool = False) -> None:
+	global _pool_size, _http2, _yf, _nse
+	_pool_size = max(1, int(pool_size))
+	_http2 = bool(http2)
+	old = (_yf, _nse)
+	_yf = ManagedSession("yf", _new_yf_session)
+	_nse = ManagedSession("nse", _new_nse_session, refresh_sec=nse_refresh_sec)
+	for session in old:
+		session.close()
+
+
+def warm_connections(sources: Iterable[str]) -> None:
+	# Open and prime connections in the background so the first quotes do not pay for it
+	for name in sources:
+		if name == "yf":
+			_yf.warm()
+		elif name == "nse":
+			_nse.warm()
+
+
+def _get_retry_session() -> requests.Session:
+	return _yf.get()
+
+
+def _get_nse_session():
+	return _nse.get()
+
+
+def _nse_get(url: str):
+	s = _get_nse_session()
+	resp = s.get(url, timeout=10)
+	if resp.status_code in (401, 403):
+		# Cookies expired or were rejected: prime a new session once and retry
+		resp = _nse.renew(s).get(url, timeout=10)
+	_nse.report(resp.status_code == 200)
+	return resp
+
+
 def resolve_yf_candidates(symbol: str, exchange_code: str) -> List[str]:
 	# If user already provided a Yahoo-style ticker, use as-is first
 	if "." in symbol:
@@ -96,9 +156,7 @@ def _try_history(ticker: yf.Ticker) -> Optional[float]:
 	return None
 
 
-def get_ltp_yf(symbol: str, exchange_code: str = "NSE") -> Optional[float]:
-	session = _get_retry_session()
-	candidates = resolve_yf_candidates(symbol, exchange_code)
+def _ticker_ltp(candidates: List[str], session: requests.Session) -> Optional[float]:
 	for cand in candidates:
 		t = yf.Ticker(cand, session=session)
 		ltp = _try_fast_info(t)
@@ -111,11 +169,77 @@ def get_ltp_yf(symbol: str, exchange_code: str = "NSE") -> Optional[float]:
 	return None
 
 
-def get_ltp_nse(symbol: str) -> Optional[float]:
+def _last_close(frame) -> Optional[float]:
 	try:
-		s = _get_nse_session()
-		url = f"https://www.nseindia.com/api/quote-equity?symbol={symbol.upper()}"
-		resp = s.get(url, timeout=10)
+		if frame is None or "Close" not in frame.columns:
+			return None
+		closes = frame["Close"].dropna()
+		return float(closes.iloc[-1]) if len(closes) else None
+	except Exception:
+		return None
+
+
+def _download_last_closes(tickers: List[str], session: requests.Session) -> Dict[str, float]:
+	# One multi-ticker request for the whole batch instead of one Ticker per symbol
+	out: Dict[str, float] = {}
+	if not tickers:
+		return out
+	try:
+		df = yf.download(
+			tickers=tickers,
+			period="1d",
+			interval="1m",
+			group_by="ticker",
+			auto_adjust=False,
+			threads=True,
+			progress=False,
+			session=session,
+		)
+	except Exception:
+		return out
+	if df is None or df.empty:
+		return out
+	multi = getattr(df.columns, "nlevels", 1) > 1
+	for t in tickers:
+		try:
+			frame = df[t] if multi else df
+		except KeyError:
+			continue
+		ltp = _last_close(frame)
+		if ltp is not None:
+			out[t] = ltp
+	return out
+
+
+def get_ltps_yf(symbols: Iterable[str], exchange_code: str = "NSE") -> Dict[str, Optional[float]]:
+	session = _get_retry_session()
+	symbols = list(dict.fromkeys(symbols))
+	result: Dict[str, Optional[float]] = {sym: None for sym in symbols}
+	candidates = {sym: resolve_yf_candidates(sym, exchange_code) for sym in symbols}
+	# Each round batches the next untried candidate of every symbol still missing a price
+	depth = max((len(c) for c in candidates.values()), default=0)
+	for i in range(depth):
+		round_map = {candidates[sym][i]: sym for sym in symbols if result[sym] is None and i < len(candidates[sym])}
+		for ticker, ltp in _download_last_closes(list(round_map), session).items():
+			result[round_map[ticker]] = ltp
+	# Symbols the bulk download could not price fall back to per-ticker metadata
+	for sym in symbols:
+		if result[sym] is None:
+			result[sym] = _ticker_ltp(candidates[sym], session)
+	_yf.report(any(ltp is not None for ltp in result.values()) or not symbols)
+	return result
+
+
+def get_ltp_yf(symbol: str, exchange_code: str = "NSE") -> Optional[float]:
+	# One symbol: the per-ticker quote is cheaper than a one-ticker bulk download
+	ltp = _ticker_ltp(resolve_yf_candidates(symbol, exchange_code), _get_retry_session())
+	_yf.report(ltp is not None)
+	return ltp
+
+
+def _get_nse_quote_equity(symbol: str) -> Optional[float]:
+	try:
+		resp = _nse_get(f"https://www.nseindia.com/api/quote-equity?symbol={quote(symbol.upper())}")
 		if resp.status_code != 200:
 			return None
 		data = resp.json()
@@ -123,4 +247,44 @@ def get_ltp_nse(symbol: str) -> Optional[float]:
 		ltp = price_info.get("lastPrice")
 		return float(ltp) if ltp is not None else None
 	except Exception:
+		_nse.report(False)
 		return None
+
+
+def _get_nse_index_prices(index: str) -> Dict[str, float]:
+	# One market-watch snapshot returns lastPrice for every constituent of the index
+	out: Dict[str, float] = {}
+	try:
+		resp = _nse_get(f"https://www.nseindia.com/api/equity-stockIndices?index={quote(index)}")
+		if resp.status_code != 200:
+			return out
+		for row in resp.json().get("data") or []:
+			sym = row.get("symbol")
+			ltp = row.get("lastPrice")
+			if sym and ltp is not None:
+				try:
+					out[str(sym).upper()] = float(ltp)
+				except (TypeError, ValueError):
+					continue
+	except Exception:
+		_nse.report(False)
+	return out
+
+
+def get_ltps_nse(symbols: Iterable[str], index: str = _NSE_DEFAULT_INDEX) -> Dict[str, Optional[float]]:
+	symbols = list(dict.fromkeys(symbols))
+	result: Dict[str, Optional[float]] = {sym: None for sym in symbols}
+	if len(symbols) >= _NSE_INDEX_MIN_SYMBOLS:
+		snapshot = _get_nse_index_prices(index)
+		for sym in symbols:
+			result[sym] = snapshot.get(sym.upper())
+	# Symbols outside the index (or small batches) use the per-symbol endpoint
+	for sym in symbols:
+		if result[sym] is None:
+			result[sym] = _get_nse_quote_equity(sym)
+	return result
+
+
+def get_ltp_nse(symbol: str) -> Optional[float]:
+	return get_ltps_nse([symbol]).get(symbol)
+
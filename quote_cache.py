@@ -0,0 +1,406 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# Shared last-price cache in front of quote_router. Keyed by (symbol, exchange); how long a price
+# stays fresh depends on the source that produced it. Concurrent requests for a key that is being
+# fetched wait for that one fetch (singleflight) instead of starting their own, and the least
+# recently used keys are evicted past max_entries.
+# Several processes (the trader, a monitor, a notebook) can share one cache through a small
+# JSON-lines server on a Unix socket (TCP on 127.0.0.1 where Unix sockets are unavailable). The
+# server also hands out short fetch leases, so only one process goes to the network per key.
+
+Key = Tuple[str, str]
+FetchResult = Tuple[Optional[float], Optional[str]]  # (ltp, source that produced it)
+
+DEFAULT_TTL_SEC: Dict[str, float] = {"breeze": 1.0, "nse": 2.0, "yf": 2.0}
+_FALLBACK_TCP_PORT = 8766
+_REMOTE_RETRY_SEC = 30.0
+
+
+def _key(symbol: str, exchange_code: str) -> Key:
+	return symbol.upper(), (exchange_code or "").upper()
+
+
+def _wire_key(key: Key) -> str:
+	return f"{key[0]}|{key[1]}"
+
+
+class QuoteCache:
+	def __init__(self,
+				 max_entries: int = 4096,
+				 ttl_sec: Optional[Dict[str, float]] = None,
+				 default_ttl_sec: float = 1.0,
+				 remote: Optional["RemoteCache"] = None,
+				 lease_sec: float = 3.0) -> None:
+		self.max_entries = int(max_entries)
+		self.ttl_sec = dict(DEFAULT_TTL_SEC if ttl_sec is None else ttl_sec)
+		self.default_ttl_sec = float(default_ttl_sec)
+		self.remote = remote
+		self.lease_sec = float(lease_sec)
+		self._lock = threading.Lock()
+		self._entries: "OrderedDict[Key, Tuple[float, str, float]]" = OrderedDict()  # key -> (ltp, source, expires)
+		self._inflight: Dict[Key, Future] = {}
+
+	@property
+	def enabled(self) -> bool:
+		return self.max_entries > 0
+
+	def ttl(self, source: Optional[str]) -> float:
+		return float(self.ttl_sec.get(source or "", self.default_ttl_sec))
+
+	def _lookup(self, key: Key) -> Optional[Tuple[float, str]]:
+		now = time.monotonic()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None:
+				return None
+			if entry[2] <= now:
+				del self._entries[key]
+				return None
+			self._entries.move_to_end(key)
+			return entry[0], entry[1]
+
+	def _store(self, key: Key, ltp: float, source: str, ttl: float) -> None:
+		if ttl <= 0 or not self.enabled:
+			return
+		with self._lock:
+			self._entries[key] = (float(ltp), source, time.monotonic() + ttl)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.max_entries:
+				self._entries.popitem(last=False)
+				metrics.inc("quote_cache_evictions_total")
+
+	def get(self, symbol: str, exchange_code: str) -> Optional[float]:
+		hit = self._lookup(_key(symbol, exchange_code))
+		return hit[0] if hit else None
+
+	def put(self, symbol: str, exchange_code: str, ltp: Optional[float], source: Optional[str]) -> None:
+		if ltp is None or not self.enabled:
+			return
+		key = _key(symbol, exchange_code)
+		ttl = self.ttl(source)
+		self._store(key, ltp, source or "", ttl)
+		if self.remote is not None:
+			self.remote.put(key, ltp, source or "", ttl)
+
+	def __len__(self) -> int:
+		with self._lock:
+			return len(self._entries)
+
+	def _claim(self, key: Key) -> Tuple[Optional[float], Optional[Future], bool]:
+		# (cached ltp, in-flight future, True if this caller must fetch)
+		hit = self._lookup(key)
+		if hit is not None:
+			metrics.inc("quote_cache_hits_total", tier="local")
+			return hit[0], None, False
+		with self._lock:
+			fut = self._inflight.get(key)
+			if fut is not None:
+				metrics.inc("quote_cache_coalesced_total")
+				return None, fut, False
+			fut = self._inflight[key] = Future()
+		return None, fut, True
+
+	def _remote_claim(self, key: Key) -> Tuple[Optional[float], bool]:
+		# (ltp from the shared cache, True if we hold the fetch lease)
+		if self.remote is None:
+			return None, False
+		ltp, source, ttl_left, lease = self.remote.get(key, self.lease_sec)
+		if ltp is not None:
+			metrics.inc("quote_cache_hits_total", tier="remote")
+			self._store(key, ltp, source or "", ttl_left)
+		return ltp, lease
+
+	def _finish(self, key: Key, fut: Future, result: FetchResult, leased: bool, fetched: bool = True) -> Optional[float]:
+		ltp, source = result
+		if ltp is not None and fetched:
+			self._store(key, ltp, source or "", self.ttl(source))
+			if self.remote is not None:
+				self.remote.put(key, ltp, source or "", self.ttl(source))
+		elif leased and self.remote is not None:
+			self.remote.release(key)
+		with self._lock:
+			self._inflight.pop(key, None)
+		fut.set_result(ltp)
+		return ltp
+
+	def _abort(self, key: Key, fut: Future, leased: bool, error: BaseException) -> None:
+		if leased and self.remote is not None:
+			self.remote.release(key)
+		with self._lock:
+			self._inflight.pop(key, None)
+		fut.set_exception(error)
+
+	def get_or_fetch(self, symbol: str, exchange_code: str, fetch: Callable[[], FetchResult]) -> Optional[float]:
+		if not self.enabled:
+			return fetch()[0]
+		key = _key(symbol, exchange_code)
+		ltp, fut, owner = self._claim(key)
+		if not owner:
+			return ltp if fut is None else fut.result()
+		assert fut is not None
+		leased = False
+		try:
+			ltp, leased = self._remote_claim(key)
+			if ltp is not None:
+				return self._finish(key, fut, (ltp, None), False, fetched=False)
+			metrics.inc("quote_cache_misses_total")
+			return self._finish(key, fut, fetch(), leased)
+		except BaseException as e:
+			if not fut.done():
+				self._abort(key, fut, leased, e)
+			raise
+
+	async def get_or_fetch_async(self, symbol: str, exchange_code: str, fetch: Callable[[], Awaitable[FetchResult]]) -> Optional[float]:
+		if not self.enabled:
+			return (await fetch())[0]
+		key = _key(symbol, exchange_code)
+		ltp, fut, owner = self._claim(key)
+		if not owner:
+			return ltp if fut is None else await asyncio.wrap_future(fut)
+		assert fut is not None
+		leased = False
+		try:
+			if self.remote is not None:
+				# The shared cache may hold us until another process's fetch lands; keep the loop free
+				ltp, leased = await asyncio.get_running_loop().run_in_executor(None, self._remote_claim, key)
+				if ltp is not None:
+					return self._finish(key, fut, (ltp, None), False, fetched=False)
+			metrics.inc("quote_cache_misses_total")
+			return self._finish(key, fut, await fetch(), leased)
+		except BaseException as e:
+			if not fut.done():
+				self._abort(key, fut, leased, e)
+			raise
+
+
+def _parse_address(address: str) -> Tuple[int, Any]:
+	# "unix:/path", "/path" -> Unix socket (TCP 127.0.0.1 fallback where unsupported); "host:port" -> TCP
+	if address.startswith("unix:") or address.startswith("/"):
+		path = address[len("unix:"):] if address.startswith("unix:") else address
+		if hasattr(socket, "AF_UNIX"):
+			return socket.AF_UNIX, path
+		return socket.AF_INET, ("127.0.0.1", _FALLBACK_TCP_PORT)
+	host, _, port = address.rpartition(":")
+	return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+class RemoteCache:
+	# Client side of serve(). Each thread keeps its own connection; if the server is gone the
+	# cache works locally and retries the server after a while.
+	def __init__(self, address: str, timeout_sec: float = 5.0, host_if_missing: bool = False) -> None:
+		self.address = address
+		self.host_if_missing = host_if_missing
+		self.family, self.target = _parse_address(address)
+		self.timeout_sec = timeout_sec
+		self._local = threading.local()
+		self._down_until = 0.0
+
+	def _conn(self) -> Tuple[socket.socket, Any]:
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			sock = socket.socket(self.family, socket.SOCK_STREAM)
+			sock.settimeout(self.timeout_sec)
+			sock.connect(self.target)
+			conn = self._local.conn = (sock, sock.makefile("r", encoding="utf-8"))
+		return conn
+
+	def _request(self, msg: Dict[str, Any], wait_sec: float = 0.0) -> Optional[Dict[str, Any]]:
+		if time.monotonic() < self._down_until:
+			return None
+		try:
+			sock, reader = self._conn()
+			sock.settimeout(self.timeout_sec + wait_sec)
+			sock.sendall((json.dumps(msg, separators=(",", ":")) + "\n").encode("utf-8"))
+			line = reader.readline()
+			if not line:
+				raise ConnectionError("cache server closed the connection")
+			return json.loads(line)
+		except (OSError, ValueError) as e:
+			self._drop()
+			if self.host_if_missing and self._take_over():
+				return self._request(msg, wait_sec)
+			self._down_until = time.monotonic() + _REMOTE_RETRY_SEC
+			metrics.inc("quote_cache_remote_errors_total")
+			log.warning("Shared quote cache at %s unavailable (%s); using the local cache for %.0fs", self.address, e, _REMOTE_RETRY_SEC)
+			return None
+
+	def _drop(self) -> None:
+		conn = getattr(self._local, "conn", None)
+		self._local.conn = None
+		if conn is not None:
+			try:
+				conn[1].close()
+				conn[0].close()
+			except OSError:
+				pass
+
+	def _take_over(self) -> bool:
+		# The hosting process went away: host the shared cache here (entries start empty)
+		if self.ping():
+			return False
+		try:
+			serve(self.address)
+		except OSError as e:
+			log.debug("Shared quote cache not started here: %s", e)
+			return False
+		return True
+
+	def ping(self) -> bool:
+		try:
+			sock = socket.socket(self.family, socket.SOCK_STREAM)
+			sock.settimeout(1.0)
+			sock.connect(self.target)
+			sock.close()
+			return True
+		except OSError:
+			return False
+
+	def get(self, key: Key, lease_sec: float = 0.0) -> Tuple[Optional[float], Optional[str], float, bool]:
+		# (ltp, source, seconds of freshness left, lease granted)
+		resp = self._request({"op": "get", "k": _wire_key(key), "lease": lease_sec}, wait_sec=lease_sec)
+		if not resp:
+			return None, None, 0.0, False
+		return resp.get("ltp"), resp.get("src"), float(resp.get("ttl") or 0.0), bool(resp.get("lease"))
+
+	def put(self, key: Key, ltp: float, source: str, ttl: float) -> None:
+		self._request({"op": "put", "k": _wire_key(key), "ltp": ltp, "src": source, "ttl": ttl})
+
+	def release(self, key: Key) -> None:
+		self._request({"op": "release", "k": _wire_key(key)})
+
+
+class _CacheState:
+	def __init__(self, max_entries: int) -> None:
+		self.max_entries = max_entries
+		self.cond = threading.Condition()
+		self.entries: "OrderedDict[str, Tuple[float, str, float]]" = OrderedDict()
+		self.leases: Dict[str, float] = {}  # key -> lease expiry (monotonic)
+
+	def _fresh(self, k: str, now: float) -> Optional[Dict[str, Any]]:
+		entry = self.entries.get(k)
+		if entry is None or entry[2] <= now:
+			return None
+		self.entries.move_to_end(k)
+		return {"ltp": entry[0], "src": entry[1], "ttl": entry[2] - now}
+
+	def get(self, k: str, lease_sec: float) -> Dict[str, Any]:
+		with self.cond:
+			deadline = time.monotonic() + lease_sec
+			while True:
+				now = time.monotonic()
+				hit = self._fresh(k, now)
+				if hit is not None:
+					return hit
+				if lease_sec <= 0:
+					return {"ltp": None}
+				if self.leases.get(k, 0.0) <= now:
+					self.leases[k] = now + lease_sec
+					return {"ltp": None, "lease": True}
+				# Someone else is fetching this key: wait for their put (or their lease to lapse)
+				remaining = min(deadline, self.leases[k]) - now
+				if remaining <= 0:
+					return {"ltp": None, "lease": False}
+				self.cond.wait(remaining)
+
+	def put(self, k: str, ltp: float, source: str, ttl: float) -> None:
+		with self.cond:
+			if ttl > 0:
+				self.entries[k] = (float(ltp), source, time.monotonic() + ttl)
+				self.entries.move_to_end(k)
+				while len(self.entries) > self.max_entries:
+					self.entries.popitem(last=False)
+			self.leases.pop(k, None)
+			self.cond.notify_all()
+
+	def release(self, k: str) -> None:
+		with self.cond:
+			self.leases.pop(k, None)
+			self.cond.notify_all()
+
+
+class _CacheHandler(socketserver.StreamRequestHandler):
+	def handle(self) -> None:
+		state: _CacheState = self.server.state  # type: ignore[attr-defined]
+		for line in self.rfile:
+			try:
+				msg = json.loads(line)
+				op = msg.get("op")
+				if op == "get":
+					resp = state.get(msg["k"], float(msg.get("lease") or 0.0))
+				elif op == "put":
+					state.put(msg["k"], float(msg["ltp"]), str(msg.get("src") or ""), float(msg.get("ttl") or 0.0))
+					resp = {"ok": True}
+				elif op == "release":
+					state.release(msg["k"])
+					resp = {"ok": True}
+				elif op == "stats":
+					with state.cond:
+						resp = {"entries": len(state.entries), "leases": len(state.leases)}
+				else:
+					resp = {"error": f"unknown op {op!r}"}
+			except (ValueError, KeyError, TypeError) as e:
+				resp = {"error": str(e)}
+			self.wfile.write((json.dumps(resp, separators=(",", ":")) + "\n").encode("utf-8"))
+
+
+class _TCPCacheServer(socketserver.ThreadingTCPServer):
+	daemon_threads = True
+	allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+	class _UnixCacheServer(socketserver.ThreadingUnixStreamServer):
+		daemon_threads = True
+
+
+def serve(address: str, max_entries: int = 65536) -> socketserver.BaseServer:
+	# Starts a shared cache server on a daemon thread
+	family, target = _parse_address(address)
+	if family == getattr(socket, "AF_UNIX", None):
+		if os.path.exists(target):
+			if RemoteCache(address).ping():
+				raise OSError(f"a quote cache is already serving {address}")
+			os.unlink(target)  # stale socket from a process that did not exit cleanly
+		server: socketserver.BaseServer = _UnixCacheServer(target, _CacheHandler)
+	else:
+		server = _TCPCacheServer(target, _CacheHandler)
+	server.state = _CacheState(max_entries)  # type: ignore[attr-defined]
+	threading.Thread(target=server.serve_forever, name="quote-cache-server", daemon=True).start()
+	log.info("Shared quote cache listening on %s", address)
+	return server
+
+
+def connect(address: str, start_server: bool = True) -> RemoteCache:
+	# Use the shared cache at address; the first process to find none running hosts it
+	remote = RemoteCache(address, host_if_missing=start_server)
+	if start_server:
+		remote._take_over()
+	return remote
+
+
+if __name__ == "__main__":
+	# Standalone shared cache: python quote_cache.py [address]
+	logging.basicConfig(level=logging.INFO, format="%(message)s")
+	addr = sys.argv[1] if len(sys.argv) > 1 else "unix:/tmp/tradingapp-quotes.sock"
+	srv = serve(addr)
+	print(f"Quote cache on {addr}. Press Ctrl+C to stop.")
+	try:
+		while True:
+			time.sleep(3600)
+	except KeyboardInterrupt:
+		srv.shutdown()
@@ -1,46 +1,296 @@
-import os
+import asyncio
+import logging
+import threading
 import time
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
 
-from prices import get_ltp_yf, get_ltp_nse
+import metrics
+import quote_cache
+from prices import get_ltp_yf, get_ltp_nse, get_ltps_yf, get_ltps_nse
+from quote_cache import QuoteCache
+from source_health import SourceHealth, SourceSkipped
 
-_YF_COOLDOWN_FILE = "yf.cooldown"
-_YF_COOLDOWN_SEC = 600  # 10 minutes
+log = logging.getLogger(__name__)
 
+DEFAULT_SOURCES: Tuple[str, ...] = ("yf", "nse", "breeze")
+
+# Per-(symbol, "router", source) health; replaces the old global yf.cooldown file
+_ROUTER = "router"
+_health = SourceHealth(base_backoff_sec=5.0, max_backoff_sec=300.0)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_EXECUTOR_WORKERS = 32
+_executor_workers = _EXECUTOR_WORKERS
+# (symbol, source) calls still running on the pool, including ones a hedged fetch gave up on.
+# A source is not asked again for a symbol until its previous call returns, so slow calls can
+# never hold more than one worker per symbol and source.
+_running: Set[Tuple[str, str]] = set()
+_running_lock = threading.Lock()
+
+# Every consumer in the process (traders, strategies, monitors) shares one quote cache
+_cache = QuoteCache()
+
+
+def configure_cache(max_entries: int = 4096,
+					ttl_sec: Optional[Dict[str, float]] = None,
+					address: str = "",
+					lease_sec: float = 3.0) -> QuoteCache:
+	# max_entries=0 turns caching off; address shares the cache with other local processes
+	global _cache
+	remote = quote_cache.connect(address) if address and max_entries > 0 else None
+	_cache = QuoteCache(max_entries, ttl_sec, remote=remote, lease_sec=lease_sec)
+	return _cache
+
+
+def get_cache() -> QuoteCache:
+	return _cache
+
+
+# Replay mode: while a recorded feed is installed, every quote is read from it at the replay
+# clock's time, bypassing the cache, source health and network sources
+_replay = None
 
-def _yf_on_cooldown() -> bool:
-	try:
-		if not os.path.exists(_YF_COOLDOWN_FILE):
-			return False
-		with open(_YF_COOLDOWN_FILE, "r") as f:
-			ts = float(f.read().strip() or "0")
-		return (time.time() - ts) < _YF_COOLDOWN_SEC
-	except Exception:
-		return False
 
+def use_replay(feed) -> None:
+	global _replay
+	_replay = feed
 
-def _set_yf_cooldown() -> None:
+
+def _fetchers(symbol: str, exchange_code: str, breeze_client) -> Dict[str, Callable[[], Optional[float]]]:
+	return {
+		"yf": lambda: get_ltp_yf(symbol, exchange_code),
+		"nse": lambda: get_ltp_nse(symbol),
+		"breeze": lambda: breeze_client.get_ltp(symbol, exchange_code),
+	}
+
+
+def _call_source(symbol: str, name: str, fn: Callable[[], Optional[float]]) -> Optional[float]:
+	started = time.perf_counter()
 	try:
-		with open(_YF_COOLDOWN_FILE, "w") as f:
-			f.write(str(time.time()))
-	except Exception:
-		pass
+		ltp = fn()
+	except SourceSkipped:
+		# The client held the call back itself (rate limit, own backoff): not a source failure
+		metrics.observe("quote_source_seconds", time.perf_counter() - started, source=name)
+		metrics.inc("quote_source_errors_total", source=name, kind="skipped")
+		return None
+	except Exception as e:
+		metrics.observe("quote_source_seconds", time.perf_counter() - started, source=name)
+		metrics.inc("quote_source_errors_total", source=name, kind="error")
+		_health.record_failure(symbol, _ROUTER, name, str(e))
+		return None
+	metrics.observe("quote_source_seconds", time.perf_counter() - started, source=name)
+	if ltp is None or ltp <= 0:
+		metrics.inc("quote_source_errors_total", source=name, kind="empty")
+		_health.record_failure(symbol, _ROUTER, name, "no price")
+		return None
+	_health.record_success(symbol, _ROUTER, name)
+	return ltp
 
 
-def get_ltp(symbol: str, exchange_code: str, breeze_client) -> Optional[float]:
-	# 1) yfinance
-	if not _yf_on_cooldown():
-		ltp = get_ltp_yf(symbol, exchange_code)
+def _plan(symbol: str, breeze_client, sources: Sequence[str]) -> List[str]:
+	# Sources worth asking now, last-good first; ones in backoff wait for their re-probe time
+	allowed = [name for name in sources if name != "breeze" or breeze_client is not None]
+	return _health.order(symbol, _ROUTER, allowed)
+
+
+def _fetch_first(symbol: str, exchange_code: str, breeze_client, sources: Sequence[str]) -> Tuple[Optional[float], Optional[str]]:
+	fetchers = _fetchers(symbol, exchange_code, breeze_client)
+	for i, name in enumerate(_plan(symbol, breeze_client, sources)):
+		if i:
+			metrics.inc("quote_fallbacks_total", source=name)
+		ltp = _call_source(symbol, name, fetchers[name])
 		if ltp is not None:
-			return ltp
-		_set_yf_cooldown()
-		print("yfinance unavailable; entering cooldown.")
-	# 2) NSE India
-	ltp = get_ltp_nse(symbol)
-	if ltp is not None:
-		return ltp
-	# 3) Breeze fallback
+			return ltp, name
+	return None, None
+
+
+def get_ltp(symbol: str, exchange_code: str, breeze_client, sources: Sequence[str] = DEFAULT_SOURCES) -> Optional[float]:
+	if _replay is not None:
+		return _replay.get_ltp(symbol, exchange_code)
+	return _cache.get_or_fetch(symbol, exchange_code, lambda: _fetch_first(symbol, exchange_code, breeze_client, sources))
+
+
+def get_ltps_batch(symbols: Sequence[str], exchange_code: str, breeze_client, budget_sec: float = 3.0) -> Dict[str, Optional[float]]:
+	# Same source order as get_ltp, but each public source is asked once for the whole watchlist.
+	# Breeze has no batch quote, so its fallbacks run concurrently, bounded by budget_sec.
+	if _replay is not None:
+		return {sym: _replay.get_ltp(sym, exchange_code) for sym in symbols}
+	result: Dict[str, Optional[float]] = {sym: _cache.get(sym, exchange_code) for sym in symbols}
+	batch_fns: Dict[str, Callable[[List[str]], Dict[str, Optional[float]]]] = {
+		"yf": lambda syms: get_ltps_yf(syms, exchange_code),
+		"nse": lambda syms: get_ltps_nse(syms),
+	}
+	for name in DEFAULT_SOURCES:
+		todo = [sym for sym, ltp in result.items() if ltp is None and _health.available(sym, _ROUTER, name)]
+		if not todo:
+			continue
+		if name == "breeze":
+			if breeze_client is not None:
+				result.update(_breeze_batch(todo, exchange_code, breeze_client, budget_sec))
+			continue
+		try:
+			got = batch_fns[name](todo)
+		except Exception as e:
+			got = {}
+			log.warning("%s batch error: %s", name, e)
+		for sym in todo:
+			ltp = got.get(sym)
+			if ltp is None or ltp <= 0:
+				_health.record_failure(sym, _ROUTER, name, "no price")
+			else:
+				_health.record_success(sym, _ROUTER, name)
+				result[sym] = ltp
+				_cache.put(sym, exchange_code, ltp, name)
+	return result
+
+
+def _get_executor() -> ThreadPoolExecutor:
+	global _executor
+	if _executor is None:
+		_executor = ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix="quote")
+	return _executor
+
+
+def size_executor(symbols: int, sources: int = len(DEFAULT_SOURCES)) -> None:
+	# One worker per (symbol, source) pair, so a round never waits for a free worker
+	global _executor, _executor_workers
+	workers = max(_EXECUTOR_WORKERS, int(symbols) * int(sources))
+	if workers <= _executor_workers:
+		return
+	_executor_workers = workers
+	old, _executor = _executor, None
+	if old is not None:
+		old.shutdown(wait=False)
+
+
+def _breeze_batch(symbols: Sequence[str], exchange_code: str, breeze_client, budget_sec: float) -> Dict[str, Optional[float]]:
+	# One Breeze call per symbol, all at once on the shared pool. Symbols whose previous Breeze
+	# call is still running are skipped; calls still out at the deadline are abandoned.
+	calls: Dict["Future[Optional[float]]", str] = {}
+	for sym in symbols:
+		if not _claim_slot((sym, "breeze")):
+			continue
+		metrics.inc("quote_fallbacks_total", source="breeze")
+		call = _get_executor().submit(_call_source, sym, "breeze", lambda sym=sym: breeze_client.get_ltp(sym, exchange_code))
+		call.add_done_callback(lambda _, key=(sym, "breeze"): _release_slot(key))
+		calls[call] = sym
+	done, not_done = wait(calls, timeout=budget_sec)
+	if not_done:
+		metrics.inc("quote_budget_exceeded_total")
+	out: Dict[str, Optional[float]] = {}
+	for call in done:
+		sym = calls[call]
+		try:
+			out[sym] = call.result()
+		except Exception:
+			out[sym] = None
+		if out[sym] is not None:
+			_cache.put(sym, exchange_code, out[sym], "breeze")
+	return out
+
+
+def _claim_slot(key: Tuple[str, str]) -> bool:
+	# Check and take a (symbol, source) slot in one step, so two callers never both get it
+	with _running_lock:
+		if key in _running:
+			return False
+		_running.add(key)
+		return True
+
+
+def _release_slot(key: Tuple[str, str]) -> None:
+	with _running_lock:
+		_running.discard(key)
+
+
+def _source_calls(symbol: str, exchange_code: str, breeze_client, sources: Sequence[str]) -> List[Tuple[str, Callable[[], Optional[float]]]]:
+	fetchers = _fetchers(symbol, exchange_code, breeze_client)
+	return [
+		(name, lambda name=name: _call_source(symbol, name, fetchers[name]))
+		for name in _plan(symbol, breeze_client, sources)
+	]
+
+
+async def get_ltp_async(symbol: str,
+						exchange_code: str,
+						breeze_client,
+						budget_sec: float = 3.0,
+						hedge_sec: float = 0.5,
+						sources: Sequence[str] = DEFAULT_SOURCES) -> Optional[float]:
+	# Served from the quote cache when fresh; concurrent callers for one symbol share one fetch
+	if _replay is not None:
+		return _replay.get_ltp(symbol, exchange_code)
+	return await _cache.get_or_fetch_async(
+		symbol, exchange_code,
+		lambda: _hedged_fetch(symbol, exchange_code, breeze_client, budget_sec, hedge_sec, sources),
+	)
+
+
+async def _hedged_fetch(symbol: str,
+						exchange_code: str,
+						breeze_client,
+						budget_sec: float,
+						hedge_sec: float,
+						sources: Sequence[str]) -> Tuple[Optional[float], Optional[str]]:
+	# Hedged request: start the preferred source, launch the next one after hedge_sec
+	# (or as soon as the current one fails) and take the first valid LTP within budget_sec.
+	# Blocking source calls run on a shared thread pool; losers are abandoned, not awaited.
+	loop = asyncio.get_running_loop()
+	deadline = loop.time() + budget_sec
+	calls = _source_calls(symbol, exchange_code, breeze_client, sources)
+	pending: Dict["asyncio.Future[Optional[float]]", str] = {}
+	next_idx = 0
+	launched = 0
+
+	def _launch() -> bool:
+		# Start the next source whose slot is free; a source still busy with an earlier call for
+		# this symbol is passed over
+		nonlocal next_idx, launched
+		while next_idx < len(calls):
+			name, fn = calls[next_idx]
+			next_idx += 1
+			if not _claim_slot((symbol, name)):
+				continue
+			if launched:
+				# Hedge or fallback: the preferred source was slow or failed
+				metrics.inc("quote_fallbacks_total", source=name)
+			launched += 1
+			call = _get_executor().submit(fn)
+			# Frees the slot when the call returns, or at once if it is cancelled before starting
+			call.add_done_callback(lambda _, key=(symbol, name): _release_slot(key))
+			pending[asyncio.wrap_future(call, loop=loop)] = name
+			return True
+		return False
+
 	try:
-		return breeze_client.get_ltp(symbol, exchange_code)
-	except Exception:
-		return None
+		while pending or next_idx < len(calls):
+			if not pending and not _launch():
+				break
+			remaining = deadline - loop.time()
+			if remaining <= 0:
+				metrics.inc("quote_budget_exceeded_total")
+				return None, None
+			wait_for = min(hedge_sec, remaining) if next_idx < len(calls) else remaining
+			done, _ = await asyncio.wait(set(pending), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+			if not done:
+				if next_idx < len(calls):
+					_launch()
+				continue
+			for fut in done:
+				name = pending.pop(fut)
+				try:
+					ltp = fut.result()
+				except Exception:
+					ltp = None
+				if ltp is not None and ltp > 0:
+					return float(ltp), name
+			if next_idx < len(calls):
+				_launch()
+		return None, None
+	finally:
+		# Cancel only stops calls that have not started; running ones finish in the background
+		# and keep their (symbol, source) slot until they return
+		for fut in pending:
+			fut.cancel()
+
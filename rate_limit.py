@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from source_health import SourceSkipped
+
+# Priority lanes, highest first: order placement/status, live quotes, historical downloads
+LANES = ("order", "quote", "history")
+
+
+class RateLimited(SourceSkipped):
+	pass
+
+
+class _LaneStats:
+	def __init__(self) -> None:
+		self.granted = 0
+		self.rejected = 0
+		self.waiting = 0
+		self.wait_total = 0.0
+		self.wait_max = 0.0
+
+
+class RequestScheduler:
+	# Token bucket shared by every Breeze API call in the process. Tokens refill at rate_per_min
+	# up to `burst`; callers queue by lane priority (FIFO within a lane) so order traffic is never
+	# stuck behind a round of quotes. The last `order_reserve` tokens are only spent on orders.
+	# Backpressure: a lane with max_waiting callers queued, or a caller whose timeout expires,
+	# gets RateLimited instead of piling up. A throttling reply from the broker pauses the bucket.
+	def __init__(self,
+				 rate_per_min: float = 100.0,
+				 burst: int = 5,
+				 order_reserve: int = 1,
+				 max_waiting: int = 64) -> None:
+		self.rate_per_sec = max(1e-6, float(rate_per_min) / 60.0)
+		self.capacity = max(1, int(burst))
+		self.order_reserve = max(0, min(int(order_reserve), self.capacity - 1))
+		self.max_waiting = max(1, int(max_waiting))
+		self._cond = threading.Condition()
+		self._tokens = float(self.capacity)
+		self._updated = time.monotonic()
+		self._paused_until = 0.0
+		self._queue: List[Tuple[int, int]] = []  # heap of (lane priority, ticket)
+		self._tickets = itertools.count()
+		self._stats: Dict[str, _LaneStats] = {lane: _LaneStats() for lane in LANES}
+		self.throttled = 0
+
+	def _refill(self, now: float) -> None:
+		self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_sec)
+		self._updated = now
+
+	def acquire(self, lane: str, timeout: Optional[float] = None) -> float:
+		# Blocks until this caller may send one request; returns the seconds spent waiting
+		if lane not in self._stats:
+			raise ValueError(f"unknown lane {lane!r}")
+		entry = (LANES.index(lane), next(self._tickets))
+		floor = 0 if lane == "order" else self.order_reserve
+		stats = self._stats[lane]
+		start = time.monotonic()
+		with self._cond:
+			if stats.waiting >= self.max_waiting:
+				stats.rejected += 1
+				raise RateLimited(f"{lane} queue full ({stats.waiting} waiting)")
+			heapq.heappush(self._queue, entry)
+			stats.waiting += 1
+			try:
+				while True:
+					now = time.monotonic()
+					self._refill(now)
+					head = self._queue[0] == entry
+					if head and now >= self._paused_until and self._tokens >= 1 + floor:
+						self._tokens -= 1
+						heapq.heappop(self._queue)
+						waited = now - start
+						stats.granted += 1
+						stats.wait_total += waited
+						stats.wait_max = max(stats.wait_max, waited)
+						self._cond.notify_all()
+						return waited
+					delay: Optional[float] = None
+					if head:
+						delay = max((1 + floor - self._tokens) / self.rate_per_sec, self._paused_until - now, 0.001)
+					if timeout is not None:
+						remaining = start + timeout - now
+						if remaining <= 0:
+							stats.rejected += 1
+							raise RateLimited(f"{lane} request waited {timeout:.1f}s for a slot")
+						delay = remaining if delay is None else min(delay, remaining)
+					self._cond.wait(delay)
+			except BaseException:
+				if entry in self._queue:
+					self._queue.remove(entry)
+					heapq.heapify(self._queue)
+					self._cond.notify_all()
+				raise
+			finally:
+				stats.waiting -= 1
+
+	def penalize(self, seconds: float) -> None:
+		# The broker said we are over its limit: stop sending for a while and drain the bucket
+		with self._cond:
+			self.throttled += 1
+			self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+			self._tokens = 0.0
+			self._updated = time.monotonic()
+			self._cond.notify_all()
+
+	def metrics(self) -> Dict[str, Any]:
+		with self._cond:
+			self._refill(time.monotonic())
+			return {
+				"rate_per_min": self.rate_per_sec * 60.0,
+				"tokens": round(self._tokens, 3),
+				"throttled": self.throttled,
+				"paused_sec": max(0.0, self._paused_until - time.monotonic()),
+				"lanes": {
+					lane: {
+						"granted": s.granted,
+						"rejected": s.rejected,
+						"waiting": s.waiting,
+						"wait_avg_sec": s.wait_total / s.granted if s.granted else 0.0,
+						"wait_max_sec": s.wait_max,
+					}
+					for lane, s in self._stats.items()
+				},
+			}
@@ -0,0 +1,165 @@
+import threading
+import time
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import metrics
+
+# Portfolio-level limits across every symbol the trader runs. Positions live in flat arrays
+# indexed by symbol (qty, average price, last mark, exposure reserved by orders in flight), kept
+# in step with the StateStore through its listener. Each quote batch marks all positions to
+# market in one vectorized pass, and the totals are cached, so the pre-trade check before an
+# order is a few scalar comparisons. Only buys are limited; a sell always reduces risk.
+
+
+class PortfolioRisk:
+	def __init__(self,
+				 symbols: Sequence[str],
+				 max_gross_exposure: float = 0.0,
+				 max_daily_loss: float = 0.0,
+				 max_symbol_exposure: float = 0.0,
+				 symbol_limits: Optional[Dict[str, float]] = None,
+				 tz: str = "Asia/Kolkata",
+				 clock: Callable[[], float] = time.time) -> None:
+		self.symbols: List[str] = [s.upper() for s in symbols]
+		self.index: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+		n = len(self.symbols)
+		self.qty = np.zeros(n)
+		self.avg = np.zeros(n)
+		self.last = np.full(n, np.nan)
+		self.reserved = np.zeros(n)
+		self.max_gross_exposure = float(max_gross_exposure)
+		self.max_daily_loss = float(max_daily_loss)
+		# Per-symbol notional cap; 0 = none
+		self.symbol_cap = np.full(n, float(max_symbol_exposure))
+		for sym, cap in (symbol_limits or {}).items():
+			if sym.upper() in self.index:
+				self.symbol_cap[self.index[sym.upper()]] = float(cap)
+		self.tz = ZoneInfo(tz)
+		self.clock = clock
+		self._lock = threading.Lock()
+		# Cached totals, refreshed on every mark and position change
+		self.gross = 0.0
+		self.unrealized = 0.0
+		self.realized_today = 0.0
+		self._day_end = 0.0
+
+	def load(self, state: Dict[str, Any]) -> None:
+		# Seed open positions from a StateStore snapshot (positions carried over from earlier runs)
+		with self._lock:
+			for sym, slot in (state.get("symbols") or {}).items():
+				i = self.index.get(sym.upper())
+				pos = slot.get("position")
+				if i is not None and pos:
+					self.qty[i] = float(pos.get("qty", 0) or 0)
+					self.avg[i] = float(pos.get("avg_price", 0) or 0)
+					self.last[i] = self.avg[i]
+			self._refresh()
+
+	def load_realized(self, records: Iterable[Dict[str, Any]]) -> None:
+		# Rebuild today's realized PnL from timestamped sell records (StateStore.recent_sells), so a
+		# restart during the day keeps counting towards max_daily_loss instead of starting from zero
+		with self._lock:
+			now = self.clock()
+			self._roll_day(now)
+			since = datetime.combine(datetime.fromtimestamp(now, self.tz).date(), dtime(0), self.tz).timestamp()
+			total = 0.0
+			for rec in records:
+				if rec.get("op") != "sell" or float(rec.get("ts", 0) or 0) < since:
+					continue
+				if str(rec.get("symbol") or "").upper() in self.index:
+					total += float(rec.get("pnl", 0) or 0)
+			self.realized_today = total
+
+	def _roll_day(self, now: float) -> None:
+		# Caller holds the lock; the daily loss counter restarts at local midnight
+		if now < self._day_end:
+			return
+		day = datetime.fromtimestamp(now, self.tz).date()
+		self._day_end = datetime.combine(day + timedelta(days=1), dtime(0), self.tz).timestamp()
+		self.realized_today = 0.0
+
+	def _refresh(self) -> None:
+		# Caller holds the lock
+		marks = np.where(np.isnan(self.last), self.avg, self.last)
+		self.gross = float(np.abs(self.qty) @ marks + self.reserved.sum())
+		self.unrealized = float(self.qty @ (marks - self.avg))
+
+	def mark(self, prices: Sequence[Optional[float]]) -> None:
+		# Prices aligned with self.symbols; None/NaN keeps the previous mark
+		px = np.array([np.nan if p is None else p for p in prices], dtype=np.float64)
+		with self._lock:
+			fresh = ~np.isnan(px)
+			self.last[fresh] = px[fresh]
+			self._refresh()
+
+	def mark_one(self, symbol: str, price: Optional[float]) -> None:
+		i = self.index.get(symbol.upper())
+		if i is None or price is None:
+			return
+		with self._lock:
+			old = self.last[i] if not np.isnan(self.last[i]) else self.avg[i]
+			self.last[i] = price
+			q = self.qty[i]
+			self.gross += abs(q) * (price - old)
+			self.unrealized += q * (price - old)
+
+	def check(self, symbol: str, action: str, qty: int, price: float) -> Optional[str]:
+		# None if the order may go out, else the limit it would break. A passing buy reserves its
+		# notional until release(), so orders in flight count towards the limits.
+		if action != "BUY":
+			return None
+		i = self.index.get(symbol.upper())
+		notional = abs(qty) * price
+		with self._lock:
+			self._roll_day(self.clock())
+			reason = None
+			if self.max_daily_loss > 0 and self.realized_today + self.unrealized <= -self.max_daily_loss:
+				reason = "max_daily_loss"
+			elif self.max_gross_exposure > 0 and self.gross + notional > self.max_gross_exposure:
+				reason = "max_gross_exposure"
+			elif i is not None and self.symbol_cap[i] > 0:
+				held = abs(self.qty[i]) * (self.avg[i] if np.isnan(self.last[i]) else self.last[i])
+				if held + self.reserved[i] + notional > self.symbol_cap[i]:
+					reason = "max_symbol_exposure"
+			if reason is None and i is not None:
+				self.reserved[i] += notional
+				self.gross += notional
+		if reason is not None:
+			metrics.inc("risk_rejections_total", limit=reason)
+		return reason
+
+	def release(self, symbol: str) -> None:
+		# The order for symbol is done (filled, failed or never sent): drop its reservation
+		i = self.index.get(symbol.upper())
+		if i is None:
+			return
+		with self._lock:
+			self.gross -= self.reserved[i]
+			self.reserved[i] = 0.0
+
+	def on_record(self, rec: Dict[str, Any]) -> None:
+		# StateStore listener: keeps positions and today's realized PnL in step with the ledger
+		i = self.index.get(str(rec.get("symbol") or "").upper())
+		if i is None:
+			return
+		op = rec.get("op")
+		with self._lock:
+			if op == "open":
+				self.qty[i] = float(rec["qty"])
+				self.avg[i] = float(rec["avg_price"])
+				if np.isnan(self.last[i]):
+					self.last[i] = self.avg[i]
+			elif op == "sell":
+				self._roll_day(self.clock())
+				self.realized_today += float(rec["pnl"])
+				self.qty[i] = float(rec.get("remaining_qty", 0) or 0)
+			elif op == "clear":
+				self.qty[i] = 0.0
+			else:
+				return
+			self._refresh()
+
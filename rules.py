@@ -1,9 +1,15 @@
 import json
+import logging
 import time
-from typing import Deque, Dict, Optional, Tuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 from collections import deque
-from datetime import datetime, time as dtime
-from zoneinfo import ZoneInfo
+
+from indicators import RollingMax, SMA, EMA, RollingStd, VWAP
+from market_calendar import MarketCalendar
+from metrics import timed
+from strategy import Strategy, load_strategy
+
+log = logging.getLogger(__name__)
 
 
 class RuleEngine:
@@ -19,55 +25,132 @@ class RuleEngine:
 		self.stop_loss_pct: float = float(cfg.get("stop_loss_pct", 0.01))
 		self.poll_interval_sec: int = int(cfg.get("poll_interval_sec", 5))
 		self.quote_source: str = str(cfg.get("quote_source", "auto")).lower()
+		self.quote_budget_sec: float = float(cfg.get("quote_budget_sec", 3.0))
+		self.quote_hedge_sec: float = float(cfg.get("quote_hedge_sec", 0.5))
+		self.stream_fake_feed: str = str(cfg.get("stream_fake_feed", "") or "")
+		self.event_core: bool = bool(cfg.get("event_core", True))
+		self.http_pool_size: int = int(cfg.get("http_pool_size", 32))
+		self.nse_cookie_refresh_sec: float = float(cfg.get("nse_cookie_refresh_sec", 240))
+		self.http2: bool = bool(cfg.get("http2", False))
+		self.quote_cache_size: int = int(cfg.get("quote_cache_size", 4096))
+		self.quote_cache_ttl: Dict[str, float] = {str(k): float(v) for k, v in (cfg.get("quote_cache_ttl") or {"breeze": 1, "nse": 2, "yf": 2}).items()}
+		self.quote_cache_address: str = str(cfg.get("quote_cache_address", "") or "")
 		self.debug: bool = bool(cfg.get("debug", False))
 		self.min_warmup_samples: int = int(cfg.get("min_warmup_samples", 3))
 		self.buy_immediate_on_start: bool = bool(cfg.get("buy_immediate_on_start", False))
 		self.buy_mode: str = str(cfg.get("buy_mode", "drop_from_high")).lower()
 		self.sma_window: int = int(cfg.get("sma_window", 20))
 		self.sma_drop_pct: float = float(cfg.get("sma_drop_pct", 0.003))
+		self.high_window: int = int(cfg.get("high_window", 60))
+		self.ema_window: int = int(cfg.get("ema_window", 20))
+		self.std_window: int = int(cfg.get("std_window", 20))
+		self.vwap_window: int = int(cfg.get("vwap_window", 60))
 		self.market_tz: str = str(cfg.get("market_tz", "Asia/Kolkata"))
 		self.market_open: str = str(cfg.get("market_open", "09:15"))
 		self.market_close: str = str(cfg.get("market_close", "15:30"))
 		self.market_buffer_min: int = int(cfg.get("market_buffer_min", 1))
+		self.market_holidays: List[str] = [str(d) for d in (cfg.get("market_holidays") or [])]
+		self.market_sessions: Dict[str, List[List[str]]] = {str(k): [list(w) for w in v] for k, v in (cfg.get("market_sessions") or {}).items()}
+		self.state_flush_sec: float = float(cfg.get("state_flush_sec", 1.0))
+		self.journal_dir: str = str(cfg.get("journal_dir", "journal") or "")
+		self.journal_compact_every: int = int(cfg.get("journal_compact_every", 1000))
+		self.journal_keep_history: bool = bool(cfg.get("journal_keep_history", False))
+		self.bar_store_dir: str = str(cfg.get("bar_store_dir", "bars") or "")
+		self.breeze_rate_per_min: float = float(cfg.get("breeze_rate_per_min", 100))
+		self.breeze_burst: int = int(cfg.get("breeze_burst", 5))
+		self.breeze_order_reserve: int = int(cfg.get("breeze_order_reserve", 1))
+		self.order_async: bool = bool(cfg.get("order_async", True))
+		self.order_poll_sec: float = float(cfg.get("order_poll_sec", 1.0))
+		self.order_fill_timeout_sec: float = float(cfg.get("order_fill_timeout_sec", 30.0))
+		self.max_gross_exposure: float = float(cfg.get("max_gross_exposure", 0))
+		self.max_daily_loss: float = float(cfg.get("max_daily_loss", 0))
+		self.max_symbol_exposure: float = float(cfg.get("max_symbol_exposure", 0))
+		self.symbol_exposure_limits: Dict[str, float] = {str(k).upper(): float(v) for k, v in (cfg.get("symbol_exposure_limits") or {}).items()}
+		self.paper_trading: bool = bool(cfg.get("paper_trading", False))
+		self.paper_dir: str = str(cfg.get("paper_dir", "paper") or "paper")
+		self.paper_latency_ms: float = float(cfg.get("paper_latency_ms", 50))
+		self.paper_slippage_bps: float = float(cfg.get("paper_slippage_bps", 2))
+		self.paper_partial_fill_pct: float = float(cfg.get("paper_partial_fill_pct", 0))
+		self.metrics_port: int = int(cfg.get("metrics_port", 0))
+		self.metrics_log_sec: float = float(cfg.get("metrics_log_sec", 0))
+		self.log_level: str = str(cfg.get("log_level", "INFO"))
+		self.log_dir: str = str(cfg.get("log_dir", "logs"))
+		self.log_rotate: str = str(cfg.get("log_rotate", "size")).lower()
+		self.log_max_bytes: int = int(cfg.get("log_max_bytes", 5 * 1024 * 1024))
+		self.log_backups: int = int(cfg.get("log_backups", 5))
+		self.log_dedup_sec: float = float(cfg.get("log_dedup_sec", 60))
+		self.event_log: str = str(cfg.get("event_log", "events.jsonl") or "")
+		self.breeze_log_level: str = str(cfg.get("breeze_log_level", "WARNING"))
+		self.warm_start: bool = bool(cfg.get("warm_start", True))
+		self.warm_start_lookback_days: float = float(cfg.get("warm_start_lookback_days", 5))
+		self.strategy: str = str(cfg.get("strategy", "") or "")
+		self.buy_rule: str = str(cfg.get("buy_rule", "") or "")
+		self.sell_rules: Dict[str, str] = {str(k): str(v) for k, v in (cfg.get("sell_rules") or {}).items()}
 
-		self.window_prices: Deque[float] = deque(maxlen=60)
+		self.window_prices: Deque[float] = deque(maxlen=max(self.high_window, self.sma_window, self.min_warmup_samples))
+		# Incremental indicators, O(1) per tick regardless of window length
+		self.rolling_high = RollingMax(self.high_window)
+		self.sma = SMA(self.sma_window)
+		self.ema = EMA(self.ema_window)
+		self.std = RollingStd(self.std_window)
+		self.vwap = VWAP(self.vwap_window)
+		# Session bounds are precomputed per day; is_market_open is a lookup
+		self.calendar = MarketCalendar(self.market_tz, self.market_open, self.market_close, self.market_buffer_min, self.market_holidays, self.market_sessions)
+		# Epoch-seconds time source; a replay swaps in its virtual clock
+		self.clock: Callable[[], float] = time.time
+		# Custom entry/exit rules from rules.config, compiled once
+		self.custom: Optional[Strategy] = load_strategy(self)
 
 	def is_market_open(self) -> bool:
-		try:
-			tz = ZoneInfo(self.market_tz)
-			now = datetime.now(tz)
-			open_h, open_m = [int(x) for x in self.market_open.split(":")]
-			close_h, close_m = [int(x) for x in self.market_close.split(":")]
-			open_time = dtime(hour=open_h, minute=open_m)
-			close_time = dtime(hour=close_h, minute=close_m)
-			# apply buffer
-			start_dt = now.replace(hour=open_time.hour, minute=open_time.minute, second=0, microsecond=0)
-			end_dt = now.replace(hour=close_time.hour, minute=close_time.minute, second=0, microsecond=0)
-			start_dt = start_dt + (0 * start_dt.tzinfo.utcoffset(start_dt))  # no-op to keep tz-aware
-			end_dt = end_dt + (0 * end_dt.tzinfo.utcoffset(end_dt))  # no-op
-			buffer = self.market_buffer_min
-			start_dt = start_dt.replace(minute=start_dt.minute + 0)  # buffer on open is usually 0–1; controlled externally
-			end_dt = end_dt.replace(minute=end_dt.minute - buffer if end_dt.minute >= buffer else 0)
-			return start_dt <= now <= end_dt
-		except Exception:
-			return True
+		return self.calendar.is_open(self.clock())
 
-	def update_price(self, ltp: float) -> None:
+	def update_price(self, ltp: float, volume: Optional[float] = None) -> None:
 		self.window_prices.append(ltp)
+		self.rolling_high.update(ltp)
+		self.sma.update(ltp)
+		self.ema.update(ltp)
+		self.std.update(ltp)
+		if volume is not None:
+			self.vwap.update(ltp, volume)
+		if self.custom is not None:
+			self.custom.update(ltp, volume)
 		if self.debug:
-			print(f"[debug] price window size={len(self.window_prices)} high={max(self.window_prices) if self.window_prices else None} last={ltp}")
+			log.debug("price window size=%d high=%s last=%s", len(self.window_prices), self.rolling_high.value, ltp)
+
+	def track_price(self, ltp: float, volume: Optional[float] = None) -> None:
+		# While a position is open the entry window is frozen, but custom exit rules still need
+		# their indicators to follow the price
+		if self.custom is not None:
+			self.custom.update(ltp, volume)
+
+	def warm_start_samples(self) -> int:
+		# Enough history to fill every window the entry rules look at
+		custom = self.custom.warm_samples() if self.custom is not None else 0
+		return max(self.high_window, self.sma_window, self.ema_window, self.std_window, self.min_warmup_samples, custom)
+
+	def seed_prices(self, prices) -> int:
+		# Bulk-load historical prices (oldest first) into the indicators before live trading
+		debug, self.debug = self.debug, False
+		try:
+			count = 0
+			for p in prices:
+				self.update_price(float(p))
+				count += 1
+		finally:
+			self.debug = debug
+		return count
 
 	def ready(self) -> bool:
 		return len(self.window_prices) >= self.min_warmup_samples
 
 	def _should_buy_drop_from_high(self, ltp: float) -> bool:
-		recent_high = max(self.window_prices) if self.window_prices else ltp
+		recent_high = self.rolling_high.value if self.rolling_high.value is not None else ltp
 		if recent_high <= 0:
 			return False
 		drop_abs = (recent_high - ltp)
 		drop_pct = drop_abs / recent_high
 		if self.debug:
-			print(f"[debug] mode=drop_from_high recent_high={recent_high} ltp={ltp} drop_abs={drop_abs:.4f} drop_pct={drop_pct:.4f} thr_abs={self.buy_drop_abs} thr_pct={self.buy_drop_pct}")
+			log.debug("mode=drop_from_high recent_high=%s ltp=%s drop_abs=%.4f drop_pct=%.4f thr_abs=%s thr_pct=%s", recent_high, ltp, drop_abs, drop_pct, self.buy_drop_abs, self.buy_drop_pct)
 		if self.buy_drop_abs > 0 and drop_abs >= self.buy_drop_abs:
 			return True
 		return drop_pct >= self.buy_drop_pct
@@ -75,32 +158,43 @@ class RuleEngine:
 	def _should_buy_below_sma(self, ltp: float) -> bool:
 		if len(self.window_prices) < max(self.sma_window, self.min_warmup_samples):
 			return False
-		sma = sum(list(self.window_prices)[-self.sma_window:]) / float(self.sma_window)
+		sma = self.sma.value or 0.0
 		gap = (sma - ltp) / sma if sma > 0 else 0.0
 		if self.debug:
-			print(f"[debug] mode=below_sma sma={sma:.4f} ltp={ltp} gap={gap:.4f} threshold={self.sma_drop_pct}")
+			log.debug("mode=below_sma sma=%.4f ltp=%s gap=%.4f threshold=%s", sma, ltp, gap, self.sma_drop_pct)
 		return gap >= self.sma_drop_pct
 
+	@timed("rule_eval_seconds", rule="buy")
 	def should_buy(self, ltp: Optional[float]) -> bool:
 		if ltp is None:
 			return False
 		if not self.is_market_open():
 			if self.debug:
-				print("[debug] market is closed; skipping buy checks")
+				log.debug("market is closed; skipping buy checks")
 			return False
 		if not self.ready() and not self.buy_immediate_on_start:
 			return False
+		if self.custom is not None:
+			decision = self.custom.should_buy(ltp)
+			if decision is not None:
+				return decision
 		if self.buy_mode == "below_sma":
 			return self._should_buy_below_sma(ltp)
 		return self._should_buy_drop_from_high(ltp)
 
+	@timed("rule_eval_seconds", rule="sell")
 	def should_sell(self, ltp: Optional[float], avg_buy_price: float) -> Tuple[bool, str]:
 		if ltp is None or avg_buy_price <= 0:
 			return False, "no_price"
 		pnl_abs = ltp - avg_buy_price
 		pnl_pct = pnl_abs / avg_buy_price
 		if self.debug:
-			print(f"[debug] pnl_abs={pnl_abs:.4f} pnl_pct={pnl_pct:.4f} tp_abs={self.take_profit_abs} tp_pct={self.take_profit_pct} sl_pct={self.stop_loss_pct}")
+			log.debug("pnl_abs=%.4f pnl_pct=%.4f tp_abs=%s tp_pct=%s sl_pct=%s", pnl_abs, pnl_pct, self.take_profit_abs, self.take_profit_pct, self.stop_loss_pct)
+		if self.custom is not None:
+			# Custom exits first; the take-profit/stop-loss below still apply as a backstop
+			reason = self.custom.exit_reason(ltp, avg_buy_price)
+			if reason:
+				return True, reason
 		if self.take_profit_abs > 0 and pnl_abs >= self.take_profit_abs:
 			return True, "take_profit_abs"
 		if pnl_pct >= self.take_profit_pct:
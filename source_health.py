@@ -0,0 +1,94 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+log = logging.getLogger(__name__)
+
+Key = Tuple[str, str, str]  # (symbol, source, method)
+
+
+class SourceSkipped(Exception):
+	# The source declined to make the call (its own rate limit or backoff); nothing was asked,
+	# so callers must not count it as a failure of that source
+	pass
+
+
+class _Health:
+	def __init__(self) -> None:
+		self.failures = 0
+		self.retry_at = 0.0
+		self.last_ok = 0.0
+		self.last_error = ""
+
+
+class SourceHealth:
+	# Remembers which (symbol, source, method) paths work. A path that keeps failing is skipped
+	# with exponential backoff and re-probed once its backoff expires; the last method that
+	# succeeded for a (symbol, source) is tried first next time. A single empty reply is not
+	# enough to back off; fail_threshold failures in a row are.
+	def __init__(self,
+				 base_backoff_sec: float = 5.0,
+				 max_backoff_sec: float = 900.0,
+				 fail_threshold: int = 3) -> None:
+		self.base_backoff_sec = base_backoff_sec
+		self.max_backoff_sec = max_backoff_sec
+		self.fail_threshold = max(1, fail_threshold)
+		self._lock = threading.Lock()
+		self._entries: Dict[Key, _Health] = {}
+		self._preferred: Dict[Tuple[str, str], str] = {}
+
+	def available(self, symbol: str, source: str, method: str, now: Optional[float] = None) -> bool:
+		now = time.time() if now is None else now
+		with self._lock:
+			entry = self._entries.get((symbol, source, method))
+			return entry is None or now >= entry.retry_at
+
+	def order(self, symbol: str, source: str, methods: Sequence[str], now: Optional[float] = None) -> List[str]:
+		# Methods worth trying now: the last one that worked first, then the rest in given order
+		now = time.time() if now is None else now
+		with self._lock:
+			preferred = self._preferred.get((symbol, source))
+			ranked = sorted(methods, key=lambda m: 0 if m == preferred else 1)
+			out = []
+			for m in ranked:
+				entry = self._entries.get((symbol, source, m))
+				if entry is None or now >= entry.retry_at:
+					out.append(m)
+			return out
+
+	def record_success(self, symbol: str, source: str, method: str) -> None:
+		with self._lock:
+			entry = self._entries.setdefault((symbol, source, method), _Health())
+			if entry.failures >= self.fail_threshold:
+				log.info("%s/%s recovered for %s.", source, method, symbol)
+			entry.failures = 0
+			entry.retry_at = 0.0
+			entry.last_ok = time.time()
+			entry.last_error = ""
+			self._preferred[(symbol, source)] = method
+
+	def record_failure(self, symbol: str, source: str, method: str, error: str = "") -> float:
+		# Returns the backoff applied (0 while still under fail_threshold)
+		with self._lock:
+			entry = self._entries.setdefault((symbol, source, method), _Health())
+			entry.failures += 1
+			entry.last_error = error
+			if entry.failures < self.fail_threshold:
+				return 0.0
+			exponent = entry.failures - self.fail_threshold
+			backoff = min(self.max_backoff_sec, self.base_backoff_sec * (2 ** min(exponent, 32)))
+			entry.retry_at = time.time() + backoff
+			if self._preferred.get((symbol, source)) == method:
+				del self._preferred[(symbol, source)]
+			# Only the first failure of a streak is reported; repeats are silent until recovery
+			if entry.failures == self.fail_threshold:
+				log.warning("%s/%s failing for %s%s; backing off.", source, method, symbol, ": " + error if error else "")
+			return backoff
+
+	def snapshot(self) -> Dict[Key, Dict[str, float]]:
+		with self._lock:
+			return {
+				key: {"failures": e.failures, "retry_at": e.retry_at, "last_ok": e.last_ok}
+				for key, e in self._entries.items()
+			}
@@ -1,12 +1,22 @@
+import copy
 import json
+import logging
 import os
+import threading
+import time
 from contextlib import contextmanager
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from filelock import FileLock
 
+from journal import Journal
+from metrics import timed
+
+log = logging.getLogger(__name__)
+
 STATE_FILE = "state.json"
 LOCK_FILE = "state.json.lock"
+RECENT_SELLS_SEC = 2 * 86400  # long enough to hold "today" in any timezone
 
 
 def _default_state() -> Dict[str, Any]:
@@ -14,21 +24,30 @@ def _default_state() -> Dict[str, Any]:
 		"position": None,  # or {symbol, qty, avg_price}
 		"total_pnl": 0.0,
 		"last_sell_price": None,
+		"symbols": {},  # per-symbol {position, last_sell_price, total_pnl} for the multi-symbol trader
+	}
+
+
+def _default_slot() -> Dict[str, Any]:
+	return {
+		"position": None,
+		"last_sell_price": None,
+		"total_pnl": 0.0,
 	}
 
 
 @contextmanager
-def _locked_state():
-	lock = FileLock(LOCK_FILE, timeout=10)
+def _locked_state(lock_path: str = LOCK_FILE):
+	lock = FileLock(lock_path, timeout=10)
 	with lock:
 		yield
 
 
-def read_state() -> Dict[str, Any]:
-	if not os.path.exists(STATE_FILE):
+def read_state(path: str = STATE_FILE) -> Dict[str, Any]:
+	if not os.path.exists(path):
 		return _default_state()
 	try:
-		with open(STATE_FILE, "r") as f:
+		with open(path, "r") as f:
 			state = json.load(f)
 			# Backward compatibility defaults
 			if "total_pnl" not in state:
@@ -37,26 +56,53 @@ def read_state() -> Dict[str, Any]:
 				state["last_sell_price"] = None
 			if "position" not in state:
 				state["position"] = None
+			if not isinstance(state.get("symbols"), dict):
+				state["symbols"] = {}
 			return state
-	except Exception:
+	except Exception as e:
+		log.warning("Could not read %s (%s); starting from defaults.", path, e)
 		return _default_state()
 
 
-def write_state(state: Dict[str, Any]) -> None:
-	with open(STATE_FILE, "w") as f:
+def write_state(state: Dict[str, Any], path: str = STATE_FILE) -> None:
+	# Write to a temp file and rename over the target so a crash never leaves a half-written state.json
+	tmp_path = f"{path}.tmp"
+	with open(tmp_path, "w") as f:
 		json.dump(state, f, indent=2)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(tmp_path, path)
 
 
-def get_position() -> Optional[Dict[str, Any]]:
+def _scope(state: Dict[str, Any], symbol: Optional[str]) -> Dict[str, Any]:
+	# symbol=None keeps the original single-position layout at the top level
+	if symbol is None:
+		return state
+	symbol = symbol.upper()
+	symbols = state.setdefault("symbols", {})
+	slot = symbols.get(symbol)
+	if slot is None:
+		slot = _default_slot()
+		# Adopt a legacy single-symbol position so an upgrade does not orphan it
+		legacy = state.get("position")
+		if legacy and str(legacy.get("symbol", "")).upper() == symbol:
+			slot["position"] = legacy
+			slot["last_sell_price"] = state.get("last_sell_price")
+			state["position"] = None
+		symbols[symbol] = slot
+	return slot
+
+
+def get_position(symbol: Optional[str] = None) -> Optional[Dict[str, Any]]:
 	with _locked_state():
 		state = read_state()
-		return state.get("position")
+		return _scope(state, symbol).get("position")
 
 
-def set_position(symbol: str, qty: int, avg_price: float) -> None:
+def set_position(symbol: str, qty: int, avg_price: float, per_symbol: bool = False) -> None:
 	with _locked_state():
 		state = read_state()
-		state["position"] = {
+		_scope(state, symbol if per_symbol else None)["position"] = {
 			"symbol": symbol,
 			"qty": int(qty),
 			"avg_price": float(avg_price),
@@ -64,36 +110,269 @@ def set_position(symbol: str, qty: int, avg_price: float) -> None:
 		write_state(state)
 
 
-def clear_position() -> None:
+def clear_position(symbol: Optional[str] = None) -> None:
 	with _locked_state():
 		state = read_state()
-		state["position"] = None
+		_scope(state, symbol)["position"] = None
 		write_state(state)
 
 
-def add_realized_pnl(amount: float) -> float:
+def add_realized_pnl(amount: float, symbol: Optional[str] = None) -> float:
 	with _locked_state():
 		state = read_state()
 		state["total_pnl"] = float(state.get("total_pnl", 0.0)) + float(amount)
+		if symbol is not None:
+			slot = _scope(state, symbol)
+			slot["total_pnl"] = float(slot.get("total_pnl", 0.0)) + float(amount)
 		write_state(state)
 		return state["total_pnl"]
 
 
-def get_total_pnl() -> float:
+def get_total_pnl(symbol: Optional[str] = None) -> float:
 	with _locked_state():
 		state = read_state()
-		return float(state.get("total_pnl", 0.0))
+		return float(_scope(state, symbol).get("total_pnl", 0.0))
 
 
-def set_last_sell_price(price: Optional[float]) -> None:
+def set_last_sell_price(price: Optional[float], symbol: Optional[str] = None) -> None:
 	with _locked_state():
 		state = read_state()
-		state["last_sell_price"] = None if price is None else float(price)
+		_scope(state, symbol)["last_sell_price"] = None if price is None else float(price)
 		write_state(state)
 
 
-def get_last_sell_price() -> Optional[float]:
+def get_last_sell_price(symbol: Optional[str] = None) -> Optional[float]:
 	with _locked_state():
 		state = read_state()
-		val = state.get("last_sell_price")
+		val = _scope(state, symbol).get("last_sell_price")
 		return None if val is None else float(val)
+
+
+class StateStore:
+	# In-memory state for one trader process. Reads never touch disk; each update is applied
+	# under one in-process lock and persisted by write-then-rename, either on every commit
+	# (flush_interval_sec=0) or write-behind from a background thread.
+	# With a journal, every update is first appended (and fsynced) to it, state.json becomes a
+	# snapshot tagged with the last journal seq it covers, and startup replays anything newer.
+	def __init__(self,
+				 path: str = STATE_FILE,
+				 lock_path: str = LOCK_FILE,
+				 flush_interval_sec: float = 1.0,
+				 journal: Optional[Journal] = None,
+				 compact_every: int = 1000,
+				 keep_journal_history: bool = False) -> None:
+		self.path = path
+		self.lock_path = lock_path
+		self.flush_interval_sec = float(flush_interval_sec)
+		self.journal = journal
+		self.compact_every = max(1, int(compact_every))
+		self.keep_journal_history = keep_journal_history
+		self._lock = threading.RLock()
+		self._dirty = False
+		self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+		with _locked_state(self.lock_path):
+			self._state = read_state(self.path)
+		if self.journal is not None:
+			self._replay()
+		self._stop = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+		if self.flush_interval_sec > 0:
+			self._thread = threading.Thread(target=self._flush_loop, name="state-writer", daemon=True)
+			self._thread.start()
+
+	def _replay(self) -> None:
+		assert self.journal is not None
+		applied = 0
+		for rec in self.journal.replay(int(self._state.get("journal_seq", 0) or 0)):
+			self._apply(rec)
+			self._state["journal_seq"] = int(rec["seq"])
+			applied += 1
+		if applied:
+			log.info("Replayed %d journal record(s) on top of %s.", applied, self.path)
+			self._dirty = True
+
+	def _apply(self, rec: Dict[str, Any]) -> None:
+		op = rec.get("op")
+		symbol = rec.get("symbol")
+		if op == "open":
+			_scope(self._state, symbol if rec.get("per_symbol") else None)["position"] = {
+				"symbol": symbol,
+				"qty": int(rec["qty"]),
+				"avg_price": float(rec["avg_price"]),
+			}
+			if rec.get("per_symbol"):
+				_scope(self._state, symbol).pop("pending_order", None)
+		elif op == "order":
+			# Submitted but not yet confirmed; resumed after a restart until it fills or fails
+			_scope(self._state, symbol)["pending_order"] = {
+				"order_id": rec["order_id"],
+				"action": rec["action"],
+				"qty": int(rec["qty"]),
+				"expected_price": float(rec["expected_price"]),
+			}
+		elif op == "order_done":
+			_scope(self._state, symbol).pop("pending_order", None)
+		elif op == "clear":
+			_scope(self._state, symbol)["position"] = None
+		elif op == "sell":
+			pnl = float(rec["pnl"])
+			self._state["total_pnl"] = float(self._state.get("total_pnl", 0.0)) + pnl
+			slot = _scope(self._state, symbol)
+			if symbol is not None:
+				slot["total_pnl"] = float(slot.get("total_pnl", 0.0)) + pnl
+			slot["last_sell_price"] = float(rec["price"])
+			# A partially filled sell leaves the unsold shares open at the same average price
+			remaining = int(rec.get("remaining_qty", 0) or 0)
+			pos = slot.get("position")
+			slot["position"] = dict(pos, qty=remaining) if remaining > 0 and pos else None
+			slot.pop("pending_order", None)
+			# Sells of the last two days, so a restart can rebuild today's realized PnL from the
+			# snapshot instead of reading the whole journal
+			ts = float(rec.get("ts", 0) or 0)
+			recent = [r for r in self._state.get("recent_sells", []) if float(r["ts"]) >= ts - RECENT_SELLS_SEC]
+			recent.append({"symbol": symbol, "pnl": pnl, "ts": ts})
+			self._state["recent_sells"] = recent
+
+	def _record(self, rec: Dict[str, Any]) -> None:
+		# Caller holds self._lock: journal first (durable), then memory, then snapshot scheduling
+		rec.setdefault("ts", time.time())
+		if self.journal is not None:
+			self._state["journal_seq"] = self.journal.append(rec)
+		self._apply(rec)
+		for fn in self._listeners:
+			try:
+				fn(rec)
+			except Exception as e:
+				log.warning("State listener error: %s", e)
+		self._commit()
+
+	def add_listener(self, fn: Callable[[Dict[str, Any]], None]) -> None:
+		# fn(rec) sees every update (same records as the journal) right after it is applied
+		self._listeners.append(fn)
+
+	def _commit(self) -> None:
+		self._dirty = True
+		if self.flush_interval_sec <= 0:
+			self.flush()
+
+	def _flush_loop(self) -> None:
+		while not self._stop.wait(self.flush_interval_sec):
+			try:
+				self.flush()
+			except Exception as e:
+				log.error("State flush error: %s", e)
+
+	@timed("state_flush_seconds")
+	def flush(self) -> None:
+		with self._lock:
+			if not self._dirty:
+				return
+			snapshot = copy.deepcopy(self._state)
+			self._dirty = False
+		try:
+			with _locked_state(self.lock_path):
+				write_state(snapshot, self.path)
+		except Exception:
+			with self._lock:
+				self._dirty = True
+			raise
+		# Compaction: once the snapshot covers a full segment, new records go to a fresh one and
+		# the segments the snapshot holds are deleted unless they are kept as trade history
+		with self._lock:
+			if (self.journal is not None
+					and self.journal.segment_records >= self.compact_every
+					and snapshot.get("journal_seq") == self.journal.seq):
+				self.journal.rotate()
+				if not self.keep_journal_history:
+					dropped = self.journal.drop_covered(int(snapshot["journal_seq"]))
+					log.debug("Journal compacted: %d segment(s) covered by %s deleted.", dropped, self.path)
+
+	def close(self) -> None:
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout=5)
+		self.flush()
+		if self.journal is not None:
+			self.journal.close()
+
+	def snapshot(self) -> Dict[str, Any]:
+		with self._lock:
+			return copy.deepcopy(self._state)
+
+	@timed("state_op_seconds", op="get_position")
+	def get_position(self, symbol: Optional[str] = None) -> Optional[Dict[str, Any]]:
+		with self._lock:
+			pos = _scope(self._state, symbol).get("position")
+			return dict(pos) if pos else None
+
+	@timed("state_op_seconds", op="set_position")
+	def set_position(self, symbol: str, qty: int, avg_price: float, per_symbol: bool = False, **details: Any) -> None:
+		# details (order_id, expected_price, slippage, ...) are kept in the journal only
+		with self._lock:
+			rec = dict(details)
+			rec.update({
+				"op": "open",
+				"symbol": symbol,
+				"qty": int(qty),
+				"avg_price": float(avg_price),
+				"per_symbol": per_symbol,
+			})
+			self._record(rec)
+
+	@timed("state_op_seconds", op="clear_position")
+	def clear_position(self, symbol: Optional[str] = None) -> None:
+		with self._lock:
+			self._record({"op": "clear", "symbol": symbol})
+
+	@timed("state_op_seconds", op="get_last_sell_price")
+	def get_last_sell_price(self, symbol: Optional[str] = None) -> Optional[float]:
+		with self._lock:
+			val = _scope(self._state, symbol).get("last_sell_price")
+			return None if val is None else float(val)
+
+	def get_total_pnl(self, symbol: Optional[str] = None) -> float:
+		with self._lock:
+			return float(_scope(self._state, symbol).get("total_pnl", 0.0))
+
+	@timed("state_op_seconds", op="record_sell")
+	def record_sell(self, symbol: Optional[str], pnl: float, sell_price: float, remaining_qty: int = 0, **details: Any) -> float:
+		# Realized PnL, last sell price and position clear as one update; returns overall total_pnl.
+		# remaining_qty > 0 keeps that many shares open (a sell that only partly filled).
+		with self._lock:
+			rec = dict(details)
+			rec.update({"op": "sell", "symbol": symbol, "pnl": float(pnl), "price": float(sell_price)})
+			if remaining_qty > 0:
+				rec["remaining_qty"] = int(remaining_qty)
+			self._record(rec)
+			return self._state["total_pnl"]
+
+	@timed("state_op_seconds", op="record_order")
+	def record_order(self, symbol: str, order_id: str, action: str, qty: int, expected_price: float) -> None:
+		with self._lock:
+			self._record({
+				"op": "order",
+				"symbol": symbol,
+				"order_id": str(order_id),
+				"action": action,
+				"qty": int(qty),
+				"expected_price": float(expected_price),
+			})
+
+	@timed("state_op_seconds", op="finish_order")
+	def finish_order(self, symbol: str, order_id: str, status: str) -> None:
+		# An order that ended without changing the position (rejected, cancelled, expired)
+		with self._lock:
+			self._record({"op": "order_done", "symbol": symbol, "order_id": str(order_id), "status": status})
+
+	def recent_sells(self) -> List[Dict[str, Any]]:
+		# Sell records (op, symbol, pnl, ts) of about the last two days, oldest first
+		with self._lock:
+			return [dict(r, op="sell") for r in self._state.get("recent_sells", [])]
+
+	def pending_orders(self) -> Dict[str, Dict[str, Any]]:
+		with self._lock:
+			return {
+				sym: dict(slot["pending_order"])
+				for sym, slot in self._state.get("symbols", {}).items()
+				if slot.get("pending_order")
+			}
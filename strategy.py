@@ -0,0 +1,363 @@
+import functools
+import importlib
+import logging
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from indicators import RollingMax, RollingMin, SMA, EMA, RollingStd, RSI, VWAP
+
+log = logging.getLogger(__name__)
+
+# Pluggable entry/exit logic. A strategy sees every price (update) and answers should_buy and
+# exit_reason; None means "no opinion" and the RuleEngine falls back to its built-in buy_mode and
+# take-profit/stop-loss. Rules can be written in rules.config as small expressions, e.g.
+#   "buy_rule": "ltp < sma(20) * 0.997 and rsi(14) < 30"
+#   "sell_rules": {"rsi_exit": "rsi(14) > 70", "trail": "ltp < high(30) * 0.99"}
+# Each expression is parsed once (the parse is cached across symbols) and compiled into nested
+# closures over incremental indicators, so a tick costs a few function calls and no parsing.
+# An indicator that is still warming up yields no value and any comparison with it is false.
+
+Node = Tuple[Any, ...]
+Fn = Callable[["Context"], Any]
+
+# name -> (indicator class, extra samples needed on top of the window)
+INDICATORS: Dict[str, Tuple[type, int]] = {
+	"sma": (SMA, 0),
+	"ema": (EMA, 0),
+	"std": (RollingStd, 0),
+	"high": (RollingMax, 0),
+	"low": (RollingMin, 0),
+	"rsi": (RSI, 1),
+	"vwap": (VWAP, 0),
+}
+VARIABLES = ("ltp", "avg_price", "pnl", "pnl_pct")
+_FUNCTIONS: Dict[str, Callable[..., float]] = {"abs": abs, "min": min, "max": max}
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([A-Za-z_][A-Za-z_0-9]*)|(<=|>=|==|!=|<|>|[-+*/(),]))")
+_COMPARE = {
+	"<": lambda a, b: a < b,
+	"<=": lambda a, b: a <= b,
+	">": lambda a, b: a > b,
+	">=": lambda a, b: a >= b,
+	"==": lambda a, b: a == b,
+	"!=": lambda a, b: a != b,
+}
+_ARITH = {
+	"+": lambda a, b: a + b,
+	"-": lambda a, b: a - b,
+	"*": lambda a, b: a * b,
+	"/": lambda a, b: a / b if b != 0 else None,
+}
+
+
+class RuleSyntaxError(ValueError):
+	pass
+
+
+class Context:
+	# Per-evaluation inputs; avg_price/pnl are only set when checking exits
+	__slots__ = ("ltp", "avg_price", "pnl", "pnl_pct")
+
+	def __init__(self) -> None:
+		self.ltp: Optional[float] = None
+		self.avg_price: Optional[float] = None
+		self.pnl: Optional[float] = None
+		self.pnl_pct: Optional[float] = None
+
+
+def _tokenize(text: str) -> List[Tuple[str, str, int]]:
+	tokens: List[Tuple[str, str, int]] = []
+	pos = 0
+	text = text.rstrip()
+	while pos < len(text):
+		m = _TOKEN.match(text, pos)
+		if m is None:
+			raise RuleSyntaxError(f"unexpected {text[pos:].strip()[:1]!r} at {pos} in {text!r}")
+		if m.group(1):
+			tokens.append(("num", m.group(1), m.start(1)))
+		elif m.group(2):
+			word = m.group(2)
+			tokens.append(("op" if word in ("and", "or", "not") else "name", word, m.start(2)))
+		else:
+			tokens.append(("op", m.group(3), m.start(3)))
+		pos = m.end()
+	return tokens
+
+
+class _Parser:
+	# or > and > not > comparison > + - > * / > unary minus > atom
+	def __init__(self, text: str) -> None:
+		self.text = text
+		self.tokens = _tokenize(text)
+		self.i = 0
+
+	def _peek(self) -> Optional[str]:
+		return self.tokens[self.i][1] if self.i < len(self.tokens) else None
+
+	def _next(self) -> Tuple[str, str, int]:
+		if self.i >= len(self.tokens):
+			raise RuleSyntaxError(f"unexpected end of {self.text!r}")
+		tok = self.tokens[self.i]
+		self.i += 1
+		return tok
+
+	def _expect(self, value: str) -> None:
+		kind, tok, pos = self._next()
+		if tok != value:
+			raise RuleSyntaxError(f"expected {value!r} at {pos} in {self.text!r}, got {tok!r}")
+
+	def parse(self) -> Node:
+		node = self._or()
+		if self.i < len(self.tokens):
+			_, tok, pos = self.tokens[self.i]
+			raise RuleSyntaxError(f"unexpected {tok!r} at {pos} in {self.text!r}")
+		return node
+
+	def _or(self) -> Node:
+		node = self._and()
+		while self._peek() == "or":
+			self.i += 1
+			node = ("or", node, self._and())
+		return node
+
+	def _and(self) -> Node:
+		node = self._not()
+		while self._peek() == "and":
+			self.i += 1
+			node = ("and", node, self._not())
+		return node
+
+	def _not(self) -> Node:
+		if self._peek() == "not":
+			self.i += 1
+			return ("not", self._not())
+		return self._compare()
+
+	def _compare(self) -> Node:
+		node = self._sum()
+		if self._peek() in _COMPARE:
+			op = self._next()[1]
+			node = ("cmp", op, node, self._sum())
+		return node
+
+	def _sum(self) -> Node:
+		node = self._term()
+		while self._peek() in ("+", "-"):
+			op = self._next()[1]
+			node = ("arith", op, node, self._term())
+		return node
+
+	def _term(self) -> Node:
+		node = self._unary()
+		while self._peek() in ("*", "/"):
+			op = self._next()[1]
+			node = ("arith", op, node, self._unary())
+		return node
+
+	def _unary(self) -> Node:
+		if self._peek() == "-":
+			self.i += 1
+			return ("neg", self._unary())
+		return self._atom()
+
+	def _atom(self) -> Node:
+		kind, tok, pos = self._next()
+		if kind == "num":
+			return ("num", float(tok))
+		if tok == "(":
+			node = self._or()
+			self._expect(")")
+			return node
+		if kind != "name":
+			raise RuleSyntaxError(f"unexpected {tok!r} at {pos} in {self.text!r}")
+		if self._peek() != "(":
+			if tok not in VARIABLES:
+				raise RuleSyntaxError(f"unknown name {tok!r} at {pos} in {self.text!r} (known: {', '.join(VARIABLES)})")
+			return ("var", tok)
+		self.i += 1
+		args: List[Node] = []
+		if self._peek() != ")":
+			args.append(self._or())
+			while self._peek() == ",":
+				self.i += 1
+				args.append(self._or())
+		self._expect(")")
+		if tok in INDICATORS:
+			if len(args) != 1 or args[0][0] != "num" or args[0][1] < 1:
+				raise RuleSyntaxError(f"{tok}() takes one window length, e.g. {tok}(20), at {pos} in {self.text!r}")
+			return ("ind", tok, int(args[0][1]))
+		if tok in _FUNCTIONS:
+			if not args or (tok == "abs" and len(args) != 1):
+				raise RuleSyntaxError(f"wrong number of arguments to {tok}() at {pos} in {self.text!r}")
+			return ("call", tok, tuple(args))
+		raise RuleSyntaxError(f"unknown function {tok!r} at {pos} in {self.text!r}")
+
+
+@functools.lru_cache(maxsize=256)
+def parse(text: str) -> Node:
+	return _Parser(text).parse()
+
+
+class IndicatorSet:
+	# One instance per (name, window) shared by all expressions of a strategy
+	def __init__(self) -> None:
+		self.items: Dict[Tuple[str, int], Any] = {}
+
+	def get(self, name: str, window: int) -> Any:
+		key = (name, window)
+		if key not in self.items:
+			self.items[key] = INDICATORS[name][0](window)
+		return self.items[key]
+
+	def update(self, ltp: float, volume: Optional[float] = None) -> None:
+		for (name, _), ind in self.items.items():
+			if name == "vwap":
+				if volume is not None:
+					ind.update(ltp, volume)
+			else:
+				ind.update(ltp)
+
+	def warm_samples(self) -> int:
+		return max((w + INDICATORS[name][1] for name, w in self.items), default=0)
+
+
+def compile_node(node: Node, indicators: IndicatorSet) -> Fn:
+	kind = node[0]
+	if kind == "num":
+		value = node[1]
+		return lambda ctx: value
+	if kind == "var":
+		return _VAR_GETTERS[node[1]]
+	if kind == "ind":
+		ind = indicators.get(node[1], node[2])
+		return lambda ctx: ind.value if ind.full else None
+	if kind == "neg":
+		inner = compile_node(node[1], indicators)
+
+		def neg(ctx: Context) -> Any:
+			v = inner(ctx)
+			return None if v is None else -v
+		return neg
+	if kind in ("arith", "cmp"):
+		op = (_ARITH if kind == "arith" else _COMPARE)[node[1]]
+		left = compile_node(node[2], indicators)
+		right = compile_node(node[3], indicators)
+		missing: Any = None if kind == "arith" else False
+
+		def binary(ctx: Context) -> Any:
+			a = left(ctx)
+			if a is None:
+				return missing
+			b = right(ctx)
+			if b is None:
+				return missing
+			return op(a, b)
+		return binary
+	if kind == "and":
+		left = compile_node(node[1], indicators)
+		right = compile_node(node[2], indicators)
+		return lambda ctx: bool(left(ctx)) and bool(right(ctx))
+	if kind == "or":
+		left = compile_node(node[1], indicators)
+		right = compile_node(node[2], indicators)
+		return lambda ctx: bool(left(ctx)) or bool(right(ctx))
+	if kind == "not":
+		inner = compile_node(node[1], indicators)
+
+		def negate(ctx: Context) -> Any:
+			v = inner(ctx)
+			return False if v is None else not v
+		return negate
+	if kind == "call":
+		fn = _FUNCTIONS[node[1]]
+		args = [compile_node(a, indicators) for a in node[2]]
+
+		def call(ctx: Context) -> Any:
+			values = [a(ctx) for a in args]
+			return None if any(v is None for v in values) else fn(*values)
+		return call
+	raise RuleSyntaxError(f"cannot compile {kind!r}")
+
+
+_VAR_GETTERS: Dict[str, Fn] = {name: (lambda n: lambda ctx: getattr(ctx, n))(name) for name in VARIABLES}
+
+
+class Strategy:
+	# Plug-in interface. Subclasses are loaded with "strategy": "module:ClassName" in rules.config
+	# and constructed with the symbol's RuleEngine.
+	def __init__(self, rules: Any = None) -> None:
+		self.rules = rules
+
+	def update(self, ltp: float, volume: Optional[float] = None) -> None:
+		pass
+
+	def warm_samples(self) -> int:
+		return 0
+
+	def should_buy(self, ltp: float) -> Optional[bool]:
+		return None
+
+	def exit_reason(self, ltp: float, avg_price: float) -> Optional[str]:
+		return None
+
+
+class ExpressionStrategy(Strategy):
+	def __init__(self, buy_rule: str = "", sell_rules: Optional[Dict[str, str]] = None, rules: Any = None) -> None:
+		super().__init__(rules)
+		self.indicators = IndicatorSet()
+		self.buy_rule = buy_rule.strip()
+		self._buy: Optional[Fn] = compile_node(parse(self.buy_rule), self.indicators) if self.buy_rule else None
+		self.sell_rules = dict(sell_rules or {})
+		self._exits: List[Tuple[str, Fn]] = [
+			(reason, compile_node(parse(text.strip()), self.indicators)) for reason, text in self.sell_rules.items()
+		]
+		self._ctx = Context()
+
+	def update(self, ltp: float, volume: Optional[float] = None) -> None:
+		self.indicators.update(ltp, volume)
+
+	def warm_samples(self) -> int:
+		return self.indicators.warm_samples()
+
+	def should_buy(self, ltp: float) -> Optional[bool]:
+		if self._buy is None:
+			return None
+		ctx = self._ctx
+		ctx.ltp, ctx.avg_price, ctx.pnl, ctx.pnl_pct = ltp, None, None, None
+		result = bool(self._buy(ctx))
+		if self.rules is not None and self.rules.debug:
+			log.debug("buy_rule %r -> %s (%s)", self.buy_rule, result, self.describe())
+		return result
+
+	def exit_reason(self, ltp: float, avg_price: float) -> Optional[str]:
+		if not self._exits:
+			return None
+		ctx = self._ctx
+		ctx.ltp, ctx.avg_price = ltp, avg_price
+		ctx.pnl = ltp - avg_price
+		ctx.pnl_pct = ctx.pnl / avg_price if avg_price > 0 else None
+		for reason, fn in self._exits:
+			if fn(ctx):
+				return reason
+		return None
+
+	def describe(self) -> str:
+		# Current indicator values, for debug lines
+		return ", ".join(f"{name}({w})={ind.value if ind.full else None}" for (name, w), ind in self.indicators.items.items())
+
+
+def load_strategy(rules: Any) -> Optional[Strategy]:
+	# "strategy": "module:ClassName" wins; otherwise buy_rule/sell_rules build an ExpressionStrategy
+	if rules.strategy:
+		module_name, _, class_name = rules.strategy.partition(":")
+		if not class_name:
+			raise ValueError(f"strategy must look like 'module:ClassName', got {rules.strategy!r}")
+		cls = getattr(importlib.import_module(module_name), class_name)
+		return cls(rules)
+	if rules.buy_rule or rules.sell_rules:
+		strategy = ExpressionStrategy(rules.buy_rule, rules.sell_rules, rules)
+		# Only the stream reports traded volume; with polled quotes vwap(N) would never fill
+		if rules.quote_source != "stream" and any(name == "vwap" for name, _ in strategy.indicators.items):
+			raise ValueError(f'vwap(N) needs traded volume, which only "quote_source": "stream" provides (source is {rules.quote_source!r})')
+		return strategy
+	return None
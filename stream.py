@@ -0,0 +1,260 @@
+import json
+import random
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+
+class TickTable:
+	# In-memory last-tick table shared by the feed thread and the trading loop
+	def __init__(self) -> None:
+		self._cond = threading.Condition()
+		self._ticks: Dict[str, Tuple[float, float, int]] = {}  # code -> (ltp, received_at, seq)
+		self._seq = 0
+		self._total_volume: Dict[str, float] = {}  # code -> day's traded quantity as last reported
+		self._new_volume: Dict[str, float] = {}  # code -> quantity traded since the last take_volume
+		self._listeners: List[Callable[[], None]] = []
+
+	def add_listener(self, fn: Callable[[], None]) -> None:
+		# fn() is called on the feed thread after every update; it must not block
+		self._listeners.append(fn)
+
+	@property
+	def seq(self) -> int:
+		with self._cond:
+			return self._seq
+
+	def update(self, code: str, ltp: float, ts: Optional[float] = None, total_volume: Optional[float] = None) -> None:
+		# total_volume is the feed's running traded quantity for the day; the first one seen for a
+		# code is only a baseline, and a lower one (new session) starts a new baseline
+		with self._cond:
+			self._seq += 1
+			self._ticks[code] = (float(ltp), time.time() if ts is None else ts, self._seq)
+			if total_volume is not None:
+				total = float(total_volume)
+				before = self._total_volume.get(code)
+				if before is not None and total >= before:
+					self._new_volume[code] = self._new_volume.get(code, 0.0) + total - before
+				self._total_volume[code] = total
+			self._cond.notify_all()
+		for fn in self._listeners:
+			fn()
+
+	def get(self, code: str) -> Optional[float]:
+		with self._cond:
+			row = self._ticks.get(code)
+			return row[0] if row else None
+
+	def age(self, code: str) -> Optional[float]:
+		with self._cond:
+			row = self._ticks.get(code)
+			return (time.time() - row[1]) if row else None
+
+	def changed_since(self, seq: int) -> Tuple[Dict[str, float], int]:
+		# Latest price per code updated after seq, plus the seq to pass next time
+		with self._cond:
+			return {code: row[0] for code, row in self._ticks.items() if row[2] > seq}, self._seq
+
+	def take_volume(self, code: str) -> Optional[float]:
+		# Quantity traded in code since the previous call (None until the feed has reported it
+		# twice); meant for the one loop that consumes this table
+		with self._cond:
+			return self._new_volume.pop(code, None)
+
+	def wait_for_update(self, seq: int, timeout: float) -> bool:
+		# Block until a tick newer than seq arrives or timeout expires
+		with self._cond:
+			return self._cond.wait_for(lambda: self._seq > seq, timeout=timeout)
+
+
+def parse_tick(tick: Dict[str, Any], tokens: Dict[str, str]) -> Optional[Tuple[str, float, Optional[float]]]:
+	# Breeze exchange-quote ticks carry the feed token in "symbol", the price in "last" and the
+	# day's traded quantity so far in "ttq"
+	code = tick.get("stock_code") or tokens.get(str(tick.get("symbol", "")))
+	if not code and len(tokens) == 1:
+		code = next(iter(tokens.values()))
+	if not code:
+		return None
+	for key in ("last", "ltp", "LTP", "last_traded_price"):
+		val = tick.get(key)
+		if val is not None:
+			try:
+				ltp = float(val)
+			except (TypeError, ValueError):
+				return None
+			return str(code), ltp, _total_volume(tick)
+	return None
+
+
+def _total_volume(tick: Dict[str, Any]) -> Optional[float]:
+	for key in ("ttq", "total_quantity_traded", "volume"):
+		val = tick.get(key)
+		if val is not None:
+			try:
+				return float(val)
+			except (TypeError, ValueError):
+				return None
+	return None
+
+
+class BreezeStream:
+	# Live feed: Breeze websocket ticks -> TickTable
+	def __init__(self, client, table: TickTable) -> None:
+		self.client = client
+		self.table = table
+		self._tokens: Dict[str, str] = {}
+
+	def _on_ticks(self, tick: Dict[str, Any]) -> None:
+		parsed = parse_tick(tick, self._tokens)
+		if parsed is not None:
+			code, ltp, total_volume = parsed
+			self.table.update(code, ltp, total_volume=total_volume)
+
+	def start(self, stock_codes: List[str], exchange_code: str) -> None:
+		self._tokens = self.client.start_stream(stock_codes, exchange_code, self._on_ticks)
+
+	def stop(self) -> None:
+		self.client.stop_stream()
+
+
+class FakeFeedClient:
+	# Offline feed: reads newline-delimited JSON ticks from a FakeFeedServer -> TickTable
+	def __init__(self, address: str, table: TickTable) -> None:
+		host, port = address.rsplit(":", 1)
+		self.host = host or "127.0.0.1"
+		self.port = int(port)
+		self.table = table
+		self._codes: Set[str] = set()
+		self._sock: Optional[socket.socket] = None
+		self._thread: Optional[threading.Thread] = None
+		self._stop = threading.Event()
+
+	def start(self, stock_codes: List[str], exchange_code: str) -> None:
+		self._codes = set(stock_codes)
+		self._sock = socket.create_connection((self.host, self.port), timeout=10)
+		self._sock.settimeout(None)
+		self._thread = threading.Thread(target=self._read_loop, name="fake-feed", daemon=True)
+		self._thread.start()
+
+	def _read_loop(self) -> None:
+		assert self._sock is not None
+		with self._sock.makefile("r") as f:
+			for line in f:
+				if self._stop.is_set():
+					break
+				try:
+					tick = json.loads(line)
+				except ValueError:
+					continue
+				parsed = parse_tick(tick, {})
+				if parsed is not None and (not self._codes or parsed[0] in self._codes):
+					code, ltp, total_volume = parsed
+					self.table.update(code, ltp, total_volume=total_volume)
+
+	def stop(self) -> None:
+		self._stop.set()
+		if self._sock is not None:
+			try:
+				self._sock.shutdown(socket.SHUT_RDWR)
+			except OSError:
+				pass
+			self._sock.close()
+
+
+class _FeedHandler(socketserver.BaseRequestHandler):
+	def handle(self) -> None:
+		server: "FakeFeedServer" = self.server  # type: ignore[assignment]
+		server.add_client(self.request)
+		# Keep the connection open until the client goes away
+		try:
+			while self.request.recv(1024):
+				pass
+		except OSError:
+			pass
+		finally:
+			server.remove_client(self.request)
+
+
+class FakeFeedServer(socketserver.ThreadingTCPServer):
+	# Local stand-in for the Breeze websocket: broadcasts Breeze-shaped ticks as JSON lines
+	daemon_threads = True
+	allow_reuse_address = True
+
+	def __init__(self, host: str = "127.0.0.1", port: int = 0) -> None:
+		super().__init__((host, port), _FeedHandler)
+		self._clients: List[socket.socket] = []
+		self._clients_lock = threading.Lock()
+		self._thread: Optional[threading.Thread] = None
+
+	@property
+	def address(self) -> str:
+		host, port = self.server_address[:2]
+		return f"{host}:{port}"
+
+	def add_client(self, sock: socket.socket) -> None:
+		with self._clients_lock:
+			self._clients.append(sock)
+
+	def remove_client(self, sock: socket.socket) -> None:
+		with self._clients_lock:
+			if sock in self._clients:
+				self._clients.remove(sock)
+
+	def client_count(self) -> int:
+		with self._clients_lock:
+			return len(self._clients)
+
+	def publish(self, stock_code: str, ltp: float, total_volume: Optional[float] = None) -> None:
+		tick: Dict[str, Any] = {
+			"stock_code": stock_code,
+			"last": ltp,
+			"ltt": time.strftime("%a %b %d %H:%M:%S %Y"),
+			"exchange": "NSE Equity",
+		}
+		if total_volume is not None:
+			tick["ttq"] = total_volume
+		line = (json.dumps(tick) + "\n").encode()
+		with self._clients_lock:
+			clients = list(self._clients)
+		for sock in clients:
+			try:
+				sock.sendall(line)
+			except OSError:
+				self.remove_client(sock)
+
+	def start(self) -> None:
+		self._thread = threading.Thread(target=self.serve_forever, name="fake-feed-server", daemon=True)
+		self._thread.start()
+
+	def stop(self) -> None:
+		self.shutdown()
+		self.server_close()
+
+
+def serve_random_walk(codes: List[str], port: int, interval_sec: float = 0.2, start_price: float = 100.0) -> None:
+	server = FakeFeedServer(port=port)
+	server.start()
+	print(f"Fake feed listening on {server.address} for {', '.join(codes)}")
+	prices = {code: start_price for code in codes}
+	traded = {code: 0 for code in codes}
+	try:
+		while True:
+			for code in codes:
+				prices[code] = round(max(0.05, prices[code] * (1 + random.gauss(0, 0.001))), 2)
+				traded[code] += random.randint(1, 500)
+				server.publish(code, prices[code], traded[code])
+			time.sleep(interval_sec)
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.stop()
+
+
+if __name__ == "__main__":
+	# Offline testing: python stream.py [port] streams random-walk ticks for stocksymbol.txt
+	from symbols import read_symbol_entries
+	serve_port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+	serve_random_walk([code for _, code in read_symbol_entries()], serve_port)
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backtest import load_bars, load_store, market_mask, params_from_rules, simulate, summarize
+from bar_store import BarStore, BAR_STORE_DIR
+from rules import RuleEngine
+
+SWEEP_KEYS = ("buy_drop_pct", "buy_drop_abs", "take_profit_pct", "stop_loss_pct", "sma_window", "sma_drop_pct")
+_INT_KEYS = ("sma_window",)
+
+# Worker-side views of the shared price arrays, attached once per process
+_worker_prices: Dict[str, np.ndarray] = {}
+_worker_shms: List[shared_memory.SharedMemory] = []
+
+
+def parse_range(spec: str, as_int: bool = False) -> List[Any]:
+	# "0.005,0.01,0.02" (explicit values) or "start:stop:step" (inclusive of stop)
+	if ":" in spec:
+		start, stop, step = (float(x) for x in spec.split(":"))
+		count = int(round((stop - start) / step)) + 1
+		values = [start + i * step for i in range(max(count, 0))]
+	else:
+		values = [float(x) for x in spec.split(",") if x.strip()]
+	if as_int:
+		return sorted({int(round(v)) for v in values})
+	return [round(v, 10) for v in values]
+
+
+def build_grid(ranges: Dict[str, List[Any]], samples: int = 0, seed: int = 0) -> List[Dict[str, Any]]:
+	keys = list(ranges)
+	total = 1
+	for k in keys:
+		total *= len(ranges[k])
+	if samples and samples < total:
+		# Random sample of the grid without materialising the full product
+		rng = random.Random(seed)
+		picked = set()
+		out = []
+		while len(out) < samples:
+			combo = tuple(rng.randrange(len(ranges[k])) for k in keys)
+			if combo in picked:
+				continue
+			picked.add(combo)
+			out.append({k: ranges[k][i] for k, i in zip(keys, combo)})
+		return out
+	return [dict(zip(keys, combo)) for combo in itertools.product(*(ranges[k] for k in keys))]
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Tuple[List[shared_memory.SharedMemory], Dict[str, Tuple[str, int]]]:
+	# Copy each symbol's in-session prices into shared memory once; workers map it without pickling
+	shms = []
+	meta = {}
+	for symbol, arr in arrays.items():
+		shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+		np.ndarray(arr.shape, dtype=np.float64, buffer=shm.buf)[:] = arr
+		shms.append(shm)
+		meta[symbol] = (shm.name, len(arr))
+	return shms, meta
+
+
+def _attach(meta: Dict[str, Tuple[str, int]]) -> None:
+	for symbol, (name, length) in meta.items():
+		shm = shared_memory.SharedMemory(name=name)
+		_worker_shms.append(shm)
+		_worker_prices[symbol] = np.ndarray((length,), dtype=np.float64, buffer=shm.buf)
+
+
+def _evaluate(job: Tuple[int, Dict[str, Any]]) -> Tuple[int, Dict[str, float]]:
+	idx, params = job
+	total_pnl = 0.0
+	trades = 0
+	wins = 0.0
+	worst_dd = 0.0
+	for prices in _worker_prices.values():
+		stats = summarize(simulate(prices, params), float(prices[-1]) if len(prices) else None, float(params["quantity"]))
+		total_pnl += stats["total_pnl"]
+		trades += int(stats["trades"])
+		wins += stats["win_rate"] * stats["trades"]
+		worst_dd = max(worst_dd, stats["max_drawdown"])
+	return idx, {
+		"total_pnl": total_pnl,
+		"trades": float(trades),
+		"win_rate": wins / trades if trades else 0.0,
+		"max_drawdown": worst_dd,
+	}
+
+
+def run_sweep(prices_by_symbol: Dict[str, np.ndarray],
+			  base_params: Dict[str, Any],
+			  grid: Sequence[Dict[str, Any]],
+			  workers: Optional[int] = None) -> List[Tuple[Dict[str, Any], Dict[str, float]]]:
+	# Evaluates every grid point across all symbols; returns (overrides, stats) ranked by total PnL
+	shms, meta = _share(prices_by_symbol)
+	results: List[Optional[Dict[str, float]]] = [None] * len(grid)
+	try:
+		jobs = [(i, dict(base_params, **point)) for i, point in enumerate(grid)]
+		with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_attach, initargs=(meta,)) as pool:
+			chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 8))
+			for idx, stats in pool.map(_evaluate, jobs, chunksize=chunksize):
+				results[idx] = stats
+	finally:
+		for shm in shms:
+			shm.close()
+			shm.unlink()
+	ranked = [(grid[i], stats) for i, stats in enumerate(results) if stats is not None]
+	ranked.sort(key=lambda r: (r[1]["total_pnl"], -r[1]["max_drawdown"]), reverse=True)
+	return ranked
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+	ap = argparse.ArgumentParser(description="Grid/random search over rules.config entry/exit parameters.")
+	ap.add_argument("files", nargs="*", help="CSV/Parquet 1-minute bar files, one per symbol")
+	ap.add_argument("--rules", default="rules.config")
+	ap.add_argument("--store", nargs="*", default=[], help="symbols to read from the local bar store")
+	ap.add_argument("--store-dir", default=BAR_STORE_DIR)
+	for key in SWEEP_KEYS:
+		ap.add_argument(f"--{key}", help="values 'a,b,c' or range 'start:stop:step'")
+	ap.add_argument("--samples", type=int, default=0, help="evaluate a random sample of this many grid points")
+	ap.add_argument("--seed", type=int, default=0)
+	ap.add_argument("--workers", type=int, default=0)
+	ap.add_argument("--top", type=int, default=20)
+	ap.add_argument("--out", help="write the full ranked table to this CSV")
+	args = ap.parse_args(argv)
+
+	rules = RuleEngine(args.rules)
+	ranges = {}
+	for key in SWEEP_KEYS:
+		spec = getattr(args, key)
+		if spec:
+			ranges[key] = parse_range(spec, as_int=key in _INT_KEYS)
+	if not ranges:
+		ap.error("give at least one parameter range, e.g. --take_profit_pct 0.005:0.03:0.005")
+
+	datasets = [(os.path.splitext(os.path.basename(path))[0].upper(), load_bars(path, rules.market_tz)) for path in args.files]
+	store = BarStore(args.store_dir)
+	datasets += [(symbol.upper(), load_store(store, symbol)) for symbol in args.store]
+	if not datasets:
+		ap.error("give bar files and/or --store symbols")
+	prices_by_symbol = {}
+	for symbol, bars in datasets:
+		prices_by_symbol[symbol] = np.ascontiguousarray(bars.close[market_mask(bars.ts, rules)])
+
+	grid = build_grid(ranges, args.samples, args.seed)
+	print(f"Evaluating {len(grid)} config(s) over {len(prices_by_symbol)} symbol(s)...")
+	ranked = run_sweep(prices_by_symbol, params_from_rules(rules), grid, args.workers or None)
+
+	keys = list(ranges)
+	header = keys + ["total_pnl", "trades", "win_rate", "max_drawdown"]
+	print(" ".join(f"{h:>14}" for h in ["rank"] + header))
+	for rank, (point, stats) in enumerate(ranked[:args.top], 1):
+		cells = [f"{rank:>14}"] + [f"{point[k]:>14}" for k in keys] + [
+			f"{stats['total_pnl']:>14.2f}", f"{int(stats['trades']):>14}", f"{stats['win_rate'] * 100:>13.1f}%", f"{stats['max_drawdown']:>14.2f}",
+		]
+		print(" ".join(cells))
+	if args.out:
+		with open(args.out, "w", newline="") as f:
+			w = csv.writer(f)
+			w.writerow(["rank"] + header)
+			for rank, (point, stats) in enumerate(ranked, 1):
+				w.writerow([rank] + [point[k] for k in keys] + [stats["total_pnl"], int(stats["trades"]), stats["win_rate"], stats["max_drawdown"]])
+
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
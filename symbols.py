@@ -1,9 +1,7 @@
-from typing import Tuple
+from typing import List, Tuple
 
 
-def read_symbol_entry(path: str = "stocksymbol.txt") -> Tuple[str, str]:
-	with open(path, "r") as f:
-		line = f.read().strip()
+def _parse_entry(line: str) -> Tuple[str, str]:
 	# Accept formats:
 	# - SYMBOL
 	# - SYMBOL|BREEZE_CODE
@@ -11,3 +9,26 @@ def read_symbol_entry(path: str = "stocksymbol.txt") -> Tuple[str, str]:
 		display, breeze_code = line.split("|", 1)
 		return display.strip().upper(), breeze_code.strip()
 	return line.strip().upper(), line.strip().upper()
+
+
+def read_symbol_entry(path: str = "stocksymbol.txt") -> Tuple[str, str]:
+	with open(path, "r") as f:
+		line = f.read().strip()
+	return _parse_entry(line.splitlines()[0] if line else line)
+
+
+def read_symbol_entries(path: str = "stocksymbol.txt") -> List[Tuple[str, str]]:
+	# One DISPLAY|BREEZE_CODE entry per line; blank lines and '#' comments are skipped
+	entries: List[Tuple[str, str]] = []
+	seen = set()
+	with open(path, "r") as f:
+		for raw in f:
+			line = raw.strip()
+			if not line or line.startswith("#"):
+				continue
+			display, breeze_code = _parse_entry(line)
+			if display in seen:
+				continue
+			seen.add(display)
+			entries.append((display, breeze_code))
+	return entries
@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def make_rules(tmp_path):
+	# rules.config from the repo with test overrides, written to a temp dir; nothing touches the
+	# real state, journal, bar store or network
+	def make(**overrides):
+		with open(os.path.join(ROOT, "rules.config")) as f:
+			cfg = json.load(f)
+		cfg.update({
+			"quote_source": "auto",
+			"order_async": False,
+			"event_core": False,
+			"warm_start": False,
+			"bar_store_dir": "",
+			"journal_dir": "",
+			"quote_cache_size": 0,
+			"paper_trading": False,
+			"log_dir": str(tmp_path / "logs"),
+		})
+		cfg.update(overrides)
+		path = tmp_path / "rules.config"
+		path.write_text(json.dumps(cfg))
+		return str(path)
+	return make
+
+
+@pytest.fixture
+def make_store(tmp_path):
+	from state import StateStore
+
+	stores = []
+
+	def make():
+		store = StateStore(path=str(tmp_path / "state.json"), lock_path=str(tmp_path / "state.json.lock"), flush_interval_sec=0)
+		stores.append(store)
+		return store
+	yield make
+	for store in stores:
+		store.close()
+
+
+def wait_for(predicate, timeout=5.0, interval=0.01):
+	deadline = time.monotonic() + timeout
+	while time.monotonic() < deadline:
+		if predicate():
+			return True
+		time.sleep(interval)
+	return predicate()
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from backtest import _ENTRY_REASONS, _EXIT_REASONS, params_from_rules, simulate
+from engine import SymbolTrader
+from rules import RuleEngine
+
+# backtest.simulate must reproduce the live SymbolTrader's trades tick for tick: same entry and
+# exit ticks, prices and reasons. Each seed draws a random rules.config and a random walk.
+
+
+class FillAtTick:
+	# Broker that fills every market order at the tick being processed
+	def __init__(self):
+		self.price = None
+		self.orders = []
+
+	def place_market_order(self, stock_code, exchange_code, action, quantity, **kwargs):
+		self.orders.append((action, self.price))
+		return {"Success": {"order_id": None, "average_price": self.price}, "Status": 200, "Error": None}
+
+
+def _random_config(rng):
+	return {
+		"buy_mode": str(rng.choice(["drop_from_high", "below_sma"])),
+		"buy_drop_pct": float(rng.uniform(0.001, 0.02)),
+		"buy_drop_abs": float(rng.choice([0.0, rng.uniform(0.1, 1.0)])),
+		"take_profit_pct": float(rng.uniform(0.002, 0.03)),
+		"take_profit_abs": float(rng.choice([0.0, rng.uniform(0.2, 2.0)])),
+		"stop_loss_pct": float(rng.uniform(0.002, 0.03)),
+		"sma_window": int(rng.integers(2, 30)),
+		"sma_drop_pct": float(rng.uniform(0.0005, 0.01)),
+		"high_window": int(rng.integers(2, 60)),
+		"min_warmup_samples": int(rng.integers(1, 10)),
+		"buy_immediate_on_start": bool(rng.random() < 0.3),
+		"quantity": int(rng.integers(1, 5)),
+	}
+
+
+def _live_trades(rules_path, prices, store):
+	broker = FillAtTick()
+	rules = RuleEngine(rules_path)
+	rules.is_market_open = lambda: True
+	trader = SymbolTrader("PARITY", "PARITY", rules, broker, store)
+	events = []
+	for i, ltp in enumerate(prices):
+		broker.price = float(ltp)
+		before = len(broker.orders)
+		trader.on_price(float(ltp))
+		for action, price in broker.orders[before:]:
+			events.append((i, action, price))
+	return events
+
+
+def _simulated_trades(rules_path, prices):
+	trades = simulate(prices, params_from_rules(RuleEngine(rules_path)))
+	events = []
+	for t in trades:
+		events.append((int(t["entry_idx"]), "BUY", float(t["entry_price"])))
+		if t["exit_idx"] >= 0:
+			events.append((int(t["exit_idx"]), "SELL", float(t["exit_price"])))
+	return events, trades
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_simulate_matches_symbol_trader(seed, make_rules, make_store):
+	rng = np.random.default_rng(seed)
+	cfg = _random_config(rng)
+	prices = np.round(100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.004, 600))), 2)
+	rules_path = make_rules(**cfg)
+	store = make_store()
+	live = _live_trades(rules_path, prices, store)
+	simulated, trades = _simulated_trades(rules_path, prices)
+	assert simulated == live, cfg
+	closed = trades[trades["exit_idx"] >= 0]
+	assert float(closed["pnl"].sum()) == pytest.approx(store.get_total_pnl("PARITY"))
+	assert all(_ENTRY_REASONS[r] for r in trades["entry_reason"])
+	assert all(_EXIT_REASONS[r] for r in closed["exit_reason"])
@@ -0,0 +1,42 @@
+import os
+
+import numpy as np
+
+from bar_store import PENDING_FILE, BarStore, make_rows
+
+
+def _rows(ts, close):
+	ts = np.asarray(ts)
+	close = np.asarray(close, dtype=float)
+	return make_rows(ts, close, close, close, close, np.zeros(len(ts)))
+
+
+def test_backfill_leaves_mapped_columns_alone(tmp_path):
+	store = BarStore(str(tmp_path))
+	store.append_rows("AAA", _rows([60, 120, 180], [1.0, 2.0, 3.0]))
+	view = store.columns("AAA")["close"]
+	assert isinstance(view, np.memmap)
+	# Out of order: a new minute in the gap and a correction of an existing one
+	added = store.merge("AAA", _rows([90, 120], [1.5, 20.0]))
+	assert added == 1
+	assert list(view) == [1.0, 2.0, 3.0]  # the live map still sees the old file
+	cols = store.read("AAA")
+	assert list(cols["ts"]) == [60, 90, 120, 180]
+	assert list(cols["close"]) == [1.0, 1.5, 20.0, 3.0]
+	# Appends after a backfill land in the same segment and the newest write wins
+	store.append_rows("AAA", _rows([120, 240], [21.0, 4.0]))
+	assert list(store.read("AAA")["close"]) == [1.0, 1.5, 21.0, 3.0, 4.0]
+	assert store.count("AAA") == 5
+	store.close()
+	del view
+
+	reopened = BarStore(str(tmp_path))
+	assert not os.path.exists(os.path.join(str(tmp_path), "AAA", "1m", PENDING_FILE))
+	cols = reopened.columns("AAA")
+	assert isinstance(cols["ts"], np.memmap)
+	assert list(cols["ts"]) == [60, 90, 120, 180, 240]
+	assert list(cols["close"]) == [1.0, 1.5, 21.0, 3.0, 4.0]
+	reopened.append_tick("AAA", 5.0, ts=300)
+	reopened.append_rows("AAA", _rows([300], [5.0]))
+	assert reopened.count("AAA") == 6
+	reopened.close()
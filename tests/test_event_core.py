@@ -0,0 +1,77 @@
+import threading
+
+import engine
+from conftest import wait_for
+from engine import MultiTrader
+from stream import FakeFeedServer
+from test_stream import FakeBroker
+
+
+def test_stop_ends_run_events_from_another_thread(make_rules, make_store):
+	server = FakeFeedServer()
+	server.start()
+	rules_path = make_rules(event_core=True, quote_source="stream", stream_fake_feed=server.address, buy_immediate_on_start=True)
+	broker = FakeBroker()
+	trader = MultiTrader(broker, [("AAA", "AAA")], rules_path=rules_path, store=make_store())
+	trader.traders[0].rules.is_market_open = lambda: True
+	closed = []
+	store_close = trader.store.close
+	trader.store.close = lambda: (closed.append(True), store_close())
+	runner = threading.Thread(target=trader.run_forever, daemon=True)
+	runner.start()
+	try:
+		assert wait_for(lambda: server.client_count() == 1)
+		server.publish("AAA", 100.0)
+		assert wait_for(lambda: trader.store.get_position("AAA") is not None)
+	finally:
+		trader.stop()
+		runner.join(timeout=5)
+		server.stop()
+	assert not runner.is_alive()
+	# run_forever's cleanup ran: the feed was closed and the state store saved and closed
+	assert closed == [True]
+	assert wait_for(lambda: server.client_count() == 0)
+
+
+def test_stop_before_run_events_starts(make_rules, make_store):
+	rules_path = make_rules(event_core=True, quote_source="stream", stream_fake_feed="127.0.0.1:9")
+	trader = MultiTrader(FakeBroker(), [("AAA", "AAA")], rules_path=rules_path, store=make_store())
+	trader.stop()
+
+	class IdleFeed:
+		def start(self, codes, exchange_code):
+			pass
+
+		def stop(self):
+			pass
+
+	runner = threading.Thread(target=trader.run_events, kwargs={"feed": IdleFeed()}, daemon=True)
+	runner.start()
+	runner.join(timeout=5)
+	assert not runner.is_alive()
+
+
+def test_poll_timer_quotes_the_watchlist_in_one_batch(make_rules, make_store, monkeypatch):
+	calls = []
+
+	def fake_batch(symbols, exchange_code, client, budget_sec=3.0):
+		calls.append(list(symbols))
+		return {sym: 100.0 + i for i, sym in enumerate(symbols)}
+
+	monkeypatch.setattr(engine, "get_ltps_batch", fake_batch)
+	rules_path = make_rules(event_core=True, quote_source="auto", poll_interval_sec=1, buy_immediate_on_start=True)
+	trader = MultiTrader(FakeBroker(), [("AAA", "AAA"), ("BBB", "BBB"), ("CCC", "CCC")], rules_path=rules_path, store=make_store())
+	trader.seconds_until_open = lambda: 0.0
+	for t in trader.traders:
+		t.rules.is_market_open = lambda: True
+	runner = threading.Thread(target=trader.run_events, daemon=True)
+	runner.start()
+	try:
+		assert wait_for(lambda: all(trader.store.get_position(s) is not None for s in ("AAA", "BBB", "CCC")))
+	finally:
+		trader.stop()
+		runner.join(timeout=5)
+	assert not runner.is_alive()
+	# One request per poll round for the whole watchlist, each symbol then decided on its own tick
+	assert calls and all(c == ["AAA", "BBB", "CCC"] for c in calls)
+	assert trader.store.get_position("CCC")["avg_price"] == 102.0
@@ -0,0 +1,37 @@
+import os
+
+from journal import Journal
+from state import StateStore
+
+
+def _store(tmp_path, **kwargs):
+	journal = Journal(str(tmp_path / "journal"), fsync=False)
+	return StateStore(path=str(tmp_path / "state.json"), lock_path=str(tmp_path / "state.lock"), flush_interval_sec=0, journal=journal, compact_every=3, **kwargs)
+
+
+def _trade(store, n):
+	for i in range(n):
+		store.set_position("AAA", 1, 100.0 + i, per_symbol=True)
+		store.record_sell("AAA", 1.0, 101.0 + i)
+
+
+def test_compaction_deletes_segments_the_snapshot_covers(tmp_path):
+	store = _store(tmp_path)
+	_trade(store, 5)
+	store.close()
+	# Only the segment being written is left, and a restart carries on from the snapshot
+	assert len(os.listdir(tmp_path / "journal")) == 1
+	store = _store(tmp_path)
+	assert store.journal.seq == 10
+	assert store.get_total_pnl("AAA") == 5.0
+	store.record_sell("AAA", 1.0, 110.0)
+	assert [rec["seq"] for rec in store.journal.replay(10)] == [11]
+	store.close()
+
+
+def test_compaction_can_keep_the_history(tmp_path):
+	store = _store(tmp_path, keep_journal_history=True)
+	_trade(store, 5)
+	store.close()
+	assert len(os.listdir(tmp_path / "journal")) > 1
+	assert [rec["seq"] for rec in Journal(str(tmp_path / "journal")).history()] == list(range(1, 11))
@@ -0,0 +1,37 @@
+import logging
+
+import log_setup
+
+
+def _warning(lg, created):
+	rec = lg.makeRecord(lg.name, logging.WARNING, __file__, 0, "quote failed for %s", ("AAA",), None)
+	rec.created = created
+	return rec
+
+
+def test_console_and_file_drop_the_same_repeats(tmp_path, capsys):
+	root = logging.getLogger()
+	saved = (root.handlers[:], root.level)
+	log_setup.setup_logging(log_dir=str(tmp_path), event_file="", dedup_sec=60.0)
+	try:
+		lg = logging.getLogger("dedup-test")
+		for i in range(4):
+			lg.handle(_warning(lg, 1000.0 + i))
+		# Past the window: the next one goes through with the count of what was dropped, and the
+		# window starts again from it
+		lg.handle(_warning(lg, 1120.0))
+		lg.handle(_warning(lg, 1121.0))
+		lg.handle(_warning(lg, 1122.0))
+		lg.handle(_warning(lg, 1240.0))
+	finally:
+		log_setup.stop_logging()
+		root.handlers, root.level = saved
+	console = [line for line in capsys.readouterr().out.splitlines() if "quote failed" in line]
+	with open(tmp_path / "trader.log") as f:
+		logged = [line.split(": ", 1)[1] for line in f.read().splitlines() if "quote failed" in line]
+	assert logged == [
+		"quote failed for AAA",
+		"quote failed for AAA (repeated 3 more time(s) in the last 60s)",
+		"quote failed for AAA (repeated 2 more time(s) in the last 60s)",
+	]
+	assert console == logged
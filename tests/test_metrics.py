@@ -0,0 +1,31 @@
+import metrics
+from metrics import Registry
+from rate_limit import RequestScheduler
+
+
+def test_collectors_publish_gauges_when_rendered():
+	registry = Registry()
+	scheduler = RequestScheduler(rate_per_min=60, burst=3)
+	scheduler.acquire("quote")
+
+	def collect():
+		m = scheduler.metrics()
+		registry.set_gauge("rate_tokens", m["tokens"])
+		for lane, s in m["lanes"].items():
+			registry.set_gauge("rate_waiting", s["waiting"], lane=lane)
+
+	registry.add_collector("rate", collect)
+	text = registry.render()
+	assert "# TYPE rate_tokens gauge" in text
+	assert 'rate_waiting{lane="order"} 0' in text
+	tokens = float(next(line for line in text.splitlines() if line.startswith("rate_tokens ")).split()[1])
+	assert 2.0 <= tokens < 3.0
+	# A failing collector is logged and skipped; the rest still renders
+	registry.add_collector("rate", lambda: 1 / 0)
+	assert "rate_tokens" in registry.render()
+
+
+def test_exported_series_carry_help_text():
+	metrics.observe("tick_seconds", 0.01)
+	lines = metrics.REGISTRY.render().splitlines()
+	assert lines.index("# HELP tick_seconds Whole polling round: quotes, decisions and execution") + 1 == lines.index("# TYPE tick_seconds summary")
@@ -0,0 +1,121 @@
+import logging
+import threading
+
+from conftest import wait_for
+from orders import OrderManager
+from risk import PortfolioRisk
+
+
+class MockBroker:
+	# Breeze-shaped endpoint: place_market_order hands out ids and get_order_status walks through
+	# a scripted list of order rows, repeating the last one
+	def __init__(self, script):
+		self.script = list(script)
+		self.placed = []
+		self.polls = 0
+		self._lock = threading.Lock()
+
+	def place_market_order(self, stock_code, exchange_code, action, quantity, **kwargs):
+		with self._lock:
+			self.placed.append((stock_code, action, quantity))
+			return {"Success": {"order_id": f"ORD{len(self.placed)}"}, "Status": 200, "Error": None}
+
+	def get_order_status(self, order_id, exchange_code):
+		with self._lock:
+			row = self.script[min(self.polls, len(self.script) - 1)]
+			self.polls += 1
+		return {"Success": [dict(row, order_id=order_id)], "Status": 200, "Error": None}
+
+
+def _manager(broker, store, **kwargs):
+	return OrderManager(broker, store, poll_interval_sec=0.05, **kwargs)
+
+
+def test_buy_is_applied_once_the_broker_reports_the_fill(make_store):
+	store = make_store()
+	broker = MockBroker([
+		{"status": "Ordered", "quantity": "5", "pending_quantity": "5"},
+		{"status": "Ordered", "quantity": "5", "pending_quantity": "5"},
+		{"status": "Executed", "quantity": "5", "pending_quantity": "0", "average_price": "101.5"},
+	])
+	done = []
+	orders = _manager(broker, store)
+	orders.add_listener(done.append)
+	order = orders.submit("AAA", "AAA", "NSE", "BUY", 5, 101.0)
+	assert orders.pending("AAA") is order
+	assert wait_for(lambda: done)
+	assert broker.placed == [("AAA", "BUY", 5)]
+	assert broker.polls == 3
+	assert order.status == "filled"
+	assert orders.pending("AAA") is None
+	assert store.get_position("AAA") == {"symbol": "AAA", "qty": 5, "avg_price": 101.5}
+	assert store.pending_orders() == {}
+	assert orders.slippage_summary() == {"AAA": {"fills": 1.0, "total_slippage": 2.5}}
+	orders.close()
+
+
+def test_partly_filled_sell_books_only_the_sold_shares(make_store):
+	store = make_store()
+	store.set_position("AAA", 10, 100.0, per_symbol=True)
+	risk = PortfolioRisk(["AAA"], max_gross_exposure=1e9)
+	risk.load(store.snapshot())
+	store.add_listener(risk.on_record)
+	broker = MockBroker([
+		{"status": "Ordered", "quantity": "10", "pending_quantity": "6"},
+		{"status": "Cancelled", "quantity": "10", "pending_quantity": "6", "average_price": "110"},
+	])
+	done = []
+	orders = _manager(broker, store)
+	orders.add_listener(done.append)
+	orders.submit("AAA", "AAA", "NSE", "SELL", 10, 110.0, "take_profit")
+	assert wait_for(lambda: done)
+	assert done[0].filled_qty == 4
+	assert store.get_total_pnl("AAA") == 40.0
+	assert store.get_position("AAA") == {"symbol": "AAA", "qty": 6, "avg_price": 100.0}
+	assert float(risk.qty[0]) == 6.0
+	assert float(risk.realized_today) == 40.0
+	orders.close()
+	# The rest sells in full on the next order
+	broker.script = [{"status": "Executed", "quantity": "6", "pending_quantity": "0", "average_price": "105"}]
+	broker.polls = 0
+	orders = _manager(broker, store)
+	orders.submit("AAA", "AAA", "NSE", "SELL", 6, 105.0, "take_profit")
+	assert wait_for(lambda: store.get_position("AAA") is None)
+	assert store.get_total_pnl("AAA") == 70.0
+	assert float(risk.qty[0]) == 0.0
+	orders.close()
+
+
+def test_rejected_order_leaves_the_position_alone(make_store):
+	store = make_store()
+	broker = MockBroker([{"status": "Rejected", "quantity": "5", "pending_quantity": "5"}])
+	done = []
+	orders = _manager(broker, store)
+	orders.add_listener(done.append)
+	orders.submit("AAA", "AAA", "NSE", "BUY", 5, 100.0)
+	assert wait_for(lambda: done)
+	assert done[0].status == "failed"
+	assert store.get_position("AAA") is None
+	assert store.pending_orders() == {}
+	orders.close()
+
+
+def test_unfilled_order_keeps_tracking_past_the_timeout_and_resumes(make_store, caplog):
+	store = make_store()
+	broker = MockBroker([{"status": "Ordered", "quantity": "5", "pending_quantity": "5"}])
+	orders = _manager(broker, store, fill_timeout_sec=0.1)
+	with caplog.at_level(logging.WARNING, logger="orders"):
+		order = orders.submit("AAA", "AAA", "NSE", "BUY", 5, 100.0)
+		assert wait_for(lambda: "not filled after" in caplog.text)
+	assert orders.pending("AAA") is order
+	assert store.get_position("AAA") is None
+	orders.close(timeout=0.1)
+	# Still open at shutdown: journalled, and picked up again by the next manager
+	assert store.pending_orders()["AAA"]["order_id"] == "ORD1"
+	broker.script = [{"status": "Executed", "quantity": "5", "pending_quantity": "0", "average_price": "99"}]
+	orders = _manager(broker, store)
+	orders.resume("NSE")
+	assert wait_for(lambda: store.get_position("AAA") is not None)
+	assert store.get_position("AAA")["avg_price"] == 99.0
+	assert len(broker.placed) == 1
+	orders.close()
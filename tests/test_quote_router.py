@@ -0,0 +1,43 @@
+import threading
+import time
+
+import quote_router
+
+
+def test_only_one_caller_claims_a_source_slot():
+	key = ("AAA", "yf")
+	start = threading.Barrier(8)
+	won = []
+
+	def claim():
+		start.wait()
+		won.append(quote_router._claim_slot(key))
+
+	threads = [threading.Thread(target=claim) for _ in range(8)]
+	for t in threads:
+		t.start()
+	for t in threads:
+		t.join()
+	try:
+		assert won.count(True) == 1
+	finally:
+		quote_router._release_slot(key)
+	assert quote_router._claim_slot(key)
+	quote_router._release_slot(key)
+
+
+def test_breeze_fallback_quotes_symbols_concurrently(monkeypatch):
+	class SlowBreeze:
+		def get_ltp(self, code, exchange_code):
+			time.sleep(0.3)
+			return 50.0
+
+	monkeypatch.setattr(quote_router, "get_ltps_yf", lambda syms, exchange_code: {})
+	monkeypatch.setattr(quote_router, "get_ltps_nse", lambda syms: {})
+	monkeypatch.setattr(quote_router, "_cache", quote_router.QuoteCache(0))
+	monkeypatch.setattr(quote_router, "_health", quote_router.SourceHealth())
+	symbols = [f"S{i}" for i in range(8)]
+	started = time.monotonic()
+	got = quote_router.get_ltps_batch(symbols, "NSE", SlowBreeze(), budget_sec=2.0)
+	assert time.monotonic() - started < 1.0
+	assert got == {sym: 50.0 for sym in symbols}
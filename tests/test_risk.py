@@ -0,0 +1,65 @@
+import time
+
+from engine import SymbolTrader
+from journal import Journal
+from risk import PortfolioRisk
+from rules import RuleEngine
+from state import StateStore
+
+
+class FillAtPrice:
+	def __init__(self):
+		self.orders = []
+
+	def place_market_order(self, stock_code, exchange_code, action, quantity, **kwargs):
+		self.orders.append(action)
+		return {"Success": {"order_id": None}, "Status": 200, "Error": None}
+
+
+def test_restart_keeps_todays_realized_loss(tmp_path):
+	def open_store():
+		journal = Journal(str(tmp_path / "journal"))
+		return StateStore(path=str(tmp_path / "state.json"), lock_path=str(tmp_path / "state.lock"), flush_interval_sec=0, journal=journal)
+
+	store = open_store()
+	store.set_position("AAA", 10, 100.0, per_symbol=True)
+	store.record_sell("AAA", -40.0, 96.0)
+	store.set_position("BBB", 10, 100.0, per_symbol=True)
+	store.record_sell("BBB", -30.0, 97.0)
+	store.close()
+	# Crash after the journal append but before state.json caught up with this sell
+	journal = Journal(str(tmp_path / "journal"))
+	journal.append({"op": "sell", "symbol": "ZZZ", "pnl": -500.0, "price": 1.0})  # not traded by this process
+	journal.close()
+
+	# A fresh process: today's sells come from the snapshot plus the replayed journal tail
+	store = open_store()
+	risk = PortfolioRisk(["AAA", "BBB"], max_daily_loss=50.0)
+	risk.load_realized(store.recent_sells())
+	assert [r["symbol"] for r in store.recent_sells()] == ["AAA", "BBB", "ZZZ"]
+	assert risk.realized_today == -70.0
+	assert risk.check("AAA", "BUY", 1, 100.0) == "max_daily_loss"
+
+	# The same sells seen from the next day no longer count
+	tomorrow = PortfolioRisk(["AAA", "BBB"], max_daily_loss=50.0, clock=lambda: time.time() + 86400)
+	tomorrow.load_realized(store.recent_sells())
+	assert tomorrow.realized_today == 0.0
+	assert tomorrow.check("AAA", "BUY", 1, 100.0) is None
+	store.close()
+
+
+def test_immediate_buy_blocked_by_a_limit_is_tried_again(make_rules, make_store):
+	rules = RuleEngine(make_rules(buy_immediate_on_start=True, min_warmup_samples=1000, quantity=1))
+	rules.is_market_open = lambda: True
+	broker = FillAtPrice()
+	risk = PortfolioRisk(["AAA"], max_gross_exposure=100.0)
+	store = make_store()
+	store.add_listener(risk.on_record)
+	trader = SymbolTrader("AAA", "AAA", rules, broker, store, risk=risk)
+	trader.on_price(150.0)
+	assert broker.orders == []
+	assert store.get_position("AAA") is None
+	trader.on_price(90.0)
+	assert broker.orders == ["BUY"]
+	assert store.get_position("AAA")["avg_price"] == 90.0
+	assert trader.immediate_bought
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from conftest import wait_for
+from engine import MultiTrader
+from rules import RuleEngine
+from stream import FakeFeedClient, FakeFeedServer, TickTable
+
+
+class FakeBroker:
+	# Fills every market order at the last streamed price
+	def __init__(self):
+		self.orders = []
+		self.last = {}
+
+	def update_price(self, code, ltp, exchange_code="NSE"):
+		self.last[code] = ltp
+
+	def place_market_order(self, stock_code, exchange_code, action, quantity, **kwargs):
+		self.orders.append((stock_code, action, quantity))
+		return {"Success": {"order_id": None, "average_price": self.last.get(stock_code)}, "Status": 200, "Error": None}
+
+
+def test_run_streaming_trades_from_fake_feed(make_rules, make_store):
+	server = FakeFeedServer()
+	server.start()
+	rules_path = make_rules(quote_source="stream", stream_fake_feed=server.address, poll_interval_sec=1, buy_immediate_on_start=True, take_profit_pct=0.02, stop_loss_pct=0.5)
+	broker = FakeBroker()
+	trader = MultiTrader(broker, [("AAA", "AAA"), ("BBB", "BBB")], rules_path=rules_path, store=make_store())
+	for t in trader.traders:
+		t.rules.is_market_open = lambda: True  # the test runs at any hour
+	table = TickTable()
+	runner = threading.Thread(target=trader.run_streaming, args=(table, FakeFeedClient(server.address, table)), daemon=True)
+	runner.start()
+	try:
+		assert wait_for(lambda: server.client_count() == 1)
+		server.publish("AAA", 100.0)
+		server.publish("BBB", 50.0)
+		# Immediate buy on the first tick of each symbol
+		assert wait_for(lambda: trader.store.get_position("AAA") is not None and trader.store.get_position("BBB") is not None)
+		assert trader.store.get_position("AAA")["avg_price"] == 100.0
+		# Take-profit on the next tick, with no polling interval in between
+		server.publish("AAA", 103.0)
+		assert wait_for(lambda: trader.store.get_position("AAA") is None)
+		assert trader.store.get_total_pnl("AAA") == 3.0
+		assert trader.store.get_position("BBB") is not None
+		assert [o[1] for o in broker.orders if o[0] == "AAA"] == ["BUY", "SELL"]
+		assert table.get("AAA") == 103.0
+	finally:
+		trader.stop()
+		runner.join(timeout=5)
+		server.stop()
+	assert not runner.is_alive()
+
+
+def test_stream_volume_feeds_vwap_rules(make_rules, make_store):
+	server = FakeFeedServer()
+	server.start()
+	rules_path = make_rules(quote_source="stream", stream_fake_feed=server.address, poll_interval_sec=1, buy_rule="ltp < vwap(2)", min_warmup_samples=1, buy_immediate_on_start=False)
+	trader = MultiTrader(FakeBroker(), [("AAA", "AAA")], rules_path=rules_path, store=make_store())
+	rules = trader.traders[0].rules
+	rules.is_market_open = lambda: True
+	table = TickTable()
+	runner = threading.Thread(target=trader.run_streaming, args=(table, FakeFeedClient(server.address, table)), daemon=True)
+	runner.start()
+	try:
+		assert wait_for(lambda: server.client_count() == 1)
+		# The feed reports the day's running quantity; the first one is only the baseline
+		for n, (ltp, total) in enumerate([(100.0, 1000), (100.0, 1100), (90.0, 1110)], start=1):
+			server.publish("AAA", ltp, total)
+			assert wait_for(lambda: len(rules.window_prices) == n or trader.store.get_position("AAA") is not None)
+		assert wait_for(lambda: trader.store.get_position("AAA") is not None)
+		assert trader.store.get_position("AAA")["avg_price"] == 90.0
+		vwap = rules.custom.indicators.get("vwap", 2)
+		assert vwap.value == pytest.approx((100.0 * 100 + 90.0 * 10) / 110)
+	finally:
+		trader.stop()
+		runner.join(timeout=5)
+		server.stop()
+	# Polled quotes carry no volume, so a vwap rule is refused up front
+	with pytest.raises(ValueError, match="vwap"):
+		RuleEngine(make_rules(quote_source="auto", buy_rule="ltp < vwap(2)"))
@@ -1,128 +1,51 @@
+import logging
 import sys
-import time
-from typing import Optional
 
 from breeze_client import BreezeClient
+from engine import MultiTrader
+from log_setup import setup_from_rules, stop_logging
+from paper_broker import PaperBroker
 from rules import RuleEngine
-from state import get_position, set_position, clear_position, add_realized_pnl, get_total_pnl, set_last_sell_price, get_last_sell_price
-from quote_router import get_ltp
-from symbols import read_symbol_entry
+from symbols import read_symbol_entries
 
+log = logging.getLogger(__name__)
 
-def main() -> None:
-	client = BreezeClient()
-	client.connect()
-	rules = RuleEngine()
-	display_symbol, breeze_code = read_symbol_entry()
-
-	print(f"Trader started for {display_symbol} (source={rules.quote_source}).")
-	immediate_bought = False
-	while True:
-		pos = get_position()
-		ltp: Optional[float] = None
-
-		# Fetch latest price
-		if rules.quote_source == "breeze":
-			ltp = client.get_ltp(breeze_code, rules.exchange_code)
-		else:
-			ltp = get_ltp(display_symbol, rules.exchange_code, client)
-
-		print(f"[debug] LTP={ltp}")
-		if ltp is None:
-			print("No LTP yet...")
-			time.sleep(rules.poll_interval_sec)
-			continue
 
-		if not rules.is_market_open():
-			print("Market closed; no new orders.")
-			time.sleep(rules.poll_interval_sec)
-			continue
+def paper_client(rules: RuleEngine, feed: BreezeClient) -> PaperBroker:
+	# Orders are simulated; Breeze is only used for prices, and only if it is needed or available
+	try:
+		feed.connect()
+	except Exception as e:
+		if rules.quote_source in ("breeze", "stream") and not rules.stream_fake_feed:
+			raise
+		log.warning("Paper trading without Breeze market data: %s", e)
+		feed = None
+	log.warning("PAPER TRADING: orders are simulated and never sent to the exchange.")
+	return PaperBroker(
+		feed,
+		latency_ms=rules.paper_latency_ms,
+		slippage_bps=rules.paper_slippage_bps,
+		partial_fill_pct=rules.paper_partial_fill_pct,
+	)
 
-		if pos is None:
-			# Optional re-entry: if we sold higher and price is now lower, allow immediate buy
-			last_sell = get_last_sell_price()
-			if last_sell is not None and ltp < last_sell:
-				print(f"BUY (price below last sell {last_sell}) at {ltp}")
-				resp = client.place_market_order(
-					stock_code=breeze_code,
-					exchange_code=rules.exchange_code,
-					action="BUY",
-					quantity=rules.quantity,
-				)
-				avg_price = ltp
-				try:
-					odata = resp.get("Success") or resp.get("data") or {}
-					avg_price = float(odata.get("average_price") or odata.get("avg_price") or avg_price)
-				except Exception:
-					pass
-				set_position(display_symbol, rules.quantity, avg_price)
-				print(f"Bought {display_symbol} qty={rules.quantity} avg_price={avg_price}")
-				# do not clear last_sell; it is for reference only
-				immediate_bought = True
-			else:
-				# One-time immediate buy on start, if enabled
-				if rules.buy_immediate_on_start and not immediate_bought:
-					print(f"BUY (immediate on start) at {ltp}")
-					resp = client.place_market_order(
-						stock_code=breeze_code,
-						exchange_code=rules.exchange_code,
-						action="BUY",
-						quantity=rules.quantity,
-					)
-					avg_price = ltp
-					try:
-						odata = resp.get("Success") or resp.get("data") or {}
-						avg_price = float(odata.get("average_price") or odata.get("avg_price") or avg_price)
-					except Exception:
-						pass
-					set_position(display_symbol, rules.quantity, avg_price)
-					print(f"Bought {display_symbol} qty={rules.quantity} avg_price={avg_price}")
-					immediate_bought = True
-				else:
-					# No position: update window and check for entry
-					rules.update_price(ltp)
-					if not rules.ready() and not rules.buy_immediate_on_start:
-						print("[debug] warming up price window...")
-					elif rules.should_buy(ltp):
-						print(f"BUY signal at {ltp}")
-						resp = client.place_market_order(
-							stock_code=breeze_code,
-							exchange_code=rules.exchange_code,
-							action="BUY",
-							quantity=rules.quantity,
-						)
-						avg_price = ltp
-						try:
-							odata = resp.get("Success") or resp.get("data") or {}
-							avg_price = float(odata.get("average_price") or odata.get("avg_price") or avg_price)
-						except Exception:
-							pass
-						set_position(display_symbol, rules.quantity, avg_price)
-						print(f"Bought {display_symbol} qty={rules.quantity} avg_price={avg_price}")
-					else:
-						print("[debug] no buy trigger yet.")
-		else:
-			# Have a position: check for exit
-			avg_buy = float(pos.get("avg_price", 0))
-			should_exit, reason = rules.should_sell(ltp, avg_buy)
-			if should_exit:
-				print(f"SELL signal ({reason}) at {ltp}")
-				client.place_market_order(
-					stock_code=breeze_code,
-					exchange_code=rules.exchange_code,
-					action="SELL",
-					quantity=rules.quantity,
-				)
-				# Realized PnL
-				pnl = (ltp - avg_buy) * float(pos.get("qty", 0) or 0)
-				total = add_realized_pnl(pnl)
-				set_last_sell_price(ltp)
-				clear_position()
-				print(f"Sold {display_symbol} due to {reason} at approx {ltp}; trade PnL={pnl:.2f}; total PnL={total:.2f}")
-			else:
-				print("[debug] holding; no exit trigger.")
 
-		time.sleep(rules.poll_interval_sec)
+def main() -> None:
+	# One process, one Breeze session, one scheduler for every line in stocksymbol.txt
+	rules = RuleEngine()
+	setup_from_rules(rules)
+	client = BreezeClient(
+		rate_per_min=rules.breeze_rate_per_min,
+		burst=rules.breeze_burst,
+		order_reserve=rules.breeze_order_reserve,
+		quote_wait_sec=rules.quote_budget_sec,
+	)
+	if rules.paper_trading:
+		client = paper_client(rules, client)
+	else:
+		client.connect()
+	entries = read_symbol_entries()
+	trader = MultiTrader(client, entries)
+	trader.run_forever()
 
 
 if __name__ == "__main__":
@@ -133,3 +56,5 @@ if __name__ == "__main__":
 		import traceback
 		traceback.print_exc()
 		sys.exit(1)
+	finally:
+		stop_logging()
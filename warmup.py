@@ -0,0 +1,94 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from bar_store import BarStore
+
+log = logging.getLogger(__name__)
+
+
+# Warm start: fill each symbol's price window from recorded history before the first live tick, so a
+# restarted trader does not spend sma_window polls (or min_warmup_samples) unable to signal.
+# Sources in order: the trader's own recorded ticks, stored 1-minute bars, one Breeze history request.
+
+def _recent_closes(store: BarStore, symbol: str, timeframe: str, n: int, since_ts: int) -> List[float]:
+	cols = store.tail(symbol, n, timeframe)
+	keep = cols["ts"] >= since_ts
+	closes = cols["close"][keep]
+	return [float(x) for x in closes[np.isfinite(closes) & (closes > 0)]]
+
+
+def cached_prices(store: Optional[BarStore], display_symbol: str, breeze_code: str, n: int, since_ts: int) -> List[float]:
+	# Last n recorded prices; live ticks match the trader's own sampling so they are preferred over 1m bars
+	if store is None:
+		return []
+	best: List[float] = []
+	for timeframe, symbol in (("tick", display_symbol), ("1m", breeze_code), ("1m", display_symbol)):
+		prices = _recent_closes(store, symbol, timeframe, n, since_ts)
+		if len(prices) >= n:
+			return prices
+		if len(prices) > len(best):
+			best = prices
+	return best
+
+
+def history_prices(client, breeze_code: str, exchange_code: str, n: int, lookback_days: float, tz: str, store: Optional[BarStore]) -> List[float]:
+	if client is None or not hasattr(client, "get_historical_bars"):
+		return []
+	to_dt = datetime.now(ZoneInfo(tz)).replace(tzinfo=None, second=0, microsecond=0)
+	from_dt = to_dt - timedelta(days=lookback_days)
+	if store is not None:
+		# Downloaded minutes are kept, so the next restart reads them locally
+		from backtest import fetch_breeze_bars
+		closes = np.asarray(fetch_breeze_bars(client, breeze_code, exchange_code, from_dt, to_dt, tz, store).close[-n:], dtype=np.float64)
+	else:
+		rows = client.get_historical_bars(breeze_code, exchange_code, from_dt, to_dt)
+		closes = np.asarray([r.get("close") or "nan" for r in rows[-n:]], dtype=np.float64)
+	return [float(x) for x in closes[np.isfinite(closes) & (closes > 0)]]
+
+
+def warm_start(traders: Sequence, store: Optional[BarStore], client) -> None:
+	# Seeds every trader's RuleEngine; symbols the store cannot cover are fetched from Breeze in parallel
+	started = time.monotonic()
+	pending: List[Tuple[object, int]] = []
+	for trader in traders:
+		rules = trader.rules
+		n = rules.warm_start_samples()
+		since = int(time.time() - rules.warm_start_lookback_days * 86400)
+		prices = cached_prices(store, trader.display_symbol, trader.breeze_code, n, since)
+		if len(prices) >= n:
+			rules.seed_prices(prices)
+			trader._log("Warm start: %d price(s) from local history.", len(prices))
+		else:
+			pending.append((trader, n))
+
+	def fetch(item: Tuple[object, int]) -> List[float]:
+		trader, n = item
+		rules = trader.rules
+		try:
+			return history_prices(client, trader.breeze_code, rules.exchange_code, n, rules.warm_start_lookback_days, rules.market_tz, store)
+		except Exception as e:
+			trader._log("Warm start history error: %s", e, level=logging.WARNING)
+			return []
+
+	if pending:
+		with ThreadPoolExecutor(max_workers=min(8, len(pending))) as pool:
+			fetched = list(pool.map(fetch, pending))
+		for (trader, n), prices in zip(pending, fetched):
+			source = "Breeze history"
+			if not prices:
+				# Fall back to whatever the store had, even if short of a full window
+				since = int(time.time() - trader.rules.warm_start_lookback_days * 86400)
+				prices = cached_prices(store, trader.display_symbol, trader.breeze_code, n, since)
+				source = "local history"
+			if prices:
+				trader.rules.seed_prices(prices)
+				trader._log("Warm start: %d of %d price(s) from %s.", len(prices), n, source)
+			else:
+				trader._log("Warm start: no history; warming up from live prices.")
+	log.info("Warm start finished in %.1fs.", time.monotonic() - started)